@@ -0,0 +1,25 @@
+"""
+Shared Fixtures of the Tests
+Run with pytest from this folder
+"""
+
+import matplotlib
+matplotlib.use('Agg')
+import pytest
+import parameters
+
+# stand in for an SpSim, holding only the parameters it is made from: the
+# defaults cut down to a small run, with the changes given
+class Source(object):
+    def __init__(self, **changes):
+        self.parameters = dict(parameters.parameters)
+        self.parameters.update(InitialTemplates=30, Cycles=3, SeedLength=(100, 10),
+                               InitialPool={'A':5000, 'C':5000, 'G':5000, 'U':5000})
+        self.parameters.update(changes)
+
+# end of class Source
+
+# fixture to make the input of a small SpSim, as source(**changes)
+@pytest.fixture
+def source():
+    return Source
@@ -0,0 +1,68 @@
+"""
+Steady State Detection for Spiegelman's Monster Simulation
+Watches the history as a run goes, and tells it to stop once the population
+has stopped changing
+"""
+
+import numpy as np
+
+# convergence monitor
+# After every epoch a statistic of the change since the last epoch is taken:
+#   'Median'    - relative change of the median length (Average)
+#   'Histogram' - total variation distance between the length distributions
+#   'Uniques'   - change of the fraction of unique templates (Uniques/Number)
+# The run has converged once the statistic is within tolerance for window
+# epochs in a row.
+# Object contains:
+#   kind - statistic used, or None to never stop
+#   tolerance - largest change counted as steady
+#   window - number of steady epochs in a row needed
+#   steady - number of steady epochs in a row so far
+#   reason - description of why the run converged, once it has
+class ConvergenceMonitor(object):
+
+    kinds = ('Median', 'Histogram', 'Uniques')
+
+    # Type: parameters - dict
+    def __init__(self, parameters):
+        self.kind = parameters.get('Convergence', None)
+        if self.kind is not None and self.kind not in self.kinds:
+            raise ValueError('Unknown Convergence: ' + str(self.kind))
+        self.tolerance = float(parameters.get('ConvergenceTolerance', 0.01))
+        self.window = int(parameters.get('ConvergenceWindow', 10))
+        self.steady = 0
+        self.reason = None
+
+    # method to measure the change between the last two epochs
+    # Type: history - dict
+    def change(self, history):
+        if self.kind == 'Median':
+            a, b = history['Average'][-2:]
+            return abs(b - a)/max(abs(a), 1)
+        elif self.kind == 'Histogram':
+            a, b = history['Lengths'][-2], history['Lengths'][-1]
+            if not len(a) or not len(b):
+                return float(len(a) != len(b))
+            edges = np.histogram_bin_edges(np.concatenate([a, b]), bins=50)
+            p = np.histogram(a, edges)[0]/len(a)
+            q = np.histogram(b, edges)[0]/len(b)
+            return np.abs(p - q).sum()/2
+        a = history['Uniques'][-2]/max(history['Number'][-2], 1)
+        b = history['Uniques'][-1]/max(history['Number'][-1], 1)
+        return abs(b - a)
+
+    # method to check the history after an epoch
+    # returns True once the run has converged
+    # Type: history - dict
+    def check(self, history):
+        if self.kind is None or len(history['Number']) < 2:
+            return False
+        change = self.change(history)
+        self.steady = self.steady + 1 if change <= self.tolerance else 0
+        if self.steady >= self.window:
+            self.reason = self.kind + ' changed by at most ' + str(self.tolerance) + \
+                          ' for ' + str(self.window) + ' epochs'
+            return True
+        return False
+
+# end of class ConvergenceMonitor
@@ -12,23 +12,24 @@ def cull_function(template, decision_string = None, p = (A,B,C)):
         return np.random.normal()
         
     if decision_string is None: decision_string = decision
+    # each term of a '+' decision is scored with its own component string
     if '+' in decision_string:
-        decision_list = decision.split('+')
+        decision_list = decision_string.split('+')
         return sum([cull_function(template, dec_str, p) for dec_str in decision_list])
     
     # calc the impact of decision
-    substr = ''.join([b for b in decision if b in 'ACGU'])
-    if decision == 'LEN':
+    substr = ''.join([b for b in decision_string if b in 'ACGU'])
+    if decision_string == 'LEN':
         impact = len(template)
-    elif decision[0] == 'f': # find first
+    elif decision_string[0] == 'f': # find first
         impact = template.find(substr)
-    elif decision[0] == 'l': # find last
+    elif decision_string[0] == 'l': # find last
         impact = len(template) - template.rfind(substr)
     else:
         impact = template.count(substr)
-    if '%' in decision:
+    if '%' in decision_string:
         impact = impact/len(template)
-    if '$' in decision:
+    if '$' in decision_string:
         impact = abs(impact)
             
     #calc output value    
@@ -40,4 +41,74 @@ def cull_function(template, decision_string = None, p = (A,B,C)):
         return impact**p[0]
     else:
         return 0
-        
+
+# compiled cull function
+# the decision string is parsed once, and scores() evaluates it for a whole
+# population in one call, giving the same values as cull_function
+# Type: decision_string - str
+#       p - tuple
+#       kind - str, one of the fnType values
+class CullScorer(object):
+
+    def __init__(self, decision_string = None, p = (A,B,C), kind = None):
+        self.decision = decision if decision_string is None else decision_string
+        self.p = tuple(p)
+        self.kind = fnType if kind is None else kind
+        self.components = [self.parse(dec_str) for dec_str in self.decision.split('+')]
+
+    # method to parse one component of a decision string
+    # returns (mode, substring, per length, absolute)
+    @staticmethod
+    def parse(dec_str):
+        substr = ''.join([b for b in dec_str if b in 'ACGU'])
+        if dec_str == 'LEN':
+            mode = 'LEN'
+        elif dec_str[0] in 'fl':
+            mode = dec_str[0]
+        else:
+            mode = 'count'
+        return (mode, substr, '%' in dec_str, '$' in dec_str)
+
+    def __call__(self, template):
+        return self.scores([template])[0]
+
+    # method to calculate the impact of one component for every template
+    # a packed store answers lengths and single base counts without decoding
+    def impact(self, templates, lengths, component):
+        mode, substr, percent, absolute = component
+        if mode == 'LEN':
+            impact = lengths.astype(float)
+        elif mode == 'f':
+            impact = np.fromiter((t.find(substr) for t in templates), float, len(lengths))
+        elif mode == 'l':
+            impact = lengths - np.fromiter((t.rfind(substr) for t in templates), float, len(lengths))
+        elif len(substr) == 1 and hasattr(templates, 'composition'):
+            impact = templates.composition(substr)[:, 0].astype(float)
+        else:
+            impact = np.fromiter((t.count(substr) for t in templates), float, len(lengths))
+        if percent:
+            impact = impact/lengths
+        if absolute:
+            impact = np.abs(impact)
+        return impact
+
+    # method to score every template in a population
+    # Type: templates - list of str, or TemplateArena
+    def scores(self, templates):
+        if self.kind == 'Random':
+            return np.random.normal(size=len(templates))
+        if hasattr(templates, 'lengths'):
+            lengths = np.asarray(templates.lengths)
+        else:
+            lengths = np.fromiter((len(t) for t in templates), np.int64, len(templates))
+        p = self.p
+        total = np.zeros(len(templates))
+        for component in self.components:
+            impact = self.impact(templates, lengths, component)
+            if self.kind == 'Linear':
+                total += p[0]+p[1]*impact
+            elif self.kind == 'Quadratic':
+                total += p[2]*impact**2+p[1]*impact+p[0]
+            elif self.kind == 'Power':
+                total += impact**p[0]
+        return total
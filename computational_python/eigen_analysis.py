@@ -0,0 +1,89 @@
+"""
+Eigen Analysis of the Mean Field Model
+Python counterpart of eigenAnalysis.m: the dominant eigenpairs of
+b*d*diag(l.^(kappa-1)) over a range of kappa. b and d are kept as they are
+built, sparse or as operators, and the scaling is applied to each vector
+rather than formed into the product. Each kappa starts from the eigenvector
+of the one before, and runs of kappa are split between processes
+"""
+
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from scipy.sparse.linalg import LinearOperator, eigs
+import replication_system
+import mutation_matrices
+
+# method to get b*d*diag(l.^(kappa-1)) as an operator, without forming it
+# Type: b - matrix or BlockMatrix, block mutations
+#       d - matrix, point mutations
+#       l - np.ndarray, lengths
+#       kappa - number
+def kappaOperator(b, d, l, kappa):
+    scale = np.asarray(l, dtype=float)**(kappa - 1)
+    return LinearOperator(d.shape, matvec=lambda x: b @ (d @ (scale*np.ravel(x))),
+                          dtype=float)
+
+# method for a worker to find the dominant eigenpairs of a run of kappa
+# each kappa is started from the leading eigenvector of the one before
+# returns eigenvalues, kappa x number, and eigenvectors, kappa x lengths x number
+# Type: job - tuple (b, d, l, kappas, number)
+def spectrumJob(job):
+    b, d, l, kappas, number = job
+    values = np.zeros((len(kappas), number), dtype=complex)
+    vectors = np.zeros((len(kappas), len(l), number), dtype=complex)
+    v0 = None
+    for n, kappa in enumerate(kappas):
+        w, v = eigs(kappaOperator(b, d, l, kappa), k=number, which='LM', v0=v0)
+        order = np.argsort(-abs(w))
+        w, v = w[order], v[:, order]
+        v = v*np.where(v.real.sum(axis=0) < 0, -1, 1)
+        values[n], vectors[n] = w, v
+        v0 = v[:, 0].real
+    return values, vectors
+
+# method to find the dominant eigenpairs over a range of kappa
+# strategy:
+#   - split kappa into one contiguous run per worker, so that every kappa
+#     but the first of each run is started from its neighbour's eigenvector
+#   - find each run's eigenpairs in its own process
+# eigenvalues are sorted by magnitude, and eigenvectors signed to sum positive
+# returns eigenvalues, kappa x number, and eigenvectors, kappa x lengths x
+# number; both are real when every eigenvalue found is
+# Type: b - matrix or BlockMatrix, block mutations
+#       d - matrix, point mutations
+#       l - np.ndarray, lengths
+#       kappas - sequence, ascending
+#       number - int, eigenpairs per kappa
+#       workers - int, or None for one per core
+def spectrum(b, d, l, kappas, number = 1, workers = None):
+    kappas = np.asarray(kappas, dtype=float)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(kappas)))
+    jobs = [(b, d, l, run, number) for run in np.array_split(kappas, workers)]
+    if workers == 1:
+        results = [spectrumJob(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(spectrumJob, jobs))
+    values = np.concatenate([r[0] for r in results])
+    vectors = np.concatenate([r[1] for r in results])
+    if not np.iscomplex(values).any():
+        values, vectors = values.real, vectors.real
+    return values, vectors
+
+# convenience method to build the mutation matrices and sweep kappa, as
+# eigenAnalysis.m
+# returns kappas, eigenvalues and eigenvectors, as spectrum
+# Type: params - dict, or None for the defaults of replication_system
+#       kappas - sequence, or None for 100 values from -2 to 2
+#       number - int, eigenpairs per kappa
+#       workers - int, or None for one per core
+#       cache - str, folder of the mutation matrix cache, or None
+def go(params = None, kappas = None, number = 1, workers = None, cache = 'MatrixCache'):
+    if params == None:
+        params = replication_system.defaultParameters()
+    if kappas is None:
+        kappas = np.linspace(-2, 2, 100)
+    d, b = mutation_matrices.matrices(params['l'], params['ps'], params['mode'], cache)
+    values, vectors = spectrum(b, d, params['l'], kappas, number, workers)
+    return np.asarray(kappas, dtype=float), values, vectors
@@ -0,0 +1,193 @@
+"""
+Replication Engines for Spiegelman's Monster Simulation
+Alternatives to the tick by tick loop in SpSim.doIteration, selected with
+the 'Engine' parameter
+"""
+
+import random, heapq
+import numpy as np
+import mutation
+
+# batch engine object
+# Replicator state is held in arrays and all replicators are advanced
+# together, straight to the next tick on which any of them finishes a copy.
+# The copies started on one tick are made together with the mutation kernels.
+# Object contains:
+#   sim - SpSim the engine works on
+#   table - lookup table from a base to its pair
+#   bases - bases a mutation can introduce
+#   point - parameters corresponding to point mutation types and rates
+#   block - parameters corresponding to block mutation types and rates
+#   size - number of replicators
+# The simulation's pool must be a VectorPool.
+class BatchEngine(object):
+
+    # Type: sim - SpSim
+    def __init__(self, sim):
+        self.sim = sim
+        self.table = mutation.pairingTable(sim.parameters['Pairings'])
+        self.bases = mutation.baseCodes(sim.parameters['Pairings'])
+        self.point = dict(sim.parameters['PointMutations'])
+        self.block = dict(sim.parameters['BlockMutations'])
+        self.size = int(sim.parameters['Replicators'])
+
+    # method to make mutated copies of a list of templates in one batch
+    # returns the copies, and the number of each monomer of the pool they use
+    # Type: templates - list
+    def synthesise(self, templates):
+        buf, lengths = mutation.encode(templates)
+        buf = self.table[buf]
+        sizes = lengths.copy()
+        buf, lengths = mutation.pointMutation(buf, lengths, self.point, self.bases)
+        buf, lengths = mutation.blockMutation(buf, lengths, self.block, sizes)
+        width = len(self.sim.pool.elements) + 1
+        owner = np.repeat(np.arange(len(templates)), lengths)
+        counts = np.bincount(owner*width + self.sim.pool.slots[buf], \
+                             minlength=len(templates)*width)
+        return mutation.decode(buf, lengths), counts.reshape(-1, width)[:, :-1]
+
+    # method for the replicators that finish on one tick to extract their
+    # copies and choose new templates, in order
+    # returns the chosen templates, and the number of templates and Progress
+    # snapshots there were as each chose, to roll back to
+    # Type: done - list of replicator indices, in order
+    #       copies - list of the copy held by each replicator
+    #       progress - bool
+    def choose(self, done, copies, progress):
+        sim = self.sim
+        templates = sim.templates
+        chosen = list()
+        marks = list()
+        stamps = list()
+        for r in done:
+            if copies[r] is not None:
+                copy = copies[r][::-1]
+                if sim.qualifies(copy):
+                    templates.append(copy)
+                    if progress:
+                        sim.addProgress()
+            marks.append(len(templates))
+            if progress:
+                stamps.append(len(sim.history['Progress'][-1]))
+            chosen.append(str(random.choice(templates)))
+        return chosen, marks, stamps
+
+    # method to hand the new copies out and deplete the pool in order; if the
+    # pool empties, the replicators after it never acted on that tick, and
+    # given the random state from before the choices, the random stream is
+    # wound back to just after the choice of the one that emptied it
+    # returns the tick the loop would record in EarlyQuit, or None
+    # Type: tick - int
+    #       done - list of replicator indices, in order
+    #       copies - list of the copy held by each replicator
+    #       fresh, counts - as made by synthesise
+    #       marks, stamps - as made by choose
+    #       progress - bool
+    #       state - random state from before choose, or None
+    def settle(self, tick, done, copies, fresh, counts, marks, stamps, progress,
+               state = None):
+        sim = self.sim
+        templates = sim.templates
+        emptied = sim.pool.depleteBatch(counts)
+        for j, r in enumerate(done):
+            copies[r] = fresh[j]
+            if j == emptied:
+                del templates[marks[j]:]
+                if state is not None:
+                    random.setstate(state)
+                    for m in marks[:j+1]:
+                        random.choice(range(m))
+                if progress:
+                    del sim.history['Progress'][-1][stamps[j]:]
+                last = (r == self.size - 1) and not sim.pool.isLow()
+                return tick + (2 if last else 1)
+        if sim.pool.isLow():
+            return tick + 1
+        return None
+
+    # method for the replicators that finish on one tick to act, in order
+    # strategy:
+    #   - extract the finished copies and choose new templates
+    #   - make all new copies in one batch and deplete the pool in order
+    # returns the tick the loop would record in EarlyQuit, or None
+    # Type: tick - int
+    #       done - list of replicator indices, in order
+    #       copies - list of the copy held by each replicator
+    #       progress - bool
+    def finish(self, tick, done, copies, progress):
+        state = random.getstate()
+        chosen, marks, stamps = self.choose(done, copies, progress)
+        fresh, counts = self.synthesise(chosen)
+        return self.settle(tick, done, copies, fresh, counts, marks, stamps, progress, state)
+
+    # method to complete one iteration of the simulation
+    # strategy:
+    #   - advance every timer by the number of ticks until the next one finishes
+    #   - let the replicators that finish on that tick act
+    # the recorded EarlyQuit is the same tick the loop would have recorded
+    # Type: iteration - int
+    #       progress - bool
+    def doIteration(self, iteration, progress):
+        maxReplications = int(self.sim.parameters['MaxReplications'])
+        timers = np.zeros(self.size, dtype=np.int64)
+        copies = [None]*self.size
+        tick = 0
+        quit = 0 if self.sim.pool.isLow() else None
+        while quit is None and tick < maxReplications:
+            done = np.flatnonzero(timers <= 0).tolist()
+            quit = self.finish(tick, done, copies, progress)
+            if quit is not None:
+                break
+            timers[done] = [len(copies[r]) for r in done]
+            step = max(1, int(timers.min()))
+            timers -= step
+            tick += step
+        if quit is not None and quit < maxReplications:
+            self.sim.history['EarlyQuit'].append((iteration, quit))
+
+#end of class BatchEngine
+
+# event engine object
+# A discrete event scheduler: each replicator is kept in a priority queue
+# keyed on the tick its copy completes, and the engine jumps from one
+# completion to the next. No timers are counted down, so the work done
+# scales with the number of copies made rather than the number of ticks.
+# MaxReplications is the budget of simulated ticks, as in the loop.
+class EventEngine(BatchEngine):
+
+    # method to complete one iteration of the simulation
+    # strategy:
+    #   - every replicator starts without a template, due at tick 0
+    #   - pop every replicator due on the earliest tick, in replicator order
+    #   - let them act, and push each back due when its new copy completes
+    # Type: iteration - int
+    #       progress - bool
+    def doIteration(self, iteration, progress):
+        maxReplications = int(self.sim.parameters['MaxReplications'])
+        queue = [(0, r) for r in range(self.size)]
+        copies = [None]*self.size
+        quit = 0 if self.sim.pool.isLow() else None
+        while quit is None and queue[0][0] < maxReplications:
+            tick = queue[0][0]
+            done = list()
+            while queue and queue[0][0] == tick:
+                done.append(heapq.heappop(queue)[1])
+            quit = self.finish(tick, done, copies, progress)
+            if quit is not None:
+                break
+            for r in done:
+                heapq.heappush(queue, (tick + max(1, len(copies[r])), r))
+        if quit is not None and quit < maxReplications:
+            self.sim.history['EarlyQuit'].append((iteration, quit))
+
+#end of class EventEngine
+
+# method to create the engine named by the 'Engine' parameter of a simulation
+# Type: sim - SpSim
+def create(sim):
+    name = sim.parameters.get('Engine', 'Loop')
+    if name == 'Batch':
+        return BatchEngine(sim)
+    elif name == 'Event':
+        return EventEngine(sim)
+    raise ValueError('Unknown Engine: ' + str(name))
@@ -0,0 +1,185 @@
+"""
+Streaming Ensemble Statistics for Spiegelman's Monster Simulations
+Takes the history of each finished run as it arrives and keeps per epoch
+mean, variance and quantiles of its series, for each parameter point, so
+the runs themselves can be dropped
+"""
+
+import numpy as np
+
+# per epoch quantile sketches of one series
+# A KLL style sketch for every epoch at once: level h holds values that each
+# stand for 2^h values. When a level is full it is sorted and every other
+# value (from a random start) moves up a level. Epochs a run did not reach
+# are held as NaN and carry no weight.
+# Object contains:
+#   size - values held per level before compacting
+#   levels - list of epochs x values arrays
+class QuantileSketch(object):
+
+    # Type: size - int
+    def __init__(self, size = 128):
+        self.size = size
+        self.levels = [np.zeros((0, 0))]
+
+    # method to make room for more epochs
+    def _widen(self, epochs):
+        for h, level in enumerate(self.levels):
+            if level.shape[0] < epochs:
+                wider = np.full((epochs, level.shape[1]), np.nan)
+                wider[:level.shape[0]] = level
+                self.levels[h] = wider
+
+    # method to add one value for every epoch
+    # Type: values - np.ndarray
+    def add(self, values):
+        self._widen(len(values))
+        column = np.full((self.levels[0].shape[0], 1), np.nan)
+        column[:len(values), 0] = values
+        self.levels[0] = np.hstack([self.levels[0], column])
+        h = 0
+        while self.levels[h].shape[1] >= self.size:
+            level = np.sort(self.levels[h], axis=1)
+            if h + 1 == len(self.levels):
+                self.levels.append(np.zeros((level.shape[0], 0)))
+            self.levels[h+1] = np.hstack([self.levels[h+1], level[:, np.random.randint(2)::2]])
+            self.levels[h] = level[:, :0]
+            h += 1
+
+    # method to estimate a quantile of every epoch
+    # Type: q - float, between 0 and 1
+    def quantile(self, q):
+        values = np.hstack(self.levels)
+        weights = np.concatenate([np.full(l.shape[1], 2.0**h) for h, l in enumerate(self.levels)])
+        out = np.full(values.shape[0], np.nan)
+        for e in range(values.shape[0]):
+            live = ~np.isnan(values[e])
+            if live.any():
+                order = np.argsort(values[e][live])
+                total = np.cumsum(weights[live][order])
+                i = min(np.searchsorted(total, q*total[-1]), len(order) - 1)
+                out[e] = values[e][live][order][i]
+        return out
+
+# end of class QuantileSketch
+
+# per epoch running statistics of one series
+# Mean and variance are kept with Welford's method, so no run is stored.
+# Object contains:
+#   count - number of runs that reached each epoch
+#   mean - mean of each epoch
+#   m2 - sum of squared differences from the mean, per epoch
+#   sketch - QuantileSketch of the series
+class SeriesStats(object):
+
+    # Type: size - int, size of the quantile sketch
+    def __init__(self, size = 128):
+        self.count = np.zeros(0)
+        self.mean = np.zeros(0)
+        self.m2 = np.zeros(0)
+        self.sketch = QuantileSketch(size)
+
+    # Type: values - array like, one value per epoch
+    def add(self, values):
+        values = np.asarray(values, dtype=float)
+        n = len(values)
+        extra = np.zeros(max(n - len(self.count), 0))
+        self.count = np.concatenate([self.count, extra])
+        self.mean = np.concatenate([self.mean, extra])
+        self.m2 = np.concatenate([self.m2, extra])
+        self.count[:n] += 1
+        delta = values - self.mean[:n]
+        self.mean[:n] += delta/self.count[:n]
+        self.m2[:n] += delta*(values - self.mean[:n])
+        self.sketch.add(values)
+
+    # sample variance of each epoch (NaN where fewer than two runs)
+    def variance(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 1, self.m2/(self.count - 1), np.nan)
+
+# end of class SeriesStats
+
+# ensemble of runs
+# Runs are grouped by a key, usually the value of the parameter the sweep
+# changed. Pool is kept per monomer, as categories such as 'Pool.A'.
+# Object contains:
+#   label - name of the parameter the keys are values of
+#   size - size of the quantile sketches
+#   groups - dict of key to dict of category to SeriesStats
+#   runs - dict of key to number of runs added
+class Ensemble(object):
+
+    series = ('Average', 'Number', 'Uniques')
+
+    # Type: label - str, or None
+    #       size - int
+    def __init__(self, label = None, size = 128):
+        self.label = label
+        self.size = size
+        self.groups = dict()
+        self.runs = dict()
+
+    # method to take in the history of one run
+    # Type: history - dict, or anything with a history (SpSim, RunHandle)
+    #       key - any
+    def add(self, history, key = None):
+        history = getattr(history, 'history', history)
+        group = self.groups.setdefault(key, dict())
+        for name in self.series:
+            group.setdefault(name, SeriesStats(self.size)).add(history[name])
+        pool = history['Pool']
+        if len(pool):
+            for k in pool[0]:
+                group.setdefault('Pool.' + str(k), SeriesStats(self.size)).add([d[k] for d in pool])
+        self.runs[key] = self.runs.get(key, 0) + 1
+
+    # method to take in runs one at a time, dropping each once it is added
+    # the key of a run is its value of label, with sub-parameters named with dots
+    # Type: handles - iterable of RunHandle (or SpSim)
+    def addAll(self, handles):
+        for h in handles:
+            key = None
+            if self.label is not None:
+                key = h.parameters
+                for k in self.label.split('.'):
+                    key = key[k]
+            self.add(h, key)
+            if hasattr(h, 'load'):
+                h.sim = None
+
+    def keys(self):
+        return sorted(self.groups, key=lambda k: (k is None, k))
+
+    def categories(self):
+        return sorted(set(c for g in self.groups.values() for c in g))
+
+    # Type: category - str
+    #       key - any
+    def mean(self, category, key = None):
+        return self.groups[key][category].mean.copy()
+
+    def variance(self, category, key = None):
+        return self.groups[key][category].variance()
+
+    # Type: q - float, between 0 and 1
+    def quantile(self, category, q, key = None):
+        return self.groups[key][category].sketch.quantile(q)
+
+    # method to tabulate a statistic over every key, as plotComparison and
+    # heatMap take it
+    # returns the keys, the epochs of each, and the values of each
+    # Type: category - str
+    #       stat - 'mean', 'variance', or a quantile between 0 and 1
+    def table(self, category, stat = 'mean'):
+        indices = self.keys()
+        if stat == 'mean':
+            values = [self.mean(category, k) for k in indices]
+        elif stat == 'variance':
+            values = [self.variance(category, k) for k in indices]
+        else:
+            values = [self.quantile(category, stat, k) for k in indices]
+        epochs = min(len(v) for v in values)
+        return indices, [range(epochs)]*len(indices), [v[:epochs].tolist() for v in values]
+
+# end of class Ensemble
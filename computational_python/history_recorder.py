@@ -0,0 +1,289 @@
+"""
+Columnar History Recorder for Spiegelman's Monster Simulation
+Records the same categories as the SpSim history dict in bounded memory:
+scalar series in preallocated arrays, template lengths as fixed width
+histograms (optionally written out to disk in chunks), and a capped number
+of Progress snapshots per epoch
+"""
+
+import os
+import numpy as np
+
+# method to make an array twice as long, or long enough for n entries
+def _grow(array, n):
+    if n <= len(array):
+        return array
+    bigger = np.zeros((max(2*len(array), n),) + array.shape[1:], dtype=array.dtype)
+    bigger[:len(array)] = array
+    return bigger
+
+# fixed width histogram rows of template lengths
+# Each row keeps only the span of bins between its shortest and longest
+# template. Rows can be written to disk in chunks, after which only the
+# rows of the current chunk are held in memory.
+# Object contains:
+#   width - width of each length bin
+#   folder - folder for chunk files, or None to keep every row in memory
+#   chunk - number of rows per chunk file
+#   rows - list of (first bin, counts) held in memory
+#   saved - number of rows written to disk
+class LengthRows(object):
+
+    def __init__(self, width = 1, folder = None, chunk = 50):
+        self.width = int(width)
+        self.folder = folder
+        self.chunk = int(chunk)
+        self.rows = list()
+        self.saved = 0
+        self.cached = (None, None)
+        if folder is not None and not os.path.isdir(folder):
+            os.mkdir(folder)
+
+    def __len__(self):
+        return self.saved + len(self.rows)
+
+    # method to add the histogram of one set of lengths
+    # Type: lengths - np.ndarray
+    def add(self, lengths):
+        bins = np.asarray(lengths, dtype=np.int64)//self.width
+        first = int(bins.min()) if bins.size else 0
+        self.rows.append((first, np.bincount(bins - first).astype(np.int32)))
+        if self.folder is not None and len(self.rows) == self.chunk:
+            self.flush()
+
+    # method to write the rows held in memory to a chunk file
+    def flush(self):
+        if not self.rows:
+            return
+        name = os.path.join(self.folder, 'lengths_' + str(self.saved//self.chunk) + '.npz')
+        np.savez(name, first=[r[0] for r in self.rows], size=[len(r[1]) for r in self.rows],
+                 counts=np.concatenate([r[1] for r in self.rows]))
+        self.saved += len(self.rows)
+        self.rows = list()
+
+    # returns (first bin, counts) of row i
+    def row(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('History index out of range')
+        if i >= self.saved:
+            return self.rows[i - self.saved]
+        k = i//self.chunk
+        if self.cached[0] != k:
+            name = os.path.join(self.folder, 'lengths_' + str(k) + '.npz')
+            with np.load(name) as f:
+                self.cached = (k, (f['first'], f['size'], f['counts']))
+        first, size, counts = self.cached[1]
+        j = i - k*self.chunk
+        start = int(size[:j].sum())
+        return int(first[j]), counts[start:start + size[j]]
+
+    # returns row i as a sorted list of lengths, each at the middle of its bin
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        first, counts = self.row(i)
+        values = (np.arange(first, first + len(counts)))*self.width + self.width//2
+        return np.repeat(values, counts).tolist()
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self):
+        return repr(list(self))
+
+# end of class LengthRows
+
+# Progress snapshots of one epoch
+# Appending is counted exactly, but at most cap snapshots are kept: when the
+# cap is passed every other snapshot is dropped and only every 2nd, 4th, ...
+# later snapshot is kept, so the kept snapshots stay evenly spread. The
+# latest snapshot is always kept. Snapshots are held as lists while the
+# epoch is open and as LengthRows rows once it is closed.
+# Object contains:
+#   count - number of snapshots appended
+#   stride - keep every stride-th snapshot
+#   kept - list of (snapshot number, lengths or row index)
+#   last - the latest (snapshot number, lengths or row index)
+class ProgressEpoch(object):
+
+    def __init__(self, rows, cap):
+        self.rows = rows
+        self.cap = cap
+        self.count = 0
+        self.stride = 1
+        self.kept = list()
+        self.last = None
+
+    def __len__(self):
+        return self.count
+
+    # Type: lengths - list
+    def append(self, lengths):
+        self.last = (self.count, lengths)
+        if self.count % self.stride == 0:
+            self.kept.append(self.last)
+            if len(self.kept) > self.cap:
+                self.stride *= 2
+                self.kept = [k for k in self.kept if k[0] % self.stride == 0]
+        self.count += 1
+
+    # only the latest snapshots can be deleted, e.g. del progress[n:]
+    def __delitem__(self, i):
+        n = i.indices(self.count)[0]
+        self.kept = [k for k in self.kept if k[0] < n]
+        if self.last is not None and self.last[0] >= n:
+            self.last = self.kept[-1] if self.kept else None
+        self.count = min(self.count, n)
+
+    # the kept snapshots and the latest one, in order
+    def snapshots(self):
+        if self.last is not None and (not self.kept or self.kept[-1][0] != self.last[0]):
+            return self.kept + [self.last]
+        return self.kept
+
+    # returns the latest kept snapshot at or before snapshot i
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        for n, lengths in reversed(self.snapshots()):
+            if n <= i:
+                return self._lengths(lengths)
+        raise IndexError('Progress index out of range')
+
+    def __iter__(self):
+        for n, lengths in self.snapshots():
+            yield self._lengths(lengths)
+
+    def _lengths(self, lengths):
+        return self.rows[lengths] if isinstance(lengths, int) else list(lengths)
+
+    # method to store the snapshots as histograms once the epoch is over
+    def close(self):
+        stored = dict()
+        for n, lengths in self.snapshots():
+            if not isinstance(lengths, int):
+                self.rows.add(lengths)
+                stored[n] = len(self.rows) - 1
+        self.kept = [(n, stored.get(n, x)) for n, x in self.kept]
+        if self.last is not None:
+            self.last = (self.last[0], stored.get(self.last[0], self.last[1]))
+
+    def __repr__(self):
+        return repr(list(self))
+
+# end of class ProgressEpoch
+
+# columnar history recorder
+# Reads as the history dict of SpSim: every category is available by key,
+# scalar series as lists, Lengths and Progress as sequences of sorted lists.
+# Object contains:
+#   elements - monomers of the pool, in column order
+#   size - number of epochs recorded
+#   columns - dict of arrays for Number, Average and Uniques
+#   pool - array of pool quantities, epochs x monomers
+#   lengths - LengthRows of template lengths per epoch
+#   progress - list of ProgressEpoch
+#   other - dict of categories recorded as plain lists (e.g. EarlyQuit)
+class HistoryRecorder(object):
+
+    scalars = ('Number', 'Average', 'Uniques')
+
+    # Type: parameters - dict
+    def __init__(self, parameters):
+        capacity = max(int(parameters.get('Cycles', 1)), 1)
+        width = parameters.get('HistoryBinWidth', 1)
+        folder = parameters.get('HistoryChunks', None)
+        self.elements = list(parameters['InitialPool'])
+        self.size = 0
+        self.columns = {k: np.zeros(capacity, dtype=np.int64) for k in self.scalars}
+        self.pool = np.zeros((capacity, len(self.elements)),
+                             dtype=np.array(list(parameters['InitialPool'].values())).dtype)
+        self.lengths = LengthRows(width, folder)
+        self.progressRows = LengthRows(width, None if folder is None else
+                                       os.path.join(folder, 'progress'))
+        self.progressCap = int(parameters.get('ProgressSnapshots', 16))
+        self.progress = list()
+        self.other = {'EarlyQuit': list()}
+
+    # method to record one epoch
+    # Type: lengths - np.ndarray
+    #       uniques - int, or NaN when it is not known, as in the mean field
+    #                 cycles of a hybrid run
+    #       pool - dict
+    def record(self, lengths, uniques, pool):
+        lengths = np.asarray(lengths, dtype=np.int64)
+        n = self.size
+        for k in self.scalars:
+            self.columns[k] = _grow(self.columns[k], n+1)
+        if np.isnan(uniques) and self.columns['Uniques'].dtype.kind != 'f':
+            self.columns['Uniques'] = self.columns['Uniques'].astype(float)
+        self.pool = _grow(self.pool, n+1)
+        self.columns['Number'][n] = len(lengths)
+        self.columns['Average'][n] = np.partition(lengths, len(lengths)//2)[len(lengths)//2]
+        self.columns['Uniques'][n] = uniques
+        self.pool[n] = [pool[x] for x in self.elements]
+        self.lengths.add(lengths)
+        self.size += 1
+
+    # method to start the Progress snapshots of a new epoch
+    def newProgress(self):
+        if self.progress:
+            self.progress[-1].close()
+        self.progress.append(ProgressEpoch(self.progressRows, self.progressCap))
+        return self.progress[-1]
+
+    # accessor layer: the same categories as the history dict
+    def __getitem__(self, key):
+        if key in self.scalars:
+            return self.columns[key][:self.size].tolist()
+        elif key == 'Pool':
+            return [dict(zip(self.elements, row)) for row in self.pool[:self.size].tolist()]
+        elif key == 'Lengths':
+            return self.lengths
+        elif key == 'Progress':
+            return ProgressList(self)
+        return self.other[key]
+
+    def __setitem__(self, key, value):
+        if key in self.scalars + ('Pool', 'Lengths', 'Progress'):
+            raise KeyError(key + ' is recorded by the recorder')
+        self.other[key] = value
+
+    def keys(self):
+        return ['Number', 'Average', 'Lengths', 'Pool', 'Uniques'] + \
+               list(self.other) + ['Progress']
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def items(self):
+        return [(k, self[k]) for k in self.keys()]
+
+# end of class HistoryRecorder
+
+# the Progress category of a recorder, which SpSim appends epochs to
+class ProgressList(object):
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    def __len__(self):
+        return len(self.recorder.progress)
+
+    def __getitem__(self, i):
+        return self.recorder.progress[i]
+
+    def __iter__(self):
+        return iter(self.recorder.progress)
+
+    # Type: epoch - list, must be empty
+    def append(self, epoch):
+        self.recorder.newProgress()
+
+# end of class ProgressList
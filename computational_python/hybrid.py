@@ -0,0 +1,193 @@
+"""
+Hybrid Runs of Spiegelman's Monster Simulation
+Runs the early cycles of a SpSim, while there are many templates and every
+pool is full, with the mean field model of replication_system, and hands a
+population sampled from its length distribution to the stochastic engine for
+the later cycles. The run can move between the two as often as needed
+"""
+
+import time
+import numpy as np
+from scipy.integrate import solve_ivp
+import convergence
+import mutation
+import mutation_matrices
+import replication_system
+
+# method to get the kappa of a cull that weights templates by l^kappa
+# the mean field transfer can only weight by a power of length; a random
+# cull weights every length the same
+# Type: cull - CullScorer
+def cullKappa(cull):
+    kind = getattr(cull, 'kind', None)
+    if kind == 'Random':
+        return 0.0
+    if getattr(cull, 'components', None) == [('LEN', '', False, False)]:
+        p = cull.p
+        if kind == 'Power':
+            return float(p[0])
+        elif kind == 'Linear' and (p[0] == 0 or p[1] == 0):
+            return 0.0 if p[1] == 0 else 1.0
+        elif kind == 'Quadratic' and p[0] == 0 and p[1] == 0:
+            return 2.0
+    raise ValueError('The mean field model needs a cull by a power of length, not ' +
+                     str(getattr(cull, 'decision', cull)))
+
+# hybrid simulation
+# Cycles are run either by the mean field model or by the SpSim's own engine.
+# The mean field model holds the expected number of genomes of each length
+# from 1 to HybridMaxLength, and runs an epoch from the number of ticks as
+# time: each replicator takes a template at random, and copies it in as many
+# ticks as it is long. The epoch ends when the copies have used the pool down
+# to EmptyPool, or after MaxReplications ticks. The transfer keeps
+# TransferPercent of the genomes weighted by the cull, drawn as whole genomes
+# as SpSim.transfer draws them.
+# Rare mutations leave fractions of a genome at far off lengths, and a short
+# genome copies so much faster that such a fraction would take over every
+# epoch, where in SpSim it is there in only a few. So each time a genome of
+# MinLength could have been copied HybridStep times, every length with less
+# than one genome is made 0 or 1 at random, keeping the expected number. Only
+# lengths are modelled, so templates handed back to the engine are given
+# random bases, and templates longer than the grid are held at its longest
+# length. For the same reason the number of unique templates is not known in
+# mean field cycles, and is recorded as NaN in history['Uniques'].
+# The point mutation matrix is only cached if HybridCache names a folder.
+# Which model runs a cycle is set by the Hybrid parameter:
+#   'Cycles' - the mean field model runs the first HybridSwitch cycles
+#   'Number' - the mean field model runs while the last epoch ended with at
+#              least HybridSwitch genomes, and takes over again if the
+#              population grows back
+#   'Median' - the mean field model runs until the median length has
+#              settled, as the 'Median' Convergence monitor finds
+# Switches are recorded in history['Hybrid'] as (cycle, model).
+# Object contains:
+#   sim - SpSim whose templates, pool and history the run uses
+#   l - np.ndarray, lengths of the mean field grid
+#   n - np.ndarray, genomes of each length, or None while the engine runs
+#   cycles - number of cycles run so far
+class HybridSim(object):
+
+    kinds = ('Cycles', 'Number', 'Median')
+
+    # Type: sim - SpSim
+    def __init__(self, sim):
+        self.sim = sim
+        parameters = sim.parameters
+        self.kind = parameters.get('Hybrid')
+        if self.kind not in self.kinds:
+            raise ValueError('Unknown Hybrid: ' + str(self.kind))
+        self.switch = parameters.get('HybridSwitch', 100)
+        self.l = np.arange(1, int(parameters.get('HybridMaxLength', 2000)) + 1, dtype=float)
+        point = parameters['PointMutations']
+        block = parameters['BlockMutations']
+        ps = (point.get('addition', 0), point.get('deletion', 0),
+              block.get('addition', 0), block.get('deletion', 0))
+        d, b = mutation_matrices.matrices(self.l, ps, 2, parameters.get('HybridCache'))
+        self.a = replication_system.systemOperator(d, b, self.l, 1, int(parameters['Replicators']),
+                                                   self.l >= parameters['MinLength'])
+        self.n = None
+        self.cycles = 0
+        if 'Hybrid' not in sim.history:
+            sim.history['Hybrid'] = list()
+
+    # method to hand the templates of the engine to the mean field model
+    def toMeanField(self):
+        if self.n is None:
+            lengths = np.clip(self.sim.templateLengths(), 1, len(self.l))
+            self.n = np.bincount(lengths - 1, minlength=len(self.l)).astype(float)
+            self.sim.history['Hybrid'].append((self.cycles, 'MeanField'))
+
+    # method to hand the genomes of the mean field model to the engine
+    def toStochastic(self):
+        if self.n is not None:
+            lengths = np.repeat(self.l.astype(np.int64), np.round(self.n).astype(np.int64))
+            codes = mutation.baseCodes(self.sim.parameters['Pairings'])
+            buf = codes[np.random.randint(len(codes), size=int(lengths.sum()))]
+            self.sim.setTemplates(mutation.decode(buf, lengths))
+            for replicator in self.sim.replicators:
+                replicator.release()
+            self.n = None
+            self.sim.history['Hybrid'].append((self.cycles, 'Stochastic'))
+
+    # method to run one epoch of the mean field model, record it, and transfer
+    # Type: kappa - float, transfer weight l^kappa
+    def meanFieldCycle(self, kappa):
+        parameters = self.sim.parameters
+        full = sum(parameters['InitialPool'].values())
+        start = self.l @ self.n
+        limit = (1 - float(parameters['EmptyPool']))*full
+        def low(t, n, a):
+            return self.l @ n - start - limit
+        low.terminal = True
+        ticks = int(parameters['MaxReplications'])
+        # ticks, per genome held, for a genome of MinLength to be copied HybridStep times
+        pace = float(parameters.get('HybridStep', 1))*parameters['MinLength']/int(parameters['Replicators'])
+        t = 0
+        while t < ticks:
+            end = min(t + max(pace*self.n.sum(), 1), ticks)
+            sol = solve_ivp(replication_system.replicationSystem, (t, end), self.n, method='RK45',
+                            args=(self.a,), events=low, first_step=end - t, rtol=1e-3, atol=1e-3)
+            self.n = np.maximum(sol.y[:, -1], 0)
+            few = self.n < 1
+            self.n[few] = np.random.random(few.sum()) < self.n[few]
+            t = sol.t[-1]
+            if sol.status == 1:
+                self.sim.history['EarlyQuit'].append((self.cycles, int(t)))
+                break
+        used = min(self.l @ self.n - start, full)/len(parameters['InitialPool'])
+        pool = {k: max(int(round(v - used)), 0) for k, v in parameters['InitialPool'].items()}
+        lengths = np.repeat(self.l.astype(np.int64), np.round(self.n).astype(np.int64)).tolist()
+        history = self.sim.history
+        if isinstance(history, dict):
+            history['Number'].append(len(lengths))
+            history['Lengths'].append(lengths)
+            history['Average'].append(lengths[int(len(lengths)/2)] if lengths else 0)
+            history['Uniques'].append(float('nan'))
+            history['Pool'].append(pool)
+        else:
+            history.record(lengths, float('nan'), pool)
+        kept = replication_system.transfer(self.l, self.n, 0.01*parameters['TransferPercent'], kappa)
+        number = int(len(lengths)*0.01*parameters['TransferPercent'])
+        self.n = np.random.multinomial(number, kept/kept.sum()).astype(float)
+
+    # method to decide whether the next cycle is run by the mean field model
+    # Type: settle - ConvergenceMonitor, watching the median
+    def useMeanField(self, settle):
+        if self.kind == 'Cycles':
+            return self.cycles < self.switch
+        elif self.kind == 'Number':
+            number = self.sim.history['Number']
+            return (number[-1] if len(number) else len(self.sim.templates)) >= self.switch
+        return settle.reason is None
+
+    # method to run the simulation, as SpSim.run does
+    # Type: printing - int
+    #       cull - CullScorer, must weight templates by a power of length
+    #       progress - bool, recorded only for cycles the engine runs
+    def run(self, printing = -1, cull = None, progress = False):
+        kappa = cullKappa(cull)
+        start = time.time()
+        monitor = convergence.ConvergenceMonitor(self.sim.parameters)
+        settle = convergence.ConvergenceMonitor(dict(self.sim.parameters, Convergence='Median'))
+        if (printing > 0):
+            print('Simulation Start\n========================')
+        for iterations in range(int(self.sim.parameters['Cycles'])):
+            if self.useMeanField(settle):
+                self.toMeanField()
+                self.meanFieldCycle(kappa)
+                if (printing == 1):
+                    print('Iteration: ', iterations, '(mean field)')
+                if settle.reason is None:
+                    settle.check(self.sim.history)
+            else:
+                self.toStochastic()
+                self.sim.cycle(iterations, cull, progress, printing)
+            self.cycles += 1
+            if monitor.check(self.sim.history):
+                self.sim.history['Converged'] = [(iterations, monitor.reason)]
+                break
+        self.toStochastic()
+        if (printing == -1):
+            print('Elapsed Time: ', round(time.time()-start,3), 's')
+
+# end of class HybridSim
@@ -0,0 +1,159 @@
+"""
+Sweep Folder Manifests for Spiegelman's Monster Simulations
+A manifest is one file per folder recording, for every SIMHIST file in it,
+the parameters, a summary of the history and where each category starts in
+the file. Runs can be listed and selected from it without opening them,
+and each selected run is only loaded when it is first used, or all of them
+at once in parallel
+"""
+
+import os, ast
+from concurrent.futures import ThreadPoolExecutor
+import simhist
+import sweep
+
+MANIFEST = 'manifest.SIMINDEX'
+
+# method to look up a parameter, naming sub-parameters with dots
+# Type: parameters - dict
+#       name - str
+def lookup(parameters, name):
+    for k in name.split('.'):
+        parameters = parameters[k]
+    return parameters
+
+# method to sort file names so that 2.SIMHIST comes before 10.SIMHIST
+def _order(fileName):
+    stem = fileName[:-8]
+    return (0, int(stem), '') if stem.isdigit() else (1, 0, stem)
+
+# method to describe one SIMHIST file
+# returns its parameters, a summary of its history, and the byte offset of
+# each category; text files are parsed in full, and have no offsets
+# Type: fileName - str
+def describe(fileName):
+    if simhist.isBinary(fileName):
+        header = simhist.readHeader(fileName)
+        history = simhist.SimHistory(fileName, header)
+        parameters = header['Parameters']
+        offsets = {c[0]: min([a[0] for a in c[3].values()], default=None)
+                   for c in header['Categories']}
+    else:
+        history, templates, parameters = simhist.readText(fileName)
+        offsets = dict()
+    summary = {'Epochs': len(history['Number'])}
+    for k in ('Average', 'Number', 'Uniques'):
+        if k in history and len(history[k]):
+            summary[k] = history[k][-1]
+    return parameters, summary, offsets
+
+# manifest of a sweep folder
+# Parameters shared by every run are stored once, and each run keeps only the
+# parameters that differ from them. An entry is rebuilt when its file changes.
+# Object contains:
+#   folder - the sweep folder
+#   runs - list of entries, dicts with 'File', 'Parameters', 'Summary',
+#          'Offsets', 'Size' and 'Modified'
+class Index(object):
+
+    # method to open the manifest of a folder, updating it if files changed
+    # Type: folder - str
+    def __init__(self, folder):
+        self.folder = folder
+        self.runs = list()
+        name = os.path.join(folder, MANIFEST)
+        if os.path.isfile(name):
+            with open(name, 'r') as f:
+                saved = ast.literal_eval(f.read())
+            for run in saved['Runs']:
+                parameters = dict(saved['Common'])
+                parameters.update(run['Parameters'])
+                self.runs.append(dict(run, Parameters=parameters))
+        self.update()
+
+    # method to bring the manifest up to date with the files in the folder
+    # returns True if anything changed
+    def update(self):
+        known = {run['File']: run for run in self.runs}
+        runs = list()
+        changed = False
+        for fileName in sorted(os.listdir(self.folder), key=_order):
+            if fileName[-8:] != '.SIMHIST':
+                continue
+            stat = os.stat(os.path.join(self.folder, fileName))
+            run = known.get(fileName)
+            if run is None or run['Size'] != stat.st_size or run['Modified'] != stat.st_mtime:
+                parameters, summary, offsets = describe(os.path.join(self.folder, fileName))
+                run = {'File': fileName, 'Parameters': parameters, 'Summary': summary,
+                       'Offsets': offsets, 'Size': stat.st_size, 'Modified': stat.st_mtime}
+                changed = True
+            runs.append(run)
+        changed = changed or len(runs) != len(self.runs)
+        self.runs = runs
+        if changed:
+            self.save()
+        return changed
+
+    # method to write the manifest, storing shared parameters once
+    def save(self):
+        common = dict(self.runs[0]['Parameters']) if self.runs else dict()
+        for run in self.runs[1:]:
+            common = {k: v for k, v in common.items()
+                      if k in run['Parameters'] and run['Parameters'][k] == v}
+        saved = {'Common': common, 'Runs': [dict(run, Parameters={k: v for k, v in
+                 run['Parameters'].items() if k not in common}) for run in self.runs]}
+        name = os.path.join(self.folder, MANIFEST)
+        with open(name + '.part', 'w') as f:
+            f.write(repr(saved))
+        os.replace(name + '.part', name)
+
+    def __len__(self):
+        return len(self.runs)
+
+    # method to pick runs by parameter or summary values
+    # Type: where - dict of name to a value, or to a function of the value
+    #               that returns True to keep the run; names are parameters,
+    #               with sub-parameters named with dots, or 'Summary.<key>'
+    def select(self, where = None):
+        chosen = list()
+        for run in self.runs:
+            keep = True
+            for name, test in (where or dict()).items():
+                try:
+                    if name.startswith('Summary.'):
+                        value = run['Summary'][name[8:]]
+                    else:
+                        value = lookup(run['Parameters'], name)
+                except KeyError:
+                    keep = False
+                    break
+                keep = test(value) if callable(test) else value == test
+                if not keep:
+                    break
+            if keep:
+                chosen.append(run)
+        return chosen
+
+    # method to get handles to runs, without loading them
+    # Type: runs - list of entries, defaults to every run
+    def handles(self, runs = None):
+        if runs is None:
+            runs = self.runs
+        return [sweep.RunHandle(os.path.join(self.folder, run['File']), run['Parameters'],
+                                None, 0) for run in runs]
+
+    # method to load runs
+    # returns handles that load their run the first time it is used, so only
+    # the runs picked out are ever read; given workers, every run is loaded
+    # now on that many threads instead. Binary histories are still only
+    # decoded when a category is accessed
+    # Type: runs - list of entries, defaults to every run
+    #       workers - int, threads to load on, or None to load lazily
+    def load(self, runs = None, workers = None):
+        handles = self.handles(runs)
+        if workers and handles:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(lambda h: h.load(), handles))
+        return handles
+
+# end of class Index
@@ -0,0 +1,214 @@
+"""
+Multiset Template Store for Spiegelman's Monster Simulation
+Holds each distinct template once, with the number of copies of it in the
+population, so memory and time follow diversity rather than census size
+"""
+
+import numpy as np
+import sampling
+
+# multiset template store
+# Behaves as the census: len() is the number of templates and index i is the
+# i-th template counting multiplicities, so random.choice picks a sequence
+# in proportion to its count. Positions are found with a Fenwick tree over
+# the counts in O(log U) for U distinct sequences.
+# Object contains:
+#   sequences - list of distinct template strings
+#   index - dict from template string to its position in sequences
+#   counts - number of copies of each sequence
+#   sizes - length of each sequence
+#   tree - Fenwick tree (1 based list) of counts
+#   total - number of templates in the census
+#   journal - sequences appended since the store was made, for truncation
+class TemplateMultiset(object):
+
+    # Type: templates - iterable of str
+    def __init__(self, templates = ()):
+        self.sequences = list()
+        self.index = dict()
+        counts = list()
+        for t in templates:
+            i = self.index.get(t)
+            if i is None:
+                self.index[t] = len(self.sequences)
+                self.sequences.append(t)
+                counts.append(1)
+            else:
+                counts[i] += 1
+        self._build(np.array(counts, dtype=np.int64))
+
+    # method to set the counts and rebuild the tree from them
+    def _build(self, counts):
+        self.counts = list(counts.tolist())
+        self.sizes = [len(s) for s in self.sequences]
+        self.total = int(counts.sum())
+        i = np.arange(1, len(counts)+1)
+        prefix = np.concatenate([[0], np.cumsum(counts)])
+        self.tree = [0] + (prefix[i] - prefix[i - (i & -i)]).tolist()
+        self.journal = list()
+
+    # method to make a store from distinct sequences and their counts
+    # Type: sequences - list of str
+    #       counts - np.ndarray
+    @classmethod
+    def fromCounts(cls, sequences, counts):
+        counts = np.asarray(counts, dtype=np.int64)
+        new = cls()
+        new.sequences = [s for s, c in zip(sequences, counts.tolist()) if c > 0]
+        new.index = {s: i for i, s in enumerate(new.sequences)}
+        new._build(counts[counts > 0])
+        return new
+
+    # lengths of every template in the census, without touching the strings
+    @property
+    def lengths(self):
+        return np.repeat(np.array(self.sizes, dtype=np.int64), self.counts)
+
+    def __len__(self):
+        return self.total
+
+    # returns the template at census position i
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.total
+        if not 0 <= i < self.total:
+            raise IndexError('Template index out of range')
+        tree = self.tree
+        pos = 0
+        bit = 1 << (len(tree) - 1).bit_length()
+        while bit:
+            nxt = pos + bit
+            if nxt < len(tree) and tree[nxt] <= i:
+                pos = nxt
+                i -= tree[nxt]
+            bit >>= 1
+        return self.sequences[pos]
+
+    def __iter__(self):
+        for s, c in zip(self.sequences, self.counts):
+            for _ in range(c):
+                yield s
+
+    # only the most recent appends can be deleted, e.g. del store[n:]
+    def __delitem__(self, i):
+        if not isinstance(i, slice) or i.stop is not None or i.step is not None:
+            raise TypeError('Only trailing templates can be deleted')
+        n = i.indices(self.total)[0]
+        if self.total - n > len(self.journal):
+            raise TypeError('Only appended templates can be deleted')
+        while self.total > n:
+            self._add(self.journal.pop(), -1)
+
+    def tolist(self):
+        return list(self)
+
+    # method to change the count of sequence u
+    def _add(self, u, delta):
+        self.counts[u] += delta
+        self.total += delta
+        i = u + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    # method to sum the counts of the first n sequences
+    def _prefix(self, n):
+        total = 0
+        while n > 0:
+            total += self.tree[n]
+            n -= n & -n
+        return total
+
+    # Type: template - str
+    def append(self, template):
+        u = self.index.get(template)
+        if u is None:
+            u = len(self.sequences)
+            self.index[template] = u
+            self.sequences.append(template)
+            self.sizes.append(len(template))
+            self.counts.append(0)
+            n = u + 1
+            self.tree.append(self._prefix(n-1) - self._prefix(n - (n & -n)))
+        self._add(u, 1)
+        self.journal.append(u)
+
+    # method to count the distinct templates present
+    def uniqueCount(self):
+        return sum(1 for c in self.counts if c > 0)
+
+    # method to make a new store from census positions
+    # Type: indices - np.ndarray
+    def select(self, indices):
+        owner = np.searchsorted(np.cumsum(self.counts), indices, side='right')
+        return TemplateMultiset.fromCounts(self.sequences, \
+                   np.bincount(owner, minlength=len(self.sequences)))
+
+    # method to draw k templates without replacement, each distinct sequence
+    # weighted by its weight, see thinCounts
+    # Type: k - int
+    #       weights - np.ndarray, one per distinct sequence (None for equal)
+    def thin(self, k, weights = None):
+        counts = np.array(self.counts, dtype=np.int64)
+        return TemplateMultiset.fromCounts(self.sequences, thinCounts(counts, k, weights))
+
+# end of class TemplateMultiset
+
+# chance that a key known to lie in [a, b) lies below t, for each weight
+def _chance(w, a, b, t):
+    top = -1.0 if b == np.inf else np.expm1(-w*(b-a))
+    return np.clip(np.expm1(-w*(t-a))/top, 0, 1)
+
+# method to thin counts to k individuals without replacement
+# strategy:
+#   - with equal weights, one multivariate hypergeometric draw
+#   - otherwise every individual has an exponential key E/w and the k
+#     smallest keys survive, as in sampling.weightedSample; the keys are never
+#     drawn, instead a threshold is moved and the number of each sequence's
+#     keys below it is drawn from a binomial, narrowing an interval [a, b)
+#     that holds the k-th key until exactly k are below
+#   - sequences with zero weight only fill up a shortfall, uniformly
+# Type: counts - np.ndarray
+#       k - int
+#       weights - np.ndarray, or None
+def thinCounts(counts, k, weights = None):
+    rng = sampling.generator()
+    if not 0 <= k <= counts.sum():
+        raise ValueError('Cannot take ' + str(k) + ' of ' + str(counts.sum()) + ' templates')
+    if weights is not None:
+        weights = np.asarray(weights, dtype=float)
+    if weights is None or weights.size == 0 or np.all(weights == weights[0]):
+        return rng.multivariate_hypergeometric(counts, k)
+    live = weights > 0
+    if counts[live].sum() <= k:
+        kept = np.where(live, counts, 0)
+        return kept + rng.multivariate_hypergeometric(np.where(live, 0, counts), k - kept.sum())
+    w = weights[live]
+    sure = np.zeros(w.size, dtype=np.int64)
+    open_ = counts[live].copy()
+    a, b = 0.0, np.inf
+    for _ in range(200):
+        need = k - sure.sum()
+        if need == 0:
+            break
+        lo, hi = a, (b if b < np.inf else a + 1/w.mean())
+        while b == np.inf and (open_*_chance(w, a, b, hi)).sum() < need:
+            hi = a + 2*(hi - a)
+        for _ in range(60):
+            t = (lo + hi)/2
+            if (open_*_chance(w, a, b, t)).sum() < need:
+                lo = t
+            else:
+                hi = t
+        t = (lo + hi)/2
+        below = rng.binomial(open_, _chance(w, a, b, t))
+        if below.sum() > need:
+            open_, b = below, t
+        else:
+            sure += below
+            open_, a = open_ - below, t
+    else:
+        sure += rng.multivariate_hypergeometric(open_, k - sure.sum())
+    kept = np.zeros(len(counts), dtype=np.int64)
+    kept[live] = sure
+    return kept
@@ -0,0 +1,141 @@
+"""
+Mutation Kernels for Spiegelman's Monster Simulation
+Copies are held as bytes in one contiguous buffer, so that the point and
+block mutations of many copies can be drawn and applied together
+"""
+
+import numpy as np
+
+END = float('inf')
+
+# method to build a lookup table from the byte of a base to the byte of its pair
+# Type: pairings - dict (as made by str.maketrans)
+def pairingTable(pairings):
+    table = np.arange(256, dtype=np.uint8)
+    for k in pairings:
+        table[k] = ord(pairings[k])
+    return table
+
+# method to get the bytes of the bases a mutation can introduce
+# Type: pairings - dict
+def baseCodes(pairings):
+    return np.array([ord(b) for b in pairings.values()], dtype=np.uint8)
+
+# method to pack a list of strings into one buffer
+# returns the buffer and the length of each string
+# Type: strings - list
+def encode(strings):
+    lengths = np.fromiter((len(s) for s in strings), dtype=np.int64,
+                          count=len(strings))
+    buf = np.frombuffer(''.join(strings).encode('ascii'), dtype=np.uint8).copy()
+    return buf, lengths
+
+# method to unpack a buffer back into a list of strings
+# Type: buf - np.ndarray
+#       lengths - np.ndarray
+def decode(buf, lengths):
+    text = buf.tobytes().decode('ascii')
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    return [text[s:e] for s, e in zip(starts.tolist(), ends.tolist())]
+
+# method to draw uniform positions for a number of events in each copy
+# returns the copy each event belongs to, and its position in the buffer
+def _positions(starts, lengths, count):
+    owner = np.repeat(np.arange(len(count)), count)
+    if owner.size == 0:
+        return owner, owner
+    return owner, starts[owner] + np.random.randint(0, lengths[owner])
+
+# method that applies point mutations to every copy in the buffer
+# strategy:
+#   - draw the number of each mutation type for all copies in one call
+#   - draw all positions and replacement bases in one call per type
+#   - substitute in place, mark deletions with a mask and insert additions,
+#     so the output is built in a single pass over the buffer
+# repeated deletions at one position remove consecutive bases, as the
+# sequential string edits did
+# Type: buf - np.ndarray
+#       lengths - np.ndarray
+#       rates - dict
+#       bases - np.ndarray
+def pointMutation(buf, lengths, rates, bases):
+    kinds = [k for k in ('substitution', 'addition', 'deletion') if k in rates]
+    if not kinds or buf.size == 0:
+        return buf, lengths
+    starts = np.cumsum(lengths) - lengths
+    counts = np.random.binomial(lengths[:, None], [rates[k] for k in kinds])
+    events = {k: _positions(starts, lengths, counts[:, i])
+              for i, k in enumerate(kinds)}
+    if 'substitution' in events:
+        pos = events['substitution'][1]
+        buf[pos] = bases[np.random.randint(len(bases), size=pos.size)]
+    keep = np.ones(buf.size, dtype=bool)
+    lengths = lengths.copy()
+    if 'deletion' in events:
+        owner, pos = events['deletion']
+        order = np.argsort(pos, kind='stable')
+        owner, pos = owner[order], pos[order]
+        rank = np.arange(pos.size) - np.searchsorted(owner, owner)
+        shift = owner * 2*(buf.size + 1)
+        pos = np.maximum.accumulate(pos - rank + shift) - shift + rank
+        valid = pos < starts[owner] + lengths[owner]
+        keep[pos[valid]] = False
+        lengths -= np.bincount(owner[valid], minlength=len(lengths))
+    if 'addition' in events:
+        owner, pos = events['addition']
+        new = bases[np.random.randint(len(bases), size=pos.size)]
+        buf = np.insert(buf, pos, new)
+        keep = np.insert(keep, pos, True)
+        lengths += np.bincount(owner, minlength=len(lengths))
+    return buf[keep], lengths
+
+# method to take the slice [x:y] of a copy described by a list of segments
+# of the original buffer
+def _take(segments, x, y):
+    out = list()
+    at = 0
+    for s, e in segments:
+        lo = max(x - at, 0)
+        hi = min(y - at, e - s)
+        if lo < hi:
+            out.append((s + lo, s + hi))
+        at += e - s
+    return out
+
+# method that applies block mutations to every copy in the buffer
+# block events are rare, so only copies that are hit are edited; each edit
+# rewrites a short list of segments and the copy is rebuilt once at the end
+# Type: buf - np.ndarray
+#       lengths - np.ndarray
+#       rates - dict
+#       sizes - np.ndarray, lengths of the templates the copies were made from
+def blockMutation(buf, lengths, rates, sizes):
+    kinds = [k for k in rates if k in ('addition', 'deletion')]
+    if not kinds or buf.size == 0:
+        return buf, lengths
+    counts = np.random.binomial(sizes[:, None], [rates[k] for k in kinds])
+    hit = np.flatnonzero(counts.sum(axis=1))
+    if hit.size == 0:
+        return buf, lengths
+    starts = np.cumsum(lengths) - lengths
+    lengths = lengths.copy()
+    pieces = list()
+    last = 0
+    for i in hit.tolist():
+        s = int(starts[i])
+        e = s + int(lengths[i])
+        pieces.append(buf[last:s])
+        segments = [(s, e)]
+        cuts = np.random.randint(0, sizes[i], size=(counts[i].sum(), 2)).tolist()
+        for kind, (a, b) in zip(np.repeat(kinds, counts[i]), cuts):
+            if kind == 'addition':
+                segments = _take(segments, 0, a) + _take(segments, a, b)*2 + \
+                           _take(segments, b, END)
+            else:
+                segments = _take(segments, 0, a) + _take(segments, b+1, END)
+        pieces.extend(buf[x:y] for x, y in segments)
+        lengths[i] = sum(y - x for x, y in segments)
+        last = e
+    pieces.append(buf[last:])
+    return np.concatenate(pieces), lengths
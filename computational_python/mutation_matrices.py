@@ -0,0 +1,189 @@
+"""
+Mutation Matrices for the Mean Field Model
+Python counterparts of bindif.m, calcDeltaM.m and calcDeltaB.m: the chance
+that a genome of one length is copied to a genome of another, by point and
+by block mutations, over a grid of lengths. Chances below a tolerance are
+dropped, so the point mutation matrix is a sparse band, and it is kept in a
+cache on disk keyed on the grid and the mutation rates
+"""
+
+import os, hashlib
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import LinearOperator
+from scipy.stats import binom
+
+# method to get the chances of each change of length of a genome, as bindif.m
+# strategy:
+#   - the change is additions - deletions, both binomial in the length, so its
+#     distribution is the convolution of the two
+#   - each grid point takes the chance of the changes between it and the
+#     point below; the point at no change takes only the chance of no change,
+#     and the rest of its interval goes to the point below
+# returns one chance per change in z
+# Type: z - np.ndarray, changes of length on the grid, ascending
+#       n - int, length of the genome
+#       p - sequence (point addition, point deletion, block addition, block deletion)
+def bindif(z, n, p):
+    z = np.asarray(z, dtype=float)
+    n = int(round(n))
+    z0 = np.concatenate([[2*z[0] - z[1]], z, [2*z[-1] - z[-2]]])
+    x = np.arange(n + 1)
+    pdf = np.convolve(binom.pmf(x, n, p[0]), binom.pmf(x[::-1], n, p[1]))
+    cdf = np.concatenate([[0], np.cumsum(pdf)])
+    v = np.diff(cdf[np.clip(np.floor(z0).astype(np.int64) + n + 1, 0, 2*n + 1)])
+    if (z < 0).any():
+        ind = np.flatnonzero(z == 0)[0]
+        er = v[ind] - pdf[n]
+        v[ind] -= er
+        v[ind-1] += er
+    return v[:-1]
+
+# method to get the chances of a binomial, for every row, over the values
+# that carry more than tolerance of them
+# returns the first value of each row, and the chances from it on, one row
+# per length, padded with zeros
+# Type: n - np.ndarray of int, lengths
+#       p - float
+#       tolerance - float
+#       reverse - bool, to give the chances from the last value down instead
+def _binomialRows(n, p, tolerance, reverse = False):
+    low = binom.ppf(tolerance, n, p).astype(np.int64)
+    high = binom.isf(tolerance, n, p).astype(np.int64) + 1
+    width = int((high - low).max()) + 1
+    x = (high[:, None] - np.arange(width)) if reverse else (low[:, None] + np.arange(width))
+    return (high if reverse else low), binom.pmf(x, n[:, None], p)
+
+# method to build the point mutation matrix, as calcDeltaM.m
+# row i holds the chances of a genome of length l[i] being copied to each
+# length, as bindif gives them
+# strategy:
+#   - draw up the chances of the additions and of the deletions of every row
+#     at once, over only the values that carry more than tolerance
+#   - convolve them, all rows in one FFT, to get the chances of each change
+#     of length, and sum these up to the cumulative chances
+#   - look the cumulative chances up at the band of grid points each row can
+#     reach, and difference them
+#   - keep the chances above tolerance as a sparse matrix
+# Type: l - np.ndarray, lengths, ascending
+#       ps - sequence (point addition, point deletion, block addition, block deletion)
+#       mode - int, 0 for no mutation
+#       tolerance - float, smallest chance kept
+def calcDeltaM(l, ps, mode = 1, tolerance = 1e-12):
+    l = np.asarray(l, dtype=float)
+    size = len(l)
+    if mode == 0:
+        return sparse.identity(size, format='csr')
+    n = np.round(l).astype(np.int64)
+    lowA, pa = _binomialRows(n, ps[0], tolerance)
+    highD, pd = _binomialRows(n, ps[1], tolerance, reverse=True)
+    width = pa.shape[1] + pd.shape[1] - 1
+    fft = 1 << int(np.ceil(np.log2(width)))
+    pdf = np.fft.irfft(np.fft.rfft(pa, fft)*np.fft.rfft(pd, fft), fft)[:, :width]
+    pdf = np.maximum(pdf, 0)
+    cdf = np.hstack([np.zeros((size, 1)), np.cumsum(pdf, axis=1)])
+    low = lowA - highD
+    # band of grid points each row can reach; always covers i-1 and i
+    i = np.arange(size)
+    first = np.minimum(np.searchsorted(l, l + low, 'left'), np.maximum(i - 1, 0))
+    last = np.maximum(np.searchsorted(l, l + low + width, 'left'), i)
+    last = np.minimum(last, size - 1)
+    band = np.arange(int((last - first).max()) + 1)
+    cols = first[:, None] + band
+    valid = cols <= last[:, None]
+    cols = np.minimum(cols, size - 1)
+    grid = np.concatenate([[2*l[0] - l[1]], l])
+    upper = np.floor(grid[cols + 1] - l[:, None]).astype(np.int64) - low[:, None]
+    lower = np.floor(grid[cols] - l[:, None]).astype(np.int64) - low[:, None]
+    rows = i[:, None]
+    v = cdf[rows, np.clip(upper + 1, 0, width)] - cdf[rows, np.clip(lower + 1, 0, width)]
+    # the point at no change takes only the chance of no change
+    at = i[1:] - first[1:]
+    zero = np.where((0 <= -low[1:]) & (-low[1:] < width),
+                    pdf[i[1:], np.clip(-low[1:], 0, width - 1)], 0)
+    v[i[1:], at - 1] += v[i[1:], at] - zero
+    v[i[1:], at] = zero
+    keep = valid & (v >= tolerance)
+    return sparse.csr_matrix((v[keep], (np.broadcast_to(rows, v.shape)[keep], cols[keep])),
+                             shape=(size, size))
+
+# block mutation matrix, as calcDeltaB.m
+# Row i takes row[j]/(2i) for each length j up to 2i, with the diagonal set so
+# the off diagonal chances into each length are made up to 1. In calcDeltaB.m
+# the row index is written 2i, which MATLAB reads as the imaginary unit,
+# zeroing every row; it is taken here as 2*i, as meant. Only row[j] and the
+# diagonal are kept, and products are running sums, so a fine grid takes
+# O(lengths) memory and time rather than O(lengths^2).
+# Object contains:
+#   row - np.ndarray, chance of both a block addition and deletion at each length
+#   diagonal - np.ndarray, diagonal less row[i]/(2i)
+class BlockMatrix(LinearOperator):
+
+    # Type: l - np.ndarray, lengths, ascending
+    #       ps - sequence (point addition, point deletion, block addition, block deletion)
+    def __init__(self, l, ps):
+        l = np.asarray(l, dtype=float)
+        self.row = (1 - binom.pmf(0, l, ps[2]))*(1 - binom.pmf(0, l, ps[3]))
+        self.i = np.arange(1, len(l) + 1)
+        tail = np.cumsum((1/(2*self.i))[::-1])[::-1]
+        self.diagonal = 1 - self.row*(tail[(self.i + 1)//2 - 1] - 1/(2*self.i))
+        super().__init__(float, (len(l), len(l)))
+
+    def _matmat(self, x):
+        total = np.cumsum(self.row[:, None]*x, axis=0)[np.minimum(2*self.i, len(self.i)) - 1]
+        return total/(2*self.i[:, None]) + self.diagonal[:, None]*x
+
+    def _rmatmat(self, x):
+        tail = np.cumsum((x/(2*self.i[:, None]))[::-1], axis=0)[::-1]
+        return self.row[:, None]*tail[(self.i + 1)//2 - 1] + self.diagonal[:, None]*x
+
+    def _matvec(self, x):
+        return self._matmat(x.reshape(-1, 1)).ravel()
+
+    def _rmatvec(self, x):
+        return self._rmatmat(x.reshape(-1, 1)).ravel()
+
+    def _transpose(self):
+        return self._adjoint()
+
+    def toarray(self):
+        return self._matmat(np.eye(self.shape[0]))
+
+# end of class BlockMatrix
+
+# method to build the block mutation matrix, as calcDeltaB.m
+# below mode 2 there are no block mutations
+# Type: l - np.ndarray, lengths, ascending
+#       ps - sequence (point addition, point deletion, block addition, block deletion)
+#       mode - int
+def calcDeltaB(l, ps, mode = 2):
+    if abs(mode) >= 2:
+        return BlockMatrix(l, ps)
+    return sparse.identity(len(l), format='csr')
+
+# method to hash the settings of a point mutation matrix
+def matrixKey(l, ps, mode, tolerance):
+    text = repr(([float(p) for p in ps], int(mode), float(tolerance)))
+    return hashlib.sha256(np.asarray(l, dtype=float).tobytes() + text.encode('utf-8')).hexdigest()
+
+# method to get both mutation matrices, taking the point mutation matrix from
+# the cache if it was built before; the block matrix takes no time to build
+# Type: l - np.ndarray, lengths, ascending
+#       ps - sequence (point addition, point deletion, block addition, block deletion)
+#       mode - int
+#       cache - str, folder of the cache, or None for no cache
+#       tolerance - float, smallest chance kept
+def matrices(l, ps, mode = 2, cache = 'MatrixCache', tolerance = 1e-12):
+    fileName = None
+    if cache is not None and mode != 0:
+        fileName = os.path.join(cache, matrixKey(l, ps, mode, tolerance) + '.npz')
+    if fileName is not None and os.path.isfile(fileName):
+        d = sparse.load_npz(fileName).tocsr()
+    else:
+        d = calcDeltaM(l, ps, mode, tolerance)
+        if fileName is not None:
+            os.makedirs(cache, exist_ok=True)
+            with open(fileName + '.part', 'wb') as f:
+                sparse.save_npz(f, d)
+            os.replace(fileName + '.part', fileName)
+    return d, calcDeltaB(l, ps, mode)
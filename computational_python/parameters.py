@@ -17,11 +17,27 @@ parameters = {
     'EmptyPool' : 0.001,
     'PointMutations' : {'substitution' : 0.01, 'addition' : 0.01, 'deletion' : 0.01},
     'BlockMutations' : {'addition' : 5e-6, 'deletion' : 5e-6},
+    'Engine' : 'Loop', # 'Loop', 'Batch' or 'Event'
+    'TemplateStore' : 'List', # 'List', 'Packed' (2 bits per base) or 'Multiset'
+    'NegativeCull' : 'shift', # 'shift', 'clip' or 'raise'
+    'History' : 'Full', # 'Full' or 'Columnar' (bounded memory)
+    'HistoryBinWidth' : 1, # Columnar: width of the length histogram bins
+    'HistoryChunks' : None, # Columnar: folder to write length histograms to
+    'ProgressSnapshots' : 16, # Columnar: Progress snapshots kept per epoch
+    'Convergence' : None, # None, 'Median', 'Histogram' or 'Uniques'
+    'ConvergenceTolerance' : 0.01, # largest change per epoch counted as steady
+    'ConvergenceWindow' : 10, # steady epochs in a row before the run stops
+    'Hybrid' : None, # None, or when the mean field model hands over: 'Cycles', 'Number' or 'Median'
+    'HybridSwitch' : 100, # Hybrid: cycles run by the mean field ('Cycles'), or fewest genomes it runs with ('Number')
+    'HybridMaxLength' : 2000, # Hybrid: longest length the mean field model holds
+    'HybridStep' : 1, # Hybrid: copies the shortest genome makes between draws of lengths with less than one genome
+    'HybridCache' : None, # Hybrid: folder to cache the mutation matrix in, or None for no cache
     # for SptSim (Spatial Functional Behaviour)
     'Epochs' : 400,
     'ShufflePercent' : 100,
     'ShuffleType': 'ComplexPref',
     'Size' : (2,2),
     'Changes' : ('+A','+G','+C','+U'),
-    'ChangeValue' : 1.5
+    'ChangeValue' : 1.5, # one value, or one per cell
+    'Topology' : 'All' # 'All', 'VonNeumann', 'Moore', 'VonNeumannTorus', 'MooreTorus', or a dict of cell to neighbours
     }
@@ -0,0 +1,171 @@
+"""
+Replicate Ensembles of Spiegelman's Monster Simulation
+Runs many independent replicates of the same parameters together, so that
+the NumPy work of every replicate is done in shared batches
+"""
+
+import os, random, time
+import numpy as np
+import spiegelman
+import convergence
+import engines
+import sampling
+
+# replicate ensemble runner
+# Each replicate is a SpSim with its own templates, pool, replicators and
+# history. Replication is event driven, as in the Event engine: every
+# replicate moves to its own next completion, but the copies of all of them
+# are made in one batch of the mutation kernels, and the cull scores of all
+# of them are taken in one call.
+# Object contains:
+#   parameters - simulation parameters shared by every replicate
+#   sims - list of SpSim, one per replicate
+class ReplicateRunner(object):
+
+    # Type: parameters - dict
+    #       number - int, number of replicates
+    def __init__(self, parameters, number):
+        self.parameters = dict(parameters)
+        self.sims = [spiegelman.SpSim(_Settings(self.parameters)) for n in range(number)]
+
+    # histories of the replicates, in order
+    @property
+    def histories(self):
+        return [s.history for s in self.sims]
+
+    # method to complete one iteration of every active replicate
+    # strategy:
+    #   - keep the tick each replicator finishes on in a replicates x
+    #     replicators array, and step every replicate to its earliest tick
+    #   - let the replicators that finish choose templates, replicate by
+    #     replicate, and make all of their copies in one batch
+    #   - settle each replicate's copies against its own pool; a replicate
+    #     whose pool empties, or that runs out of ticks, drops out
+    # a replicate that chose alone winds the random stream back when its pool
+    # empties, as the engines do; with several, the choices of the others
+    # follow its own in the stream, so every choice stands
+    # Type: iteration - int
+    #       progress - bool
+    #       active - list of replicate indices
+    def doIteration(self, iteration, progress, active):
+        workers = [engines.BatchEngine(self.sims[r]) for r in active]
+        maxReplications = int(self.parameters['MaxReplications'])
+        size = workers[0].size if workers else 0
+        due = np.zeros((len(workers), size), dtype=np.int64)
+        copies = [[None]*size for w in workers]
+        live = list()
+        for j, w in enumerate(workers):
+            if not w.sim.pool.isLow():
+                live.append(j)
+            elif maxReplications > 0:
+                w.sim.history['EarlyQuit'].append((iteration, 0))
+        while live:
+            ticks = due[live].min(axis=1).tolist()
+            batch = list()
+            state = random.getstate()
+            for j, tick in zip(live, ticks):
+                if tick < maxReplications:
+                    done = np.flatnonzero(due[j] == tick).tolist()
+                    batch.append((j, tick, done) + workers[j].choose(done, copies[j], progress))
+            if not batch:
+                break
+            fresh, counts = workers[0].synthesise([c for b in batch for c in b[3]])
+            at = 0
+            live = list()
+            for j, tick, done, chosen, marks, stamps in batch:
+                n = len(chosen)
+                quit = workers[j].settle(tick, done, copies[j], fresh[at:at+n],
+                                         counts[at:at+n], marks, stamps, progress,
+                                         state if len(batch) == 1 else None)
+                at += n
+                if quit is not None:
+                    if quit < maxReplications:
+                        workers[j].sim.history['EarlyQuit'].append((iteration, quit))
+                    continue
+                due[j, done] = tick + np.maximum(1, [len(copies[j][r]) for r in done])
+                live.append(j)
+
+    # method to cull every active replicate
+    # the templates of all replicates are scored in one call, and each is
+    # then sampled on its own, as in SpSim.transfer; replicates with other
+    # template stores are culled by SpSim.transfer
+    # Type: cull - function or CullScorer
+    #       active - list of replicate indices
+    def transfer(self, cull, active):
+        sims = [self.sims[r] for r in active if isinstance(self.sims[r].templates, list)]
+        for r in active:
+            if not isinstance(self.sims[r].templates, list):
+                self.sims[r].transfer(cull)
+        population = [t for s in sims for t in s.templates]
+        if hasattr(cull, 'scores'):
+            scores = np.asarray(cull.scores(population))
+        else:
+            scores = np.array([cull(x) for x in population])
+        negative = self.parameters.get('NegativeCull', 'shift')
+        at = 0
+        for s in sims:
+            n = len(s.templates)
+            number = int(n*0.01*self.parameters['TransferPercent'])
+            chosen = sampling.weightedSample(scores[at:at+n], number, negative)
+            s.templates = [s.templates[i] for i in chosen]
+            at += n
+            for replicator in s.replicators:
+                replicator.release()
+
+    # method to run every replicate, as SpSim.run does for one
+    # a replicate stops early on its own if its Convergence monitor says so
+    # Type: printing - int
+    #       cull - function or CullScorer
+    #       progress - bool
+    def run(self, printing = -1, cull = None, progress = False):
+        if cull == None:
+            spiegelman.importlib.reload(spiegelman.cull_function)
+            for s in self.sims:
+                s.parameters['CullFunction'] = spiegelman.cull_function.decision
+            cull = spiegelman.cull_function.CullScorer()
+        start = time.time()
+        monitors = [convergence.ConvergenceMonitor(s.parameters) for s in self.sims]
+        active = list(range(len(self.sims)))
+        for iterations in range(int(self.parameters['Cycles'])):
+            if not active:
+                break
+            for r in active:
+                if progress:
+                    self.sims[r].history['Progress'].append([])
+                self.sims[r].pool.initialise()
+            self.doIteration(iterations, progress, active)
+            for r in active:
+                self.sims[r].addHistory()
+            if (printing == 1):
+                print('Iteration: ', iterations)
+            self.transfer(cull, active)
+            still = list()
+            for r in active:
+                if progress:
+                    self.sims[r].addProgress()
+                if monitors[r].check(self.sims[r].history):
+                    self.sims[r].history['Converged'] = [(iterations, monitors[r].reason)]
+                else:
+                    still.append(r)
+            active = still
+        if (printing == -1):
+            print('Elapsed Time: ', round(time.time()-start,3), 's')
+        return self.histories
+
+    # method to write each replicate to folder/<n>.SIMHIST
+    # Type: folder - str
+    def export_to(self, folder):
+        if not os.path.isdir(folder):
+            os.mkdir(folder)
+        for n, s in enumerate(self.sims):
+            s.export_to(folder + '/' + str(n) + '.SIMHIST')
+
+# end of class ReplicateRunner
+
+# the settings a replicate is made from: parameters, and no templates yet
+class _Settings(object):
+
+    def __init__(self, parameters):
+        self.parameters = parameters
+
+# end of class _Settings
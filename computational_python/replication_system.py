@@ -0,0 +1,201 @@
+"""
+Mean Field Model of Spiegelman's Monster
+Python counterpart of replicationsystem.m, transfer.m and rSysSolve.m. The
+number of genomes of each length on a grid of lengths grows as
+    dn/dt = B'D'((n/sum(n))*k*r./l).*rj
+through an epoch, and each transfer between epochs keeps a fraction gamma of
+the genomes, weighted by l^kappa. It runs in a fraction of the time of a
+SpSim, so it can be used to screen parameters
+"""
+
+import time
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import LinearOperator, aslinearoperator
+from scipy.integrate import solve_ivp
+from scipy.stats import norm
+import mutation_matrices
+
+# method to make the parameters of replicationsystemSolver.m
+# the initial genomes are normally distributed, cut off span sigmas from the
+# mean, on a grid of lengths reaching dist times as far
+# Type: mean - number, mean initial length
+#       sigma - number, std. deviation of initial lengths
+#       span - number, sigmas from the mean with initial genomes
+#       spacing - number, grid spacing in sigmas
+#       dist - number, span*sigmas from the mean covered by the grid
+#       number - number, initial genomes
+def defaultParameters(mean = 1001, sigma = 100, span = 2.5, spacing = 0.4, dist = 4,
+                      number = 1000):
+    l = np.arange(mean - span*sigma*dist, mean + span*sigma*dist + spacing*sigma/2,
+                  spacing*sigma)
+    return {
+        'mode' : 2, # 0 no mutation, 1 point, 2 point and block; < 0 no transfer
+        'l' : l,
+        'n0' : number*norm.pdf(l, mean, sigma)*(abs(l - mean) <= span*sigma),
+        'tlims' : (0, 1e2), # time span of an epoch
+        'epochs' : 400,
+        'ps' : (0.01, 0.01, 5e-6, 5e-6), # point addition, point deletion, block addition, block deletion
+        'k' : 1, # replication constant
+        'r' : 10, # replicators
+        'reject' : 45, # genomes no longer than this are not copied
+        'kappa' : [0, 1, 2, 3, 4, 5], # transfer weights l^kappa
+        'gamma' : np.arange(1, 10)*0.05 # fraction kept at each transfer
+        }
+
+# method to build the system operator A, so that dn/dt = A(n/sum(n))
+# A = diag(rj) B'D' diag(k*r/l), held sparse with exact zeros dropped; with a
+# BlockMatrix for B it is kept as the product of the two instead
+# Type: d - matrix, point mutations
+#       b - matrix or BlockMatrix, block mutations
+#       l - np.ndarray, lengths
+#       k - number
+#       r - number
+#       rj - np.ndarray of bool, lengths that are copied
+def systemOperator(d, b, l, k, r, rj):
+    rj = sparse.diags(np.asarray(rj, dtype=float))
+    scaled = sparse.csr_matrix(sparse.csr_matrix(d).T @ sparse.diags(k*r/np.asarray(l, dtype=float)))
+    scaled.eliminate_zeros()
+    if isinstance(b, LinearOperator):
+        return aslinearoperator(rj) @ b.T @ aslinearoperator(scaled)
+    a = sparse.csr_matrix(rj @ sparse.csr_matrix(b).T @ scaled)
+    a.eliminate_zeros()
+    return a
+
+# method to get dn/dt, as replicationsystem.m
+# n can also hold one state per column, for the vectorized solver
+# Type: t - float
+#       n - np.ndarray
+#       a - sparse matrix or operator, from systemOperator
+def replicationSystem(t, n, a):
+    return a @ (n/n.sum(axis=0))
+
+# method to get dn/dt of every column of a stacked state, flattened as the
+# solver needs it
+# Type: t - float
+#       y - np.ndarray, lengths x columns, flattened
+#       a - sparse matrix or operator, from systemOperator
+#       shape - (lengths, columns)
+def gridSystem(t, y, a, shape):
+    n = y.reshape(shape)
+    return (a @ (n/n.sum(axis=0))).ravel()
+
+# method to transfer genomes between epochs, as transfer.m
+# keeps g of the genomes, weighted towards each length by l^kappa
+# Type: l - np.ndarray
+#       n - np.ndarray, one state, or one state per column
+#       g - number, or one per column
+#       kappa - number, or one per column
+def transfer(l, n, g, kappa):
+    l = np.asarray(l, dtype=float)
+    if n.ndim > 1:
+        l = l[:, None]
+    ws = l**kappa*n
+    return g*n.sum(axis=0)*ws/ws.sum(axis=0)
+
+# method to solve one parameter point through every epoch
+# returns the times and the state at each, one row per time; times carry on
+# from epoch to epoch, so the end of one and the start of the next share a time
+# Type: a - sparse matrix or operator, from systemOperator
+#       l - np.ndarray
+#       n0 - np.ndarray
+#       gamma - number
+#       kappa - number
+#       tlims - (start, end) of an epoch
+#       epochs - int
+#       mode - int, < 0 for no transfer
+#       points - int, states kept per epoch evenly spaced in time, or None
+#                to keep each step of the solver, as ode45 does
+def solve(a, l, n0, gamma, kappa, tlims, epochs, mode = 2, points = None):
+    n = np.asarray(n0, dtype=float)
+    keep = None if points is None else np.linspace(tlims[0], tlims[1], points)
+    times = list()
+    hist = list()
+    end = 0
+    for stop in range(epochs):
+        sol = solve_ivp(replicationSystem, tlims, n, method='RK45', t_eval=keep,
+                        args=(a,), vectorized=True, rtol=1e-3, atol=1e-6)
+        times.append(end + sol.t)
+        hist.append(sol.y.T)
+        end = times[-1][-1]
+        n = sol.y[:, -1]
+        if mode >= 0:
+            n = transfer(l, n, gamma, kappa)
+    return np.concatenate(times), np.concatenate(hist)
+
+# method to solve every pair of kappa and gamma at once
+# strategy:
+#   - stack the state of every pair as a column of one lengths x pairs
+#     matrix, so each step of the solver is one sparse product for all pairs
+#   - after each epoch transfer every column with its own kappa and gamma
+# every pair shares the solver's steps, so all share one array of times
+# returns the times, and hists indexed [kappa, gamma, time, length]
+# Type: a - sparse matrix or operator, from systemOperator
+#       l - np.ndarray
+#       n0 - np.ndarray
+#       gammas - sequence
+#       kappas - sequence
+#       tlims - (start, end) of an epoch
+#       epochs - int
+#       mode - int, < 0 for no transfer
+#       points - int, states kept per epoch evenly spaced in time, or None
+#                to keep each step of the solver
+def solveGrid(a, l, n0, gammas, kappas, tlims, epochs, mode = 2, points = None):
+    shape = (len(l), len(kappas)*len(gammas))
+    kappa = np.repeat(np.asarray(kappas, dtype=float), len(gammas))
+    g = np.tile(np.asarray(gammas, dtype=float), len(kappas))
+    n = np.repeat(np.asarray(n0, dtype=float)[:, None], shape[1], axis=1)
+    keep = None if points is None else np.linspace(tlims[0], tlims[1], points)
+    times = list()
+    hist = list()
+    end = 0
+    for stop in range(epochs):
+        sol = solve_ivp(gridSystem, tlims, n.ravel(), method='RK45', t_eval=keep,
+                        args=(a, shape), rtol=1e-3, atol=1e-6)
+        times.append(end + sol.t)
+        hist.append(sol.y.reshape(shape + (-1,)))
+        end = times[-1][-1]
+        n = hist[-1][:, :, -1]
+        if mode >= 0:
+            n = transfer(l, n, g, kappa)
+    hists = np.concatenate(hist, axis=2).reshape(len(l), len(kappas), len(gammas), -1)
+    return np.concatenate(times), hists.transpose(1, 2, 3, 0)
+
+# method to solve every pair of kappa and gamma, as rSysSolve.m
+# returns the times, and hists indexed [kappa, gamma, time, length]
+# Type: d - matrix, point mutations
+#       b - matrix, block mutations
+#       gamma - sequence
+#       params - dict, as made by defaultParameters
+#       printing - bool
+#       points - int, states kept per epoch, or None for each solver step
+def rSysSolve(d, b, gamma, params, printing = False, points = None):
+    start = time.time()
+    l = np.asarray(params['l'], dtype=float)
+    a = systemOperator(d, b, l, params['k'], params['r'], l > params['reject'])
+    times, hists = solveGrid(a, l, params['n0'], gamma, params['kappa'], params['tlims'],
+                             params['epochs'], params['mode'], points)
+    if printing:
+        print('Elapsed Time: ', round(time.time()-start,3), 's')
+    return times, hists
+
+# method to get the mean length at each time, as theOtherPlottingFunction.m
+# Type: hist - np.ndarray, lengths along the last axis
+#       l - np.ndarray
+def averageLength(hist, l):
+    return hist @ np.asarray(l, dtype=float)/hist.sum(axis=-1)
+
+# convenience method to build the mutation matrices and solve, as
+# replicationsystemSolver.m
+# Type: params - dict, or None for the defaults
+#       printing - bool
+#       points - int, states kept per epoch, or None for each solver step
+#       cache - str, folder of the mutation matrix cache, or None
+def go(params = None, printing = True, points = None, cache = 'MatrixCache'):
+    if params == None:
+        params = defaultParameters()
+    start = time.time()
+    d, b = mutation_matrices.matrices(params['l'], params['ps'], params['mode'], cache)
+    if printing:
+        print('Mutation Matrix Time: ', round(time.time()-start,3), 's')
+    return rSysSolve(d, b, params['gamma'], params, printing, points)
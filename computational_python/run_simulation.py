@@ -7,19 +7,21 @@ parametric analysis
 import os, time, ast, importlib, pylab
 import numpy as np
 import spiegelman
+import sweep
+import ensemble
+import manifest
 import parameters as defaults
 from matplotlib.collections import LineCollection
 from matplotlib.colors import colorConverter as colourConverter
 
 
-def multipleRuns(number, inputs = None):
+# runs are made in parallel on workers processes (None for one per core),
+# and handles to their SIMHIST files are returned; given a cache folder,
+# seeded runs made before are taken from it (see sweep.execute)
+def multipleRuns(number, inputs = None, workers = None, seed = None, cache = None):
     sim_folder = 'Sim_' + time.strftime('%d%m%y_%H%M%S')
     os.mkdir(sim_folder)
-    sims_list = list()
-    for N in range(number):
-        sims_list.append(spiegelman.go(inputs, 0, 
-                                       sim_folder + '/' + str(N) + '.SIMHIST'))
-    return sims_list
+    return sweep.execute([inputs]*number, sim_folder, workers, seed, cache=cache)
     
 # temp class
 class pSet(object):
@@ -40,7 +42,7 @@ class pSet(object):
         return self.parameters
     
 # interactive parameter runs
-def parameterRuns():
+def parameterRuns(workers = None, seed = None, cache = None):
     importlib.reload(defaults)
     sims_list = list()
     
@@ -104,9 +106,7 @@ def parameterRuns():
     try:
         sim_folder = 'Sim_' + time.strftime('%d%m%y_%H%M%S')
         os.mkdir(sim_folder)
-        for n in range(totalRuns):
-            name = sim_folder + '/' + str(n) + '.SIMHIST'
-            sims_list.append(spiegelman.go(psSet[n], -1, name))
+        sims_list = sweep.execute(psSet, sim_folder, workers, seed, cache=cache)
     except Exception as ex:
         print(ex)
     finally:
@@ -153,47 +153,58 @@ def parameterRuns():
 #    return [indices,values]
 """    
 def plotComparison(paramOutput, heat = False, comp_pnt = None):
-    pList = paramOutput[0]
-    sList = paramOutput[1]
     multigraph = False
+    if isinstance(paramOutput, ensemble.Ensemble):
+        #read the per epoch means straight from the ensemble
+        if comp_pnt == None:
+            print('Categories', paramOutput.categories())
+            comp_pnt = input('What category to compare?  ')
+        if comp_pnt not in paramOutput.categories():
+            print('Key Error, Quitting')
+            return
+        ind_pnt = paramOutput.label
+        indices, epochs, values = paramOutput.table(comp_pnt)
+    else:
+        pList = paramOutput[0]
+        sList = paramOutput[1]
     
-    #determine output to compare
-    if comp_pnt == None:
-        print('Categories', list(sList[0].history.keys()))
-        comp_pnt = input('What category to compare?  ')
-    if comp_pnt not in sList[0].history.keys():
-        print('Key Error, Quitting')
-        return
+        #determine output to compare
+        if comp_pnt == None:
+            print('Categories', list(sList[0].history.keys()))
+            comp_pnt = input('What category to compare?  ')
+        if comp_pnt not in sList[0].history.keys():
+            print('Key Error, Quitting')
+            return
     
-    #determine parameter to compare by, and its values
-    ind_pnt = [k for k in pList[1].parameters
-               if pList[1].parameters[k] != pList[0].parameters[k]]
-    if (len(ind_pnt) != 1):
-        print('Parameters that Changed:', ind_pnt)
-        print('All Parameters:', [k for k in pList[1].parameters])
-        ind_pnt = input('Which parameter to index with?  ')
-        indices = [p.parameters[ind_pnt] for p in pList]
-    elif (len(ind_pnt[0]) != 1):
-        print('Parameters that Changed:', ind_pnt[0])
-        print('Sub-Parameters:', [k for k in pList[0].parameters[ind_pnt[0]] 
-                                  if (pList[0].parameters[ind_pnt[0]][k] != 
-                                   pList[1].parameters[ind_pnt[0]][k])])
-        sub_ind = input('Which sub-parameter to index with?  ')
-        indices = [p.parameters[ind_pnt[0]][sub_ind] for p in pList]
-        ind_pnt = ind_pnt[0] + '.' + sub_ind
-    else:
-        ind_pnt = ind_pnt[0]
-        print('Parameter: ', ind_pnt)
-        indices = [p.parameters[ind_pnt] for p in pList]
+        #determine parameter to compare by, and its values
+        ind_pnt = [k for k in pList[1].parameters
+                   if pList[1].parameters[k] != pList[0].parameters[k]]
+        if (len(ind_pnt) != 1):
+            print('Parameters that Changed:', ind_pnt)
+            print('All Parameters:', [k for k in pList[1].parameters])
+            ind_pnt = input('Which parameter to index with?  ')
+            indices = [p.parameters[ind_pnt] for p in pList]
+        elif (len(ind_pnt[0]) != 1):
+            print('Parameters that Changed:', ind_pnt[0])
+            print('Sub-Parameters:', [k for k in pList[0].parameters[ind_pnt[0]] 
+                                      if (pList[0].parameters[ind_pnt[0]][k] != 
+                                       pList[1].parameters[ind_pnt[0]][k])])
+            sub_ind = input('Which sub-parameter to index with?  ')
+            indices = [p.parameters[ind_pnt[0]][sub_ind] for p in pList]
+            ind_pnt = ind_pnt[0] + '.' + sub_ind
+        else:
+            ind_pnt = ind_pnt[0]
+            print('Parameter: ', ind_pnt)
+            indices = [p.parameters[ind_pnt] for p in pList]
     
-    #determine values
-    epochs = [range(s.parameters['Cycles']) for s in sList]
-    if isinstance(sList[0].history[comp_pnt][0],dict):
+        #determine values
+        epochs = [range(s.parameters['Cycles']) for s in sList]
+        if isinstance(sList[0].history[comp_pnt][0],dict):
         
-        values = [[[k[j] for j in k] for k in s.history[comp_pnt]] for s in sList]
-        multigraph = True
-    else:
-        values = [s.history[comp_pnt] for s in sList]
+            values = [[[k[j] for j in k] for k in s.history[comp_pnt]] for s in sList]
+            multigraph = True
+        else:
+            values = [s.history[comp_pnt] for s in sList]
     
     if heat == True:
         heatMap(comp_pnt, ind_pnt, indices, epochs, values)
@@ -229,13 +240,25 @@ def plotComparison(paramOutput, heat = False, comp_pnt = None):
     spiegelman.plt.show()
     return [indices,vert]
     
-def getOutputs(folder):
+# runs are listed from the folder's manifest, and only those matching where
+# (see manifest.Index.select) are loaded: lazily, or up front on workers threads
+def getOutputs(folder, where = None, workers = None):
     start = time.time()
+    index = manifest.Index(folder)
     outputs = list([list(),list()])
+    outputs[1] = index.load(index.select(where), workers)
+    outputs[0] = [pSet(s.parameters) for s in outputs[1]]
+    print('Outputs Obtained in', round(time.time() - start, 3), 's')
+    return outputs
+
+# streaming version of getOutputs: each run is added to an Ensemble, keyed on
+# its value of label, and dropped before the next is read
+def getEnsemble(folder, label = None):
+    start = time.time()
+    outputs = ensemble.Ensemble(label)
     for fileName in os.listdir(folder):
         if fileName[-8:] == '.SIMHIST':
-            outputs[1].append(spiegelman.SpSim(folder+'/'+fileName))
-            outputs[0].append(pSet(outputs[1][-1].parameters))
+            outputs.addAll([spiegelman.SpSim(folder+'/'+fileName)])
     print('Outputs Obtained in', round(time.time() - start, 3), 's')
     return outputs
             
@@ -252,7 +275,10 @@ def customRun(specs = None):
         s = spiegelman.go(pSet(ps))
     return s
 
-def heatMap(comp_pnt, ind_pnt, indices, epochs, values):
+# indices can be an Ensemble, which gives the indices, epochs and values
+def heatMap(comp_pnt, ind_pnt, indices, epochs = None, values = None):
+    if isinstance(indices, ensemble.Ensemble):
+        indices, epochs, values = indices.table(comp_pnt)
     spiegelman.plt.close()
     indices = np.tile(np.array(indices),(len(epochs[0]),1)).transpose()
     epochs = np.array(epochs)
@@ -272,7 +298,7 @@ def heatDists(outs,folder):
         fm.window.showMaximized()
         pylab.savefig(folder + '/Dists/'+ str(outs[1].index(i)) + '.png')
         
-def cull_runs(ns = None, lims = None, plot = False):
+def cull_runs(ns = None, lims = None, plot = False, workers = None, seed = None, cache = None):
     if ns == None:
         ns = int(input('Enter number of runs: '))
     if lims == None:
@@ -283,19 +309,17 @@ def cull_runs(ns = None, lims = None, plot = False):
         ulim = max(lims)
     ps = np.transpose([np.linspace(llim[i],ulim[i], num=ns) for i in range(len(llim))])
     
-    ss = list()
+    importlib.reload(defaults)
+    psSet = list()
+    culls = list()
     outFolder = time.strftime('%d%m%y_%H%M')
     os.mkdir(outFolder)
     for p in ps:
-        def cullfn(x):
-            return spiegelman.cull_function.cull_function(x,None,p)
-            
         print('p = ', p)    
-        out = outFolder + '/' + time.strftime('%d%m%y_%H%M%S.SIMHIST')
-        ss.append(spiegelman.SpSim())
-        ss[-1].parameters['CullParameter'] = tuple(p)
-        ss[-1].run(cull = cullfn)
-        ss[-1].export_to(out)
+        psSet.append(pSet(defaults.parameters))
+        psSet[-1].set('CullParameter', tuple(p))
+        culls.append(spiegelman.cull_function.CullScorer(None, p))
+    ss = sweep.execute(psSet, outFolder, workers, seed, culls, cache=cache)
 
     if plot:
         cplotting(ss, outFolder)
@@ -0,0 +1,61 @@
+"""
+Weighted Sampling for the Transfer Step
+Draws survivors without replacement, with probability proportional to their
+cull scores, in O(n) time and returns their indices
+"""
+
+import numpy as np
+
+# method to get a numpy Generator seeded from the global numpy random state,
+# so np.random.seed still fixes draws that need the newer Generator methods
+def generator():
+    return np.random.default_rng(np.random.randint(2**63, dtype=np.int64))
+
+# method to turn cull scores into sampling weights
+# negative scores are handled by the policy:
+#   'shift' - add a constant so the lowest score is zero
+#   'clip'  - treat negative scores as zero
+#   'raise' - raise a ValueError
+# Type: scores - array like
+#       negative - str
+def weightsOf(scores, negative = 'shift'):
+    weights = np.asarray(scores, dtype=float)
+    if np.isnan(weights).any():
+        raise ValueError('Cull scores contain NaN')
+    if weights.size and weights.min() < 0:
+        if negative == 'shift':
+            weights = weights - weights.min()
+        elif negative == 'clip':
+            weights = np.maximum(weights, 0)
+        elif negative == 'raise':
+            raise ValueError('Negative cull scores are not allowed')
+        else:
+            raise ValueError('Unknown negative score policy: ' + str(negative))
+    return weights
+
+# method to draw k indices without replacement, weighted by score
+# strategy:
+#   - give each positive weight an exponential key E/w (Efraimidis-Spirakis);
+#     the k smallest keys are a weighted sample without replacement, with the
+#     same distribution as drawing one at a time and renormalising
+#   - find the k smallest with a partial selection rather than a sort
+#   - if fewer than k weights are positive, take all of them and fill the
+#     rest uniformly from the zero weights
+# returns the chosen indices in ascending order
+# Type: scores - array like
+#       k - int
+#       negative - str
+def weightedSample(scores, k, negative = 'shift'):
+    weights = weightsOf(scores, negative)
+    n = weights.size
+    if not 0 <= k <= n:
+        raise ValueError('Cannot take ' + str(k) + ' of ' + str(n) + ' templates')
+    positive = np.flatnonzero(weights > 0)
+    if positive.size <= k:
+        zeros = np.flatnonzero(weights == 0)
+        fill = np.random.choice(zeros, k - positive.size, replace=False)
+        return np.sort(np.concatenate([positive, fill]))
+    keys = np.random.standard_exponential(positive.size)/weights[positive]
+    if k == 0:
+        return positive[:0]
+    return np.sort(positive[np.argpartition(keys, k-1)[:k]])
@@ -0,0 +1,304 @@
+"""
+Binary History Files for Spiegelman's Monster Simulation
+A SIMHIST file holds typed arrays for the history categories and the packed
+templates, followed by a header describing them. Loading a file only reads
+the header; each category is memory mapped and decoded when first accessed.
+The old text format can still be read, and converted with convert
+"""
+
+import ast
+import numpy as np
+import template_arena
+
+MAGIC = b'SIMHIST\x01'
+
+# method to tell if a file is a binary SIMHIST file
+# Type: fileName - str
+def isBinary(fileName):
+    with open(fileName, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+# method to make a value safe to write as a literal, functions are stored by name
+def _plain(value):
+    try:
+        ast.literal_eval(repr(value))
+        return value
+    except (ValueError, SyntaxError):
+        return getattr(value, '__name__', repr(value))
+
+# writer of the arrays of a SIMHIST file
+# Object contains:
+#   f - open binary file
+class _Writer(object):
+
+    def __init__(self, f):
+        self.f = f
+
+    # method to pad the file to a multiple of 8 bytes
+    def _align(self):
+        self.f.write(b'\0' * (-self.f.tell() % 8))
+
+    # returns the (offset, dtype, shape) of the array once written
+    # Type: array - np.ndarray
+    def array(self, array):
+        array = np.ascontiguousarray(array)
+        self._align()
+        offset = self.f.tell()
+        self.f.write(array.tobytes())
+        return (offset, array.dtype.str, array.shape)
+
+    # method to write a sequence of rows one after the other
+    # returns the description of the values, and the length of each row
+    # Type: rows - iterable of sequences
+    #       dtype - str
+    def rows(self, rows, dtype):
+        self._align()
+        offset = self.f.tell()
+        sizes = list()
+        for row in rows:
+            row = np.asarray(row, dtype=dtype)
+            self.f.write(row.tobytes())
+            sizes.append(row.size)
+        return (offset, np.dtype(dtype).str, (int(sum(sizes)),)), sizes
+
+# end of class _Writer
+
+# method to describe and write one history category
+# returns (kind, meta, arrays) for the header
+def _category(writer, name, value):
+    if name == 'Pool' and value and isinstance(value[0], dict):
+        elements = list(value[0])
+        return ('pool', elements, {'values': writer.array(
+            np.array([[d[e] for e in elements] for d in value]))})
+    elif name == 'Lengths':
+        values, sizes = writer.rows(value, np.int32)
+        return ('ragged', None, {'values': values,
+                                 'sizes': writer.array(np.array(sizes, dtype=np.int64))})
+    elif name == 'Progress':
+        epochs = list()
+        def snapshots():
+            for epoch in value:
+                epochs.append(0)
+                for snapshot in epoch:
+                    epochs[-1] += 1
+                    yield snapshot
+        values, sizes = writer.rows(snapshots(), np.int32)
+        return ('nested', None, {'values': values,
+                                 'sizes': writer.array(np.array(sizes, dtype=np.int64)),
+                                 'epochs': writer.array(np.array(epochs, dtype=np.int64))})
+    array = np.asarray(list(value))
+    if array.dtype.kind in 'iuf' and array.ndim in (1, 2):
+        return ('array', None, {'values': writer.array(array)})
+    return ('literal', _plain(list(value)), dict())
+
+# method to write a simulation to a binary SIMHIST file
+# strategy:
+#   - write the magic bytes, then each category and the templates as arrays
+#   - rows of lengths are written one at a time, so a recorder that keeps
+#     them on disk is never expanded in memory all at once
+#   - write the header describing every array, and finally its offset
+# Type: fileName - str
+#       history - dict or HistoryRecorder
+#       templates - list, TemplateArena or TemplateMultiset
+#       parameters - dict
+def write(fileName, history, templates, parameters):
+    with open(fileName, 'wb') as f:
+        f.write(MAGIC)
+        writer = _Writer(f)
+        header = {'Parameters': {k: _plain(v) for k, v in parameters.items()},
+                  'Categories': list()}
+        for name in history.keys():
+            header['Categories'].append((name,) + _category(writer, name, history[name]))
+        bases = template_arena.alphabet(parameters['Pairings'])
+        if isinstance(templates, template_arena.TemplateArena):
+            arena = templates.select(np.arange(len(templates)))
+        else:
+            arena = template_arena.TemplateArena(bases, list(templates))
+        header['Templates'] = (arena.alphabet, {'data': writer.array(arena.data[:arena.used]),
+                                                'starts': writer.array(arena.starts[:arena.count]),
+                                                'sizes': writer.array(arena.sizes[:arena.count])})
+        writer._align()
+        start = f.tell()
+        f.write(repr(header).encode('ascii'))
+        f.write(np.array([start], dtype=np.int64).tobytes())
+
+# lazily decoded rows of a ragged array, each read as a list
+# Extra rows can be appended, so a loaded run can be continued.
+# Object contains:
+#   values - memory mapped values of every row
+#   ends - end of each row in values
+#   extra - rows appended after loading
+class RaggedRows(object):
+
+    # Type: values - np.ndarray
+    #       sizes - np.ndarray
+    def __init__(self, values, sizes):
+        self.values = values
+        self.ends = np.cumsum(sizes)
+        self.extra = list()
+
+    def __len__(self):
+        return len(self.ends) + len(self.extra)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('History index out of range')
+        if i >= len(self.ends):
+            return self.extra[i - len(self.ends)]
+        start = self.ends[i-1] if i > 0 else 0
+        return self.values[start:self.ends[i]].tolist()
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def append(self, row):
+        self.extra.append(row)
+
+    def __repr__(self):
+        return repr(list(self))
+
+# end of class RaggedRows
+
+# history of a binary SIMHIST file
+# Reads as the history dict of SpSim. Only the header is read when opened;
+# each category is decoded from the memory mapped file the first time it is
+# accessed, and kept from then on.
+# Object contains:
+#   fileName - name of the file
+#   entries - dict of category name to (kind, meta, arrays)
+#   order - category names in the order they were written
+#   cache - categories decoded so far
+class SimHistory(object):
+
+    # Type: fileName - str
+    #       header - dict
+    def __init__(self, fileName, header):
+        self.fileName = fileName
+        self.order = [c[0] for c in header['Categories']]
+        self.entries = {c[0]: c[1:] for c in header['Categories']}
+        self.cache = dict()
+
+    # method to memory map one array of the file
+    # Type: description - tuple (offset, dtype, shape)
+    def _map(self, description):
+        offset, dtype, shape = description
+        if int(np.prod(shape)) == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self.fileName, dtype=dtype, mode='r', offset=offset, shape=shape)
+
+    # method to decode one category
+    def _decode(self, name):
+        kind, meta, arrays = self.entries[name]
+        if kind == 'pool':
+            return [dict(zip(meta, row)) for row in self._map(arrays['values']).tolist()]
+        elif kind == 'ragged':
+            return RaggedRows(self._map(arrays['values']), self._map(arrays['sizes']))
+        elif kind == 'nested':
+            sizes = self._map(arrays['sizes'])
+            values = self._map(arrays['values'])
+            starts = np.concatenate([[0], np.cumsum(sizes)])
+            epochs = np.concatenate([[0], np.cumsum(self._map(arrays['epochs']))])
+            return [RaggedRows(values[starts[a]:starts[b]], sizes[a:b]) \
+                    for a, b in zip(epochs[:-1].tolist(), epochs[1:].tolist())]
+        elif kind == 'array':
+            values = self._map(arrays['values'])
+            if values.ndim == 2:
+                return [tuple(row) for row in values.tolist()]
+            return values.tolist()
+        return list(meta)
+
+    def __getitem__(self, key):
+        if key not in self.cache:
+            if key not in self.entries:
+                raise KeyError(key)
+            self.cache[key] = self._decode(key)
+        return self.cache[key]
+
+    def __setitem__(self, key, value):
+        if key not in self.entries:
+            self.order.append(key)
+            self.entries[key] = ('literal', list(), dict())
+        self.cache[key] = value
+
+    def keys(self):
+        return list(self.order)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def items(self):
+        return [(k, self[k]) for k in self.keys()]
+
+# end of class SimHistory
+
+# method to read only the header of a binary SIMHIST file
+# Type: fileName - str
+def readHeader(fileName):
+    with open(fileName, 'rb') as f:
+        f.seek(-8, 2)
+        end = f.tell()
+        start = int(np.frombuffer(f.read(8), dtype=np.int64)[0])
+        f.seek(start)
+        return ast.literal_eval(f.read(end - start).decode('ascii'))
+
+# method to open a binary SIMHIST file
+# returns the history, the templates and the parameters
+# The templates are a TemplateArena over the memory mapped file, so a
+# template is only decoded when it is accessed. The first change of any kind
+# copies the arena into memory, leaving the file as it was.
+# Type: fileName - str
+def read(fileName):
+    header = readHeader(fileName)
+    history = SimHistory(fileName, header)
+    bases, arrays = header['Templates']
+    arena = template_arena.TemplateArena(bases)
+    arena.data = history._map(arrays['data'])
+    arena.used = len(arena.data)
+    arena.starts = history._map(arrays['starts'])
+    arena.sizes = history._map(arrays['sizes'])
+    arena.count = len(arena.sizes)
+    return history, arena, header['Parameters']
+
+# method to read a history file in the old text format
+# returns the history, the templates and the parameters
+# Type: fileName - str
+def readText(fileName):
+    history = {'Number':[], 'Average':[], 'Lengths':[], 'Pool':[], 'Uniques':[], 'EarlyQuit':[], 'Progress':[]}
+    templates = list()
+    parameters = dict()
+    f = open(fileName,'r')
+    cat = str()
+    for line in f:
+        if line.startswith(':=History_Category=:'):
+            cat = line[21:-1]
+            if not history.__contains__(cat):
+                history[cat] = []
+        elif line.startswith('Templates'):
+            templates = ast.literal_eval(line[10:])
+        elif line.startswith('Parameters'):
+            parameters = ast.literal_eval(line[11:])
+        elif not(cat is str()):
+            if cat == 'Progress':
+                history[cat].append(ast.literal_eval(line))
+            else:
+                history[cat] = ast.literal_eval(line)
+        else:
+            print('Format Error')
+            raise(TypeError)
+    f.close()
+    return history, templates, parameters
+
+# method to convert a history file in the old text format to a binary one
+# Type: textName - str
+#       fileName - str
+def convert(textName, fileName):
+    history, templates, parameters = readText(textName)
+    write(fileName, history, templates, parameters)
@@ -8,8 +8,190 @@ Universty of Auckland
 import spiegelman as spg
 import run_simulation as rsim
 from operator import itemgetter
+import ast, multiprocessing, os, traceback
+import numpy as np
 import pylab
 
+# method to count each base in each template, in one pass
+# returns a templates x bases array
+# Type: templates - list of str, or a template store
+#       bases - list of str
+def baseCounts(templates, bases):
+    if hasattr(templates, 'composition'):
+        return templates.composition(tuple(bases))
+    buf, lengths = spg.mutation.encode(list(templates))
+    counts = np.zeros((len(lengths), len(bases)), dtype=np.int64)
+    some = lengths > 0
+    starts = (np.cumsum(lengths) - lengths)[some]
+    for i, b in enumerate(bases):
+        if starts.size:
+            counts[some, i] = np.add.reduceat((buf == ord(b)).view(np.uint8), starts, dtype=np.int64)
+    return counts
+
+# method to keep the templates at the given indices
+# Type: templates - list of str, or a template store
+#       keep - np.ndarray
+def keepTemplates(templates, keep):
+    if isinstance(templates, list):
+        return [templates[i] for i in keep.tolist()]
+    return templates.select(keep)
+
+# method to list the cells each cell can send templates to, itself included
+# cells are numbered row by row; topologies:
+#   'All' - every cell
+#   'VonNeumann', 'Moore' - the 4 or 8 cells around, not wrapping at edges
+#   'VonNeumannTorus', 'MooreTorus' - the same, wrapping at the edges
+#   a dict - cell to a list of the cells it can send to (any sparse graph)
+# returns a dict of cell to a sorted list of cells
+# Type: size - tuple (rows, columns)
+#       topology - str or dict
+def neighbourhoods(size, topology = 'All'):
+    rows, cols = size
+    cells = range(rows*cols)
+    if isinstance(topology, dict):
+        return {n: sorted(set(topology.get(n, ())) | {n}) for n in cells}
+    if topology == 'All':
+        return {n: list(cells) for n in cells}
+    if topology.startswith('VonNeumann'):
+        steps = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+    elif topology.startswith('Moore'):
+        steps = [(i, j) for i in (-1, 0, 1) for j in (-1, 0, 1) if (i, j) != (0, 0)]
+    else:
+        raise ValueError('Unknown Topology: ' + str(topology))
+    torus = topology.endswith('Torus')
+    hood = dict()
+    for n in cells:
+        r, c = divmod(n, cols)
+        near = {n}
+        for i, j in steps:
+            if torus:
+                near.add(((r+i) % rows)*cols + (c+j) % cols)
+            elif 0 <= r+i < rows and 0 <= c+j < cols:
+                near.add((r+i)*cols + c+j)
+        hood[n] = sorted(near)
+    return hood
+
+# method to rank cells by the quantity of each base left in their pools
+# returns a dict of base to a list of (cell, quantity), most first
+# Type: quantities - dict of cell to pool quantities
+#       cells - list of cells to rank
+#       bases - list of str
+def rank(quantities, cells, bases):
+    ranking = dict()
+    for x in bases:
+        ranking[x] = [(sp,quantities[sp][x]) for sp in cells]
+        ranking[x].sort(key = itemgetter(1), reverse = True)
+    return ranking
+
+# method to tabulate the quantity of each base left in each cell's pool
+# returns a bases x cells array
+# Type: quantities - dict of cell to pool quantities
+#       cells - list of cells, in the order of the columns
+#       bases - list of str, in the order of the rows
+def quantityTable(quantities, cells, bases):
+    return np.array([[quantities[sp][x] for sp in cells] for x in bases], dtype=float)
+
+# method to decide which templates of one instance move, and where
+# strategy:
+#   - count the bases of all templates in one pass
+#   - Preference: move to the leader of the template's most common base
+#   - ComplexPref: score all destinations with one matrix product, by the
+#     quantities left in each destination's pool, as tabulated once per
+#     shuffle by quantityTable
+#   - split the templates by index into those that stay and those that move
+# the instance keeps only the templates that stay, and is never emptied: if
+# every template would move, one picked at random stays
+# returns a dict of destination to the templates moving there
+# Type: sim - SpSim
+#       kind - str, 'Preference' or 'ComplexPref'
+#       ranking - dict, as made by rank over the cells in order
+#       order - list of the instance indices it may send to, itself included
+#       percent - number, ShufflePercent
+#       table - np.ndarray, bases x order, as made by quantityTable; made
+#               from ranking if None
+def migrate(sim, kind, ranking, order, percent, table = None):
+    bases = list(ranking)
+    counts = baseCounts(sim.templates, bases)
+    moving = 100*np.random.random(len(counts)) < percent
+    if len(moving) and moving.all():
+        moving[np.random.randint(len(moving))] = False
+    if kind == 'Preference':
+        leaders = np.array([ranking[b][0][0] for b in bases])
+        targets = leaders[counts.argmax(axis=1)]    # most influential
+    else:
+        if table is None:
+            quantities = {sp: dict() for sp in order}
+            for b in bases:
+                for sp, q in ranking[b]:
+                    quantities[sp][b] = q
+            table = quantityTable(quantities, order, bases)
+        inst = order.index(sim.parameters['Instance'])
+        scores = counts.dot(table[:, [inst]] - table)
+        targets = np.array(order)[scores.argmax(axis=1)]
+    moves = dict()
+    for i, target in zip(np.flatnonzero(moving).tolist(), targets[moving].tolist()):
+        moves.setdefault(target, list()).append(sim.templates[i])
+    sim.templates = keepTemplates(sim.templates, np.flatnonzero(~moving))
+    return moves
+
+# method run by a worker process that holds some instances for a whole run
+# messages, answered in turn:
+#   ('run',) - run every instance for a cycle, answer with their pools
+#   ('shuffle', kind, quantities, neighbourhoods, percent) - answer with the
+#       movers, as a dict of destination to a dict of source to templates
+#   ('receive', templates) - add a dict of destination to templates
+#   ('collect',) - answer with the instances
+#   ('stop',) - end
+# if a message fails, the worker answers ('error', exception, traceback) and
+# ends
+# Type: conn - Connection
+#       instances - dict of index to SpSim
+#       seed - int
+def host(conn, instances, seed):
+    spg.random.seed(seed)
+    np.random.seed(seed)
+    try:
+        while True:
+            message = conn.recv()
+            if message[0] == 'run':
+                for sp in instances:
+                    instances[sp].run(0)
+                conn.send({sp: instances[sp].pool.quantities for sp in instances})
+            elif message[0] == 'shuffle':
+                kind, quantities, hood, percent = message[1:]
+                cells = list(quantities)
+                bases = list(quantities[cells[0]])
+                table = quantityTable(quantities, cells, bases)
+                column = {c: n for n, c in enumerate(cells)}
+                moves = dict()
+                for sp in instances:
+                    ranking = rank(quantities, hood[sp], bases)
+                    local = table[:, [column[c] for c in hood[sp]]]
+                    for target, movers in migrate(instances[sp], kind, ranking, hood[sp],
+                                                  percent, local).items():
+                        moves.setdefault(target, dict())[sp] = movers
+                conn.send(moves)
+            elif message[0] == 'receive':
+                for sp, movers in message[1].items():
+                    for s in movers:
+                        instances[sp].templates.append(s)
+            elif message[0] == 'collect':
+                conn.send(instances)
+            else:
+                break
+    except Exception as ex:
+        conn.send(('error', ex, traceback.format_exc()))
+    finally:
+        conn.close()
+
+# method to take a worker's answer, raising the worker's exception if it failed
+# Type: conn - Connection
+def answer(conn):
+    reply = conn.recv()
+    if isinstance(reply, tuple) and reply[0] == 'error':
+        raise reply[1] from RuntimeError('in a worker:\n' + reply[2])
+    return reply
+
 # spatial simulation object
 # object contains:
 #   - instances: dict of index to SpSim objects
@@ -37,18 +219,33 @@ class SptSim(object):
                 raise(TypeError)
     
     # initialisation helper function, generates instances with indices
+    # Changes gives one change per cell, and ChangeValue one value for all
+    # cells or one per cell; either can be flat or nested by rows
     def __set_size__(self, size):
         if not isinstance(size,tuple):
             raise(TypeError)
+        cells = size[0]*size[1]
+        changes = np.ravel(np.array(self.parameters.get('Changes'), dtype=object))
+        values = np.ravel(np.array(self.parameters.get('ChangeValue'), dtype=float))
+        if len(changes) != cells or len(values) not in (1, cells):
+            raise ValueError('Changes and ChangeValue must be given for each of ' +
+                             str(cells) + ' cells')
+        values = np.broadcast_to(values, (cells,))
         ps = list()
-        for n in range(size[0]*size[1]): 
+        for n in range(cells): 
             ps.append(rsim.pSet(self.parameters))
             ps[n].set('Instance', n)
-            ps[n].set('Changes', ps[n].get('Changes')[n])
+            ps[n].set('Changes', str(changes[n]))
             pool = dict(ps[n].get('InitialPool'))
-            pool[ps[n].get('Changes')[1]] *= self.parameters.get('ChangeValue')
+            pool[ps[n].get('Changes')[1]] *= float(values[n])
             ps[n].set('InitialPool', pool)
             self.instances[n] = spg.SpSim(ps[n])
+
+    # method to get the cells each cell can send templates to, from the
+    # Topology parameter, see neighbourhoods
+    def neighbourhoods(self):
+        return neighbourhoods(self.parameters.get('Size'),
+                              self.parameters.list().get('Topology', 'All'))
     
     def what(self,f=None):
         if f == None:
@@ -57,12 +254,100 @@ class SptSim(object):
             print(self.parameters.list(), file = f)
             
     # method to run the simulations
-    def run(self, printing = -1):
+    # with more than one worker, see runParallel
+    def run(self, printing = -1, workers = 1):
+        if workers != 1:
+            self.runParallel(printing, workers)
+            return
         start = spg.time.time()
+        hood = self.neighbourhoods()
         for i in range(self.parameters.get('Epochs')):
             for sp in self.instances:
                 self.instances[sp].run(0)
-            self.shuffle(printing)
+            self.shuffle(printing, hood)
+        if printing:
+            print('Elapsed Time:', round(spg.time.time()-start,3), 's')
+
+    # method to run the simulations on worker processes
+    # strategy:
+    #   - share the instances out between the workers once; each stays in
+    #     its worker for the whole run
+    #   - every epoch, the workers run their instances and send back only
+    #     their pools, from which the ranking is made
+    #   - the workers pick the migrating templates, and only those are sent,
+    #     through the parent, to the workers holding their destinations
+    #   - at the end the instances are collected back
+    # if a worker fails its exception is raised here, once every worker has
+    # been stopped
+    # Type: printing - int
+    #       workers - int, or None for one per core
+    def runParallel(self, printing = -1, workers = None):
+        start = spg.time.time()
+        order = list(self.instances)
+        workers = max(1, min(workers or os.cpu_count() or 1, len(order)))
+        groups = [order[w::workers] for w in range(workers)]
+        owner = {sp: w for w, group in enumerate(groups) for sp in group}
+        position = {sp: n for n, sp in enumerate(order)}
+        seeds = np.random.SeedSequence(np.random.randint(2**31)).spawn(workers)
+        hood = self.neighbourhoods()
+        conns = list()
+        processes = list()
+        try:
+            for group, seed in zip(groups, seeds):
+                conn, child = multiprocessing.Pipe()
+                conns.append(conn)
+                p = multiprocessing.Process(target=host, args=(child,
+                        {sp: self.instances[sp] for sp in group}, int(seed.generate_state(1)[0])))
+                try:
+                    p.start()
+                finally:
+                    child.close()   # the worker holds its own end
+                processes.append(p)
+            for i in range(self.parameters.get('Epochs')):
+                quantities = dict()
+                for conn in conns:
+                    conn.send(('run',))
+                for conn in conns:
+                    quantities.update(answer(conn))
+                kind = self.parameters.get('ShuffleType')
+                if kind not in ('Preference', 'ComplexPref'):
+                    continue
+                if (printing > 0):
+                    print('Shuffling')
+                self.history.append(self.getRanking(quantities))
+                for conn, group in zip(conns, groups):
+                    near = set(c for sp in group for c in hood[sp])
+                    conn.send(('shuffle', kind, {c: quantities[c] for c in near},
+                               {sp: hood[sp] for sp in group},
+                               self.parameters.get('ShufflePercent')))
+                moves = dict()
+                for conn in conns:
+                    for target, movers in answer(conn).items():
+                        moves.setdefault(target, dict()).update(movers)
+                incoming = [dict() for conn in conns]
+                for target in order:
+                    sources = moves.get(target, dict())
+                    incoming[owner[target]][target] = [s for sp in sorted(sources, key=position.get)
+                                                       for s in sources[sp]]
+                for conn, templates in zip(conns, incoming):
+                    conn.send(('receive', templates))
+            for conn in conns:
+                conn.send(('collect',))
+            for conn in conns:
+                self.instances.update(answer(conn))
+        finally:
+            for conn in conns:
+                try:
+                    conn.send(('stop',))
+                except (BrokenPipeError, EOFError):
+                    pass
+            for p in processes:
+                p.join(5)
+                if p.is_alive():
+                    p.terminate()
+                    p.join()
+            for conn in conns:
+                conn.close()
         if printing:
             print('Elapsed Time:', round(spg.time.time()-start,3), 's')
     
@@ -71,46 +356,47 @@ class SptSim(object):
     #       Preference Method:
     #           Move templates by their most common base to the simulation
     #           which ended with the most of that base in the previous epoch
-    def shuffle(self,printing = -1):
+    #       ComplexPref Method:
+    #           Score every simulation as a destination by the template's
+    #           base counts times how much less of each base is left in
+    #           its pool, and move the template to the best
+    # strategy:
+    #   - decide the movers of each instance, see migrate
+    #   - then hand the movers to their destinations
+    # every template present at the start is considered exactly once
+    # Type: printing - int
+    #       hood - dict, as made by neighbourhoods, or None to make it
+    def shuffle(self,printing = -1, hood = None):
         if (printing > 0):
             print('Shuffling')
-        if self.parameters.get('ShuffleType') == 'Preference':
-            ranking = self.getRanking()
-            self.history.append(ranking)
-            for sp in self.instances:
-                for s in self.instances[sp].templates:
-                    count = set((x,s.count(x)) \
-                                for x in self.parameters.get('InitialPool'))
-                    if ((100*spg.random.random()) < self.parameters.get('ShufflePercent')):
-                        mover = max(count, key=itemgetter(1))[0]   # most influential
-                        target = ranking[mover][0][0]
-                        self.instances[target].templates.append(s)
-                        self.instances[sp].templates.remove(s)    
-        if self.parameters.get('ShuffleType') == 'ComplexPref':
-            ranking = self.getRanking()
-            self.history.append(ranking)
-            for sp in self.instances:
-                inst = self.instances[sp].parameters['Instance']
-                for s in self.instances[sp].templates:
-                    count = {x:s.count(x) \
-                                for x in self.parameters.get('InitialPool')}
-                    if ((100*spg.random.random()) < self.parameters.get('ShufflePercent')):
-                        moveVector = {i:sum([count[b]*(ranking[b][inst][1] - ranking[b][i][1]) \
-                                             for b in self.parameters.get('InitialPool')]) \
-                                      for i in self.instances}
-                        moveTo = max(moveVector, key = moveVector.get)
-                        self.instances[moveTo].templates.append(s)
-                        self.instances[sp].templates.remove(s)
-                        
-                                                
+        kind = self.parameters.get('ShuffleType')
+        if kind not in ('Preference', 'ComplexPref'):
+            return
+        quantities = {sp: self.instances[sp].pool.quantities for sp in self.instances}
+        ranking = self.getRanking(quantities)
+        self.history.append(ranking)
+        order = list(self.instances)
+        if hood is None:
+            hood = self.neighbourhoods()
+        table = quantityTable(quantities, order, list(ranking))
+        column = {sp: n for n, sp in enumerate(order)}
+        moves = {sp: list() for sp in order}
+        for sp in order:
+            local = ranking if len(hood[sp]) == len(order) else \
+                    rank(quantities, hood[sp], list(ranking))
+            columns = table[:, [column[c] for c in hood[sp]]]
+            for target, movers in migrate(self.instances[sp], kind, local, hood[sp],
+                                          self.parameters.get('ShufflePercent'), columns).items():
+                moves[target].extend(movers)
+        for sp in order:
+            for s in moves[sp]:
+                self.instances[sp].templates.append(s)
             
-    def getRanking(self):
-        ranking = dict()
-        for x in self.parameters.get('InitialPool').keys():
-            ranking[x] = [(sp,self.instances[sp].pool.quantities[x]) \
-                            for sp in self.instances]
-            ranking[x].sort(key = itemgetter(1), reverse = True)
-        return ranking
+    # quantities can be given as a dict of instance index to pool quantities
+    def getRanking(self, quantities = None):
+        if quantities == None:
+            quantities = {sp: self.instances[sp].pool.quantities for sp in self.instances}
+        return rank(quantities, list(self.instances), list(self.parameters.get('InitialPool')))
         
     # method to print to console relevant information TODO    
     def toPrint(self):
@@ -157,19 +443,17 @@ class SptSim(object):
     
     # method to extract data from a folder of external data files
     def read_from(self, folder):
-        n = 0
         self.instances = dict()
-        for fileName in rsim.os.listdir(folder):
-            if fileName[-8:] == '.SIMHIST':
-                self.instances[n] = spg.SpSim(folder+ '/'+ fileName)
-                n += 1
+        for n, run in enumerate(rsim.manifest.Index(folder).load()):
+            self.instances[n] = run.load()
+        n = len(self.instances)
         if (n > 0):
             try:
                 f = open(folder+ '/poolhistory.SPTHIST','r')
-                self.history = spg.ast.literal_eval(f.readline())
+                self.history = ast.literal_eval(f.readline())
                 f.close()
                 f = open(folder+'/parameters.SPT','r')
-                self.parameters = rsim.pSet(spg.ast.literal_eval(f.readline()))                    
+                self.parameters = rsim.pSet(ast.literal_eval(f.readline()))                    
                 f.close()
             except:
                 print('Incomplete Information')
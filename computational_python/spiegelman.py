@@ -5,7 +5,7 @@ Author: David Wu
 University of Auckland
 """
 
-import random, importlib, time, ast
+import random, importlib, time
 import numpy as np
 from matplotlib import pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
@@ -13,7 +13,16 @@ from matplotlib.collections import PolyCollection
 from matplotlib import cm as CM
 from operator import itemgetter
 import parameters as imports
+import convergence
 import cull_function
+import engines
+import history_recorder
+import hybrid
+import multiset
+import mutation
+import sampling
+import simhist
+import template_arena
 
 #print('Current Known Issues: Does not accept negative cull_funtion')
     
@@ -54,12 +63,32 @@ class SpSim(object):
                     print('Error in Assimilating Data')
                     print(ex)
                     raise(Exception)
+        self.setTemplates(self.templates)
+        if self.parameters.get('History', 'Full') == 'Columnar' and \
+           isinstance(self.history, dict) and not self.history.get('Number'):
+            self.history = history_recorder.HistoryRecorder(self.parameters)
         self.replicators = [Replicator(self.parameters['Pairings'],\
                                        self.parameters['PointMutations'], \
                                        self.parameters['BlockMutations']) \
                                        for n in range(int(self.parameters['Replicators']))]
-        self.pool = Pool(self.parameters)
+        self.pool = VectorPool(self.parameters)
         
+    # method to replace the templates, keeping them in the store named by the
+    # TemplateStore parameter; a packed store, as read from a SIMHIST file, is
+    # kept as it is rather than decoded into a list
+    # Type: templates - list of str, or TemplateArena
+    def setTemplates(self, templates):
+        if isinstance(templates, template_arena.TemplateArena) and \
+           self.parameters.get('TemplateStore', 'List') in ('List', 'Packed'):
+            self.templates = templates
+        elif self.parameters.get('TemplateStore', 'List') == 'Packed':
+            self.templates = template_arena.TemplateArena(
+                template_arena.alphabet(self.parameters['Pairings']), templates)
+        elif self.parameters.get('TemplateStore', 'List') == 'Multiset':
+            self.templates = multiset.TemplateMultiset(templates)
+        else:
+            self.templates = templates
+
     # method for making strings of random length from a language            
     def makeTemplate(self):
         length = int(random.normalvariate(self.parameters['SeedLength'][0],self.parameters['SeedLength'][1]))
@@ -72,19 +101,34 @@ class SpSim(object):
     #   - Median Length of Templates
     #   - Dictionary of Pool Quantities
     #   - Number of Unique Templates
+    # a HistoryRecorder (History = 'Columnar') stores them in columns instead
     def addHistory(self):
+        if isinstance(self.templates, list):
+            uniques = len(set(self.templates))
+        else:
+            uniques = self.templates.uniqueCount()
+        if isinstance(self.history, history_recorder.HistoryRecorder):
+            self.history.record(self.templateLengths(), uniques, self.pool.quantities)
+            return
         self.history['Number'].append(len(self.templates))
-        self.history['Lengths'].append([len(n) for n in self.templates])
+        self.history['Lengths'].append(self.templateLengths())
         self.history['Lengths'][-1].sort()
         self.history['Average'].append(self.history['Lengths'][-1][int(self.history['Number'][-1]/2)])
-        self.history['Uniques'].append(len(set(self.templates)))
+        self.history['Uniques'].append(uniques)
         self.history['Pool'].append(self.pool.quantities)
     
     def addProgress(self):
-        j = [len(n) for n in self.templates]
+        j = self.templateLengths()
         j.sort()
         self.history['Progress'][-1].append(j)
 
+    # method to list the lengths of the templates
+    # a packed store keeps its lengths, so nothing is decoded
+    def templateLengths(self):
+        if isinstance(self.templates, list):
+            return [len(n) for n in self.templates]
+        return self.templates.lengths.tolist()
+
     # method to print information about current simulation state
     # Type: iteration - int
     def toPrint(self, iteration = -1):
@@ -309,38 +353,62 @@ class SpSim(object):
     #       - Perform the Iteration Replications
     #       - Record an Iteration of History
     #       - Cull the Population
+    #       - Stop early if the Convergence monitor finds a steady state,
+    #         recording the epoch and reason in history['Converged']
+    # if the 'Hybrid' parameter is set, the run is given to a HybridSim, which
+    # runs some cycles with the mean field model instead
     # Type: printing - int
     def run(self, printing=-1, cull = None, progress = False):
         if cull == None:
             importlib.reload(cull_function)
             self.parameters['CullFunction'] = cull_function.decision
-            cull = cull_function.cull_function
+            cull = cull_function.CullScorer()
+        if self.parameters.get('Hybrid') is not None:
+            hybrid.HybridSim(self).run(printing, cull, progress)
+            return
         start = time.time()
+        monitor = convergence.ConvergenceMonitor(self.parameters)
         if (printing > 0):
             print('Simulation Start\n========================')
         for iterations in range(int(self.parameters['Cycles'])):
-            if progress:
-                self.history['Progress'].append([])
-            self.pool.initialise()
-            self.doIteration(iterations, progress)
-            self.addHistory()
-            if (printing == 1):
-                print('Iteration: ', iterations)
-                self.toPrint()
-            self.transfer(cull)
-            if progress:
-                self.addProgress()
+            self.cycle(iterations, cull, progress, printing)
+            if monitor.check(self.history):
+                self.history['Converged'] = [(iterations, monitor.reason)]
+                break
         if (printing == 2):
             self.plotting3('h')
         if (printing == -1):
             print('Elapsed Time: ', round(time.time()-start,3), 's')
 
+    # method to run one cycle: replace the pool, replicate, record an
+    # iteration of history and cull the population
+    # Type: iterations - int
+    #       cull - function or CullScorer
+    #       progress - bool
+    #       printing - int
+    def cycle(self, iterations, cull, progress = False, printing = 0):
+        if progress:
+            self.history['Progress'].append([])
+        self.pool.initialise()
+        self.doIteration(iterations, progress)
+        self.addHistory()
+        if (printing == 1):
+            print('Iteration: ', iterations)
+            self.toPrint()
+        self.transfer(cull)
+        if progress:
+            self.addProgress()
+
     # method to complete one iteration of the simulation
     # possible replicator actions per replication:
     #   - Find a template to join to
     #   - Perform a single base replication
     #   - Release copy it has made, and move to another template
+    # if the 'Engine' parameter names another engine, the iteration is given to it
     def doIteration(self, iteration, progress):
+        if self.parameters.get('Engine', 'Loop') != 'Loop':
+            engines.create(self).doIteration(iteration, progress)
+            return
         empty = False
         for replications in range(int(self.parameters['MaxReplications'])):
             if (empty or self.pool.isLow()):
@@ -373,20 +441,29 @@ class SpSim(object):
 
     # method to cull the population between iterations of the simulation
     # strategy:
-    #   - if transfer percent is above 50%:
-    #       - remove templates from template list
-    #   - if transfer percent is below 50%:
-    #       - construct temp list
-    #       - add templates from template list to temp list
-    #       - set template list to be temp list
+    #   - score every template with the cull function
+    #     (a cull with a scores method, e.g. CullScorer, scores them in one call)
+    #   - draw TransferPercent of the templates without replacement, weighted
+    #     by score, see sampling.weightedSample
+    #   - keep the chosen templates, selected by index
+    # a multiset store is scored once per distinct sequence and thinned by count
     def transfer(self, cull):
-        scores = [cull(x) for x in self.templates]
-        newList = np.random.choice(self.templates, \
-                                   int(len(self.templates)*0.01*self.parameters['TransferPercent']), \
-                                   p=[x/sum(scores) for x in scores], \
-                                   replace=False)
-                   
-        self.templates = list(newList)
+        population = self.templates
+        if isinstance(population, multiset.TemplateMultiset):
+            population = population.sequences
+        if hasattr(cull, 'scores'):
+            scores = cull.scores(population)
+        else:
+            scores = [cull(x) for x in population]
+        number = int(len(self.templates)*0.01*self.parameters['TransferPercent'])
+        negative = self.parameters.get('NegativeCull', 'shift')
+        if isinstance(self.templates, multiset.TemplateMultiset):
+            self.templates = self.templates.thin(number, sampling.weightsOf(scores, negative))
+        elif isinstance(self.templates, list):
+            chosen = sampling.weightedSample(scores, number, negative)
+            self.templates = [self.templates[i] for i in chosen]
+        else:
+            self.templates = self.templates.select(sampling.weightedSample(scores, number, negative))
 #        if self.parameters['TransferPercent'] >= 50:
 #            for n in range(int((1 - self.parameters['TransferPercent']/100) * len(self.templates))):
 #                self.templates.remove(random.choice(self.templates))
@@ -399,9 +476,13 @@ class SpSim(object):
         for replicator in self.replicators:
             replicator.release()
 
-    # method to record history onto a text file
+    # method to record history onto a binary SIMHIST file, or a text file
     # Type: fileName - str
-    def export_to(self,fileName):
+    #       text - bool
+    def export_to(self,fileName, text = False):
+        if not text:
+            simhist.write(fileName, self.history, self.templates, self.parameters)
+            return
         f = open(fileName,'w')
         for cat in self.history:
             print(':=History_Category=:', cat, file = f)
@@ -415,28 +496,13 @@ class SpSim(object):
         f.close()
     
     # method to read recorded histroy from file
+    # binary files are memory mapped, and categories decoded when accessed
     # Type: fileName - str
     def read_from(self,fileName):
-        f = open(fileName,'r')
-        cat = str()
-        for line in f:
-            if line.startswith(':=History_Category=:'):
-                cat = line[21:-1]
-                if not self.history.__contains__(cat):
-                    self.history[cat] = []
-            elif line.startswith('Templates'):
-                self.templates = ast.literal_eval(line[10:])
-            elif line.startswith('Parameters'):
-                self.parameters = ast.literal_eval(line[11:])
-            elif not(cat is str()):
-                if cat == 'Progress':
-                    self.history[cat].append(eval(line))
-                else:
-                    self.history[cat] = ast.literal_eval(line)
-            else:
-                print('Format Error')
-                raise(TypeError)
-        f.close()
+        if simhist.isBinary(fileName):
+            self.history, self.templates, self.parameters = simhist.read(fileName)
+        else:
+            self.history, self.templates, self.parameters = simhist.readText(fileName)
 
 #end of class SpSim        
         
@@ -489,6 +555,68 @@ class Pool(object):
         print()
 
 # end of class Pool        
+
+# pool object with the quantity of each base held in an array
+# a drop in replacement for Pool; depletion takes per base counts, so
+# updating the pool after a copy costs the same whatever the copy's length
+# Object contains (as well as those of Pool):
+#   counts - array of current number of each monomer, in the order of elements
+#   slots - lookup table from the byte of a monomer to its index in counts
+class VectorPool(Pool):
+
+    # Type: parameters - dict
+    def __init__(self, parameters):
+        Pool.__init__(self, parameters)
+        self.quantities = self.initials
+        self.slots = np.full(256, len(self.elements), dtype=np.int64)
+        for i, x in enumerate(self.elements):
+            self.slots[ord(x)] = i
+
+    # quantities are read and written as a dict, as in Pool
+    @property
+    def quantities(self):
+        return dict(zip(self.elements, self.counts.tolist()))
+
+    @quantities.setter
+    def quantities(self, value):
+        self.elements = list(value)
+        self.counts = np.array(list(value.values()))
+
+    # method to count the monomers in a string, in the order of elements
+    # Type: mType - str
+    def countsOf(self, mType):
+        codes = self.slots[np.frombuffer(mType.encode('ascii'), dtype=np.uint8)]
+        counts = np.bincount(codes, minlength=len(self.elements)+1)
+        if counts[-1]:
+            raise KeyError('Monomer not in pool')
+        return counts[:-1]
+
+    # method to reduce the number of bases in the pool
+    # Type: mType - str
+    def deplete(self, mType):
+        self.depleteCounts(self.countsOf(mType))
+
+    # method to reduce the pool by an array of per base counts
+    # Type: counts - np.ndarray
+    def depleteCounts(self, counts):
+        self.counts = self.counts - counts
+        self.current -= counts.sum()
+        self.isEmpty = bool((self.counts <= 0).any())
+
+    # method to deplete a batch of copies in order, one row of counts each
+    # depletion stops after the first copy that empties the pool
+    # returns the index of that copy, or None if the pool did not empty
+    # Type: counts - np.ndarray (copies x bases)
+    def depleteBatch(self, counts):
+        if len(counts) == 0:
+            return None
+        used = np.cumsum(counts, axis=0)
+        empty = (self.counts - used <= 0).any(axis=1)
+        last = int(np.argmax(empty)) if empty.any() else None
+        self.depleteCounts(used[-1 if last is None else last])
+        return last
+
+# end of class VectorPool
         
 # replicator object
 # Object contains:
@@ -505,6 +633,7 @@ class Replicator(object):
     def __init__(self, pairings, point, block):
         self.magic = dict(pairings)
         self.bases = tuple(self.magic.values())
+        self.codes = mutation.baseCodes(self.magic)
         self.point = dict(point)
         self.block = dict(block)
         self.template = str()
@@ -558,21 +687,13 @@ class Replicator(object):
 #        self.copy += (base)
 #        self.position = self.blockMutation()
 
-    # method that simulates a point mutation in a single base 
-    # Type: base - str
-    #       pool - list
+    # method that simulates the point mutations in a copy
+    # all mutations are drawn in one call and applied in a single pass over
+    # the copy, see mutation.pointMutation
     def pointMutation(self):
-        points = [(np.random.randint(0,len(self.template)),x) \
-                  for x in self.point \
-                  for f in range(np.random.binomial(len(self.template), \
-                                                    self.point[x]))]
-        for c in points:
-            if c[1] == 'substitution':
-                self.copy = self.copy[:c[0]] + np.random.choice(self.bases) + self.copy[c[0]+1:]
-            elif c[1] == 'addition':
-                self.copy = self.copy[:c[0]] + np.random.choice(self.bases) + self.copy[c[0]:]
-            elif c[1] == 'deletion':
-                self.copy = self.copy[:c[0]] + self.copy[c[0]+1:]
+        buf, lengths = mutation.encode([self.copy])
+        buf, lengths = mutation.pointMutation(buf, lengths, self.point, self.codes)
+        self.copy = mutation.decode(buf, lengths)[0]
                 
 #        roll = random.random()
 #        if roll > max(self.point.values()):
@@ -588,17 +709,13 @@ class Replicator(object):
 #            else:
 #                return base
 
-    # method that simulates a block mutation by moving the position
+    # method that simulates the block mutations in a copy
+    # the copy is rebuilt once after all block edits, see mutation.blockMutation
     def blockMutation(self):
-        points = [(np.random.randint(0,len(self.template), size = 2),x) \
-                  for x in self.block \
-                  for f in range(np.random.binomial(len(self.template), \
-                                                    self.block[x]))]
-        for c in points:
-            if c[1] == 'addition':
-                self.copy = self.copy[:c[0][0]] + self.copy[c[0][0]:c[0][1]]*2 + self.copy[c[0][1]:]
-            elif c[1] == 'deletion':
-                self.copy = self.copy[:c[0][0]] + self.copy[c[0][1]+1:]
+        buf, lengths = mutation.encode([self.copy])
+        buf, lengths = mutation.blockMutation(buf, lengths, self.block, \
+                                              np.array([len(self.template)]))
+        self.copy = mutation.decode(buf, lengths)[0]
 #        roll = random.random()
 #        if roll > max(self.block.values()):
 #            return (self.position + 1)
@@ -0,0 +1,198 @@
+"""
+Parallel Sweeps of Spiegelman's Monster Simulations
+Fans a list of runs out to a pool of worker processes. Each worker seeds its
+own random streams, runs one simulation and writes its SIMHIST file, and
+only a small handle to that file is sent back. Finished runs are kept in a
+cache keyed on their settings, so a sweep only makes the runs it is missing
+"""
+
+import os, random, time, json, hashlib, shutil, importlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import spiegelman
+import simhist
+import manifest
+
+# handle to the result of one run
+# Reads as the SpSim it refers to: any attribute other than those below loads
+# the run from its SIMHIST file the first time it is needed.
+# Object contains:
+#   fileName - SIMHIST file written by the run
+#   parameters - parameters of the run
+#   seed - seed the run was started with
+#   elapsed - time taken by the run, in seconds
+class RunHandle(object):
+
+    def __init__(self, fileName, parameters, seed, elapsed):
+        self.fileName = fileName
+        self.parameters = parameters
+        self.seed = seed
+        self.elapsed = elapsed
+        self.sim = None
+
+    # method to load the run from its file
+    def load(self):
+        if self.sim is None:
+            self.sim = spiegelman.SpSim(self.fileName)
+        return self.sim
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name in ('sim', 'fileName'):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['sim'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def __repr__(self):
+        return 'RunHandle(' + repr(self.fileName) + ')'
+
+# end of class RunHandle
+
+# method to make a value canonical, so that equal settings always hash the same
+def _canonical(value):
+    if isinstance(value, dict):
+        return [[_canonical(k), _canonical(v)] for k, v in
+                sorted(value.items(), key=lambda kv: repr(kv[0]))]
+    elif isinstance(value, (list, tuple, np.ndarray)):
+        return [_canonical(v) for v in list(value)]
+    elif isinstance(value, (bool, str)) or value is None:
+        return value
+    elif isinstance(value, (int, np.integer)):
+        return int(value)
+    elif isinstance(value, (float, np.floating)):
+        return repr(float(value))
+    elif callable(value):
+        return getattr(value, '__module__', '') + '.' + getattr(value, '__qualname__', repr(value))
+    return repr(value)
+
+# method to describe the cull function of a run
+# the default cull is described by the settings of cull_function
+def _cullKey(cull):
+    if cull is None:
+        cf = importlib.reload(spiegelman.cull_function)
+        return ['default', cf.decision, cf.fnType, [cf.A, cf.B, cf.C]]
+    elif hasattr(cull, 'components'):
+        return [cull.decision, cull.kind, list(cull.p)]
+    return cull
+
+# method to describe the input of a run, or None if it cannot be cached
+def _inputKey(inputs):
+    if inputs is None:
+        importlib.reload(spiegelman.imports)
+        return ['parameters', spiegelman.imports.parameters]
+    elif isinstance(inputs, str):
+        with open(inputs, 'rb') as f:
+            return ['file', hashlib.sha256(f.read()).hexdigest()]
+    elif hasattr(inputs, 'parameters') and not hasattr(inputs, 'templates'):
+        return ['parameters', inputs.parameters]
+    return None
+
+# method to hash the settings of a run
+# returns a hex digest, or None if the run cannot be cached
+# Type: inputs - input of SpSim
+#       cull - cull function, or None
+#       seed - int, or None
+def runKey(inputs, cull, seed):
+    key = _inputKey(inputs)
+    if key is None:
+        return None
+    text = json.dumps(_canonical([key, _cullKey(cull), seed]))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+# method to make the seed of one run from the seed of the sweep
+# the seed depends on the settings of the run rather than its position, so
+# the same point gets the same seed in any sweep
+# Type: seed - int, or None for a fresh seed
+#       key - str, hash of the settings of the run
+#       repeat - int, number of earlier runs in the sweep with the same key
+def runSeed(seed, key, repeat):
+    sequence = np.random.SeedSequence(seed, spawn_key=(int(key[:15], 16), repeat))
+    return int(sequence.generate_state(1)[0])
+
+# method to copy a finished file into place, so that a file is either
+# complete or not there at all
+def _store(source, target):
+    temp = target + '.part'
+    try:
+        os.link(source, temp)
+    except OSError:
+        shutil.copyfile(source, temp)
+    os.replace(temp, target)
+
+# method for a worker to complete one run
+# Type: job - tuple (input of SpSim, SIMHIST file name, seed, cull, progress,
+#                    cache file name or None)
+def runJob(job):
+    inputs, fileName, seed, cull, progress, cached = job
+    random.seed(seed)
+    np.random.seed(seed)
+    start = time.time()
+    s = spiegelman.SpSim(inputs)
+    s.run(0, cull=cull, progress=progress)
+    s.export_to(fileName)
+    if cached is not None:
+        _store(fileName, cached)
+    return RunHandle(fileName, dict(s.parameters), seed, time.time() - start)
+
+# method to run a list of simulations on a pool of processes
+# strategy:
+#   - hash the settings of every run; a run whose file is in the cache is
+#     not made again, its file is linked into the folder
+#   - give every other run its own seed, made from the seed of the sweep
+#   - hand those runs to the workers; each writes folder/<n>.SIMHIST and
+#     adds it to the cache, so an interrupted sweep resumes where it stopped
+#   - collect the handles in the order of the inputs, and index the folder
+# the cache is only used when asked for, and only for seeded runs: a run
+# with seed None is a fresh draw, so it is always made; with one worker the
+# runs are made in this process
+# Type: inputs - list of SpSim inputs (pSet, file name, SpSim or None)
+#       folder - str
+#       workers - int, or None for one per core
+#       seed - int, or None
+#       culls - list of cull functions (None for the default), one per run
+#       progress - bool
+#       cache - folder of the cache, or None to make every run
+#       first - int, number of the first file, to add runs to a folder
+def execute(inputs, folder, workers = None, seed = None, culls = None, progress = False,
+            cache = None, first = 0):
+    if culls is None:
+        culls = [None]*len(inputs)
+    for name in (folder, cache):
+        if name is not None and not os.path.isdir(name):
+            os.mkdir(name)
+    handles = [None]*len(inputs)
+    jobs = list()
+    repeats = dict()
+    for n in range(len(inputs)):
+        fileName = folder + '/' + str(first + n) + '.SIMHIST'
+        key = runKey(inputs[n], culls[n], [seed, progress])
+        base = key if key is not None else hashlib.sha256(str(n).encode()).hexdigest()
+        repeat = repeats.get(base, 0)
+        repeats[base] = repeat + 1
+        s = runSeed(seed, base, repeat)
+        cached = None
+        if cache is not None and key is not None and seed is not None:
+            cached = cache + '/' + key + '_' + str(repeat) + '.SIMHIST'
+            if os.path.isfile(cached):
+                _store(cached, fileName)
+                parameters = simhist.readHeader(fileName)['Parameters']
+                handles[n] = RunHandle(fileName, parameters, s, 0)
+                continue
+        jobs.append((n, (inputs[n], fileName, s, culls[n], progress, cached)))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 1 or len(jobs) < 2:
+        made = [runJob(job) for n, job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            made = list(pool.map(runJob, [job for n, job in jobs]))
+    for (n, job), handle in zip(jobs, made):
+        handles[n] = handle
+    manifest.Index(folder)
+    return handles
@@ -0,0 +1,201 @@
+"""
+Declarative Sweeps of Spiegelman's Monster Simulations
+Expands a sweep specification into parameter sets and runs them in a batch.
+A specification is a dict (or a file holding one, as a Python literal):
+    {'Parameters' : {'Cycles' : 100},           # changes to the defaults
+     'Sweep' : 'Grid',                          # 'Grid' or 'LatinHypercube'
+     'Axes' : {'Replicators' : [5, 10, 20],     # values to take
+               'PointMutations.substitution' : (0.001, 0.1, 5)},
+                                                # (low, high, number)
+     'Samples' : 20,                            # LatinHypercube: points
+     'Adaptive' : {'Rounds' : 2, 'Fraction' : 0.25, 'Category' : 'Average'},
+     'Seed' : 0, 'Workers' : None, 'Folder' : None, 'Cache' : None}
+                                                # Cache: folder to reuse runs from
+Nested sub-parameters are named with dots. Run from the command line with
+    python sweep_spec.py spec.txt
+"""
+
+import sys, ast, time, importlib
+import numpy as np
+import parameters as defaults
+import run_simulation
+import sweep
+
+# method to set a parameter, naming sub-parameters with dots
+# the value takes the type of the value it replaces, as in pSet.set
+# Type: parameters - dict
+#       name - str, e.g. 'PointMutations.substitution'
+#       value - any
+def setParameter(parameters, name, value):
+    keys = name.split('.')
+    for k in keys[:-1]:
+        parameters[k] = dict(parameters[k])
+        parameters = parameters[k]
+    old = parameters.get(keys[-1])
+    if isinstance(old, bool) or not isinstance(old, (int, float)):
+        parameters[keys[-1]] = value
+    elif isinstance(old, int):
+        parameters[keys[-1]] = int(round(value))
+    else:
+        parameters[keys[-1]] = float(value)
+
+# method to get the values an axis can take
+# Type: axis - list of values, or tuple (low, high, number)
+def axisValues(axis):
+    if isinstance(axis, tuple):
+        return np.linspace(axis[0], axis[1], int(axis[2])).tolist()
+    return list(axis)
+
+# method to tell if an axis takes numbers, and so can be refined between them
+# Type: axis - list of values, or tuple (low, high, number)
+def numericAxis(axis):
+    if isinstance(axis, tuple):
+        return True
+    return all(isinstance(v, (int, float, np.integer, np.floating)) and not isinstance(v, bool)
+               for v in axis)
+
+# method to get the range of an axis, to sample it or scale distances on it
+def axisRange(axis):
+    if isinstance(axis, tuple):
+        return float(axis[0]), float(axis[1])
+    return float(min(axis)), float(max(axis))
+
+# method to make every combination of the values of the axes
+# returns a list of points, each a dict of axis name to value
+# Type: axes - dict
+def grid(axes):
+    names = list(axes)
+    points = [dict()]
+    for name in names:
+        points = [dict(p, **{name: v}) for p in points for v in axisValues(axes[name])]
+    return points
+
+# method to draw a Latin hypercube sample of the axes
+# each axis is cut into as many strata as samples, and every stratum is used
+# once; an axis given as a list takes the value its stratum falls on
+# Type: axes - dict
+#       samples - int
+#       seed - int, or None
+def latinHypercube(axes, samples, seed = None):
+    rng = np.random.default_rng(seed)
+    points = [dict() for _ in range(samples)]
+    for name, axis in axes.items():
+        u = (rng.permutation(samples) + rng.random(samples))/samples
+        if isinstance(axis, tuple):
+            low, high = axisRange(axis)
+            values = (low + u*(high - low)).tolist()
+        else:
+            values = [axis[int(x*len(axis))] for x in u]
+        for p, v in zip(points, values):
+            p[name] = v
+    return points
+
+# method to make the parameter set of each point
+# Type: spec - dict
+#       points - list of dict
+def parameterSets(spec, points):
+    importlib.reload(defaults)
+    base = dict(defaults.parameters)
+    for name, value in spec.get('Parameters', dict()).items():
+        setParameter(base, name, value)
+    sets = list()
+    for point in points:
+        parameters = dict(base)
+        for name, value in point.items():
+            setParameter(parameters, name, value)
+        sets.append(run_simulation.pSet(parameters))
+    return sets
+
+# method to find the points between neighbours whose results differ most
+# only numeric axes are refined; an axis of other values, such as cull names,
+# is held fixed, and points are only paired with others sharing its values
+# strategy:
+#   - scale every numeric axis to [0, 1] and pair each point with its nearest
+#     neighbours, two per numeric axis
+#   - rank the pairs by how much the result changes between them
+#   - return the midpoints of the top fraction, skipping points already run
+# Type: axes - dict
+#       points - list of dict
+#       results - list of float
+#       fraction - float
+def refine(axes, points, results, fraction = 0.25):
+    names = [n for n in axes if numericAxis(axes[n])]
+    fixed = [n for n in axes if n not in names]
+    if not names or len(points) < 2:
+        return list()
+    ranges = [axisRange(axes[n]) for n in names]
+    x = np.array([[(p[n] - lo)/((hi - lo) or 1) for n, (lo, hi) in zip(names, ranges)]
+                  for p in points])
+    distance = np.sqrt(((x[:, None, :] - x[None, :, :])**2).sum(axis=2))
+    groups = np.array([repr([p[n] for n in fixed]) for p in points])
+    distance[groups[:, None] != groups[None, :]] = np.inf
+    np.fill_diagonal(distance, np.inf)
+    k = min(2*len(names), len(points) - 1)
+    pairs = set()
+    for i in range(len(points)):
+        for j in np.argsort(distance[i])[:k].tolist():
+            if np.isfinite(distance[i, j]):
+                pairs.add((min(i, j), max(i, j)))
+    if not pairs:
+        return list()
+    pairs = sorted(pairs, key=lambda ij: -abs(results[ij[0]] - results[ij[1]]))
+    seen = set(repr(sorted(p.items())) for p in points)
+    new = list()
+    for i, j in pairs[:max(1, int(np.ceil(fraction*len(pairs))))]:
+        mid = {n: points[i][n] for n in fixed}
+        for n in names:
+            mid[n] = (points[i][n] + points[j][n])/2
+            if isinstance(points[i][n], int) and isinstance(points[j][n], int):
+                mid[n] = int(round(mid[n]))
+        key = repr(sorted(mid.items()))
+        if key not in seen:
+            seen.add(key)
+            new.append(mid)
+    return new
+
+# method to run a sweep specification
+# strategy:
+#   - expand the axes into points, as a grid or a Latin hypercube
+#   - run the points as one batch
+#   - in adaptive mode, add the midpoints where the final value of the chosen
+#     category changes most between neighbours, and run only those, adding
+#     them to the folder after the runs already made
+# returns the points and the handles of their runs, in the same order
+# Type: spec - dict, or str naming a file holding one
+def run(spec):
+    if isinstance(spec, str):
+        with open(spec, 'r') as f:
+            spec = ast.literal_eval(f.read())
+    axes = spec['Axes']
+    kind = spec.get('Sweep', 'Grid')
+    if kind == 'Grid':
+        points = grid(axes)
+    elif kind == 'LatinHypercube':
+        points = latinHypercube(axes, int(spec['Samples']), spec.get('Seed'))
+    else:
+        raise ValueError('Unknown Sweep: ' + str(kind))
+    folder = spec.get('Folder') or 'Sim_' + time.strftime('%d%m%y_%H%M%S')
+    adaptive = spec.get('Adaptive', dict())
+    rounds = int(adaptive.get('Rounds', 0))
+    handles = list()
+    new = points
+    for n in range(rounds + 1):
+        handles = handles + sweep.execute(parameterSets(spec, new), folder, spec.get('Workers'),
+                                          spec.get('Seed'), cache=spec.get('Cache'),
+                                          first=len(handles))
+        if n == rounds:
+            break
+        results = [h.history[adaptive.get('Category', 'Average')][-1] for h in handles]
+        new = refine(axes, points, results, adaptive.get('Fraction', 0.25))
+        if not new:
+            break
+        points = points + new
+    return points, handles
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print('Usage: python sweep_spec.py spec.txt')
+        sys.exit(1)
+    points, handles = run(sys.argv[1])
+    for p, h in zip(points, handles):
+        print(p, h.fileName)
@@ -0,0 +1,213 @@
+"""
+Packed Template Store for Spiegelman's Monster Simulation
+Holds a population of templates in one contiguous buffer, 2 bits per base,
+with an index of where each template starts and how long it is
+"""
+
+import numpy as np
+
+# byte -> the four 2 bit codes packed into it
+UNPACK = ((np.arange(256)[:, None] >> np.array([6, 4, 2, 0])) & 3).astype(np.uint8)
+# byte -> how many of each 2 bit code it holds
+TALLY = np.stack([(UNPACK == c).sum(axis=1) for c in range(4)], axis=1).astype(np.uint8)
+
+# method to get the alphabet of a simulation from its pairings
+# Type: pairings - dict (as made by str.maketrans)
+def alphabet(pairings):
+    return tuple(sorted(set(pairings.values())))
+
+# method to pack a run of 2 bit codes, four to a byte
+# Type: codes - np.ndarray
+def pack(codes):
+    pad = (-len(codes)) % 4
+    if pad:
+        codes = np.concatenate([codes, np.zeros(pad, dtype=np.uint8)])
+    c = codes.reshape(-1, 4)
+    return (c[:, 0] << 6) | (c[:, 1] << 4) | (c[:, 2] << 2) | c[:, 3]
+
+# packed template store
+# Every template starts on a byte boundary, so any template can be found and
+# unpacked without touching the others. Buffers that cannot be written, such
+# as those mapped from a SIMHIST file, are copied on the first change.
+# Object contains:
+#   alphabet - tuple of the (at most 4) bases
+#   data - buffer of packed bases
+#   used - number of bytes of data in use
+#   starts - byte each template starts at
+#   sizes - number of bases in each template
+#   count - number of templates
+class TemplateArena(object):
+
+    # Type: alphabet - tuple
+    #       templates - iterable of str
+    def __init__(self, alphabet, templates = ()):
+        self.alphabet = tuple(alphabet)
+        if len(self.alphabet) > 4:
+            raise ValueError('A packed store holds at most 4 bases, got ' +
+                             str(self.alphabet))
+        self.toCode = np.full(256, 255, dtype=np.uint8)
+        for i, b in enumerate(self.alphabet):
+            self.toCode[ord(b)] = i
+        self.toByte = np.array([ord(b) for b in self.alphabet], dtype=np.uint8)
+        self.data = np.zeros(1024, dtype=np.uint8)
+        self.used = 0
+        self.starts = np.zeros(64, dtype=np.int64)
+        self.sizes = np.zeros(64, dtype=np.int64)
+        self.count = 0
+        self.extend(list(templates))
+
+    # lengths of every template, without decoding anything
+    @property
+    def lengths(self):
+        return self.sizes[:self.count]
+
+    def __len__(self):
+        return self.count
+
+    # returns the template at index i as a string
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.count))]
+        return self.toByte[self.codes(i)].tobytes().decode('ascii')
+
+    def __iter__(self):
+        text = self.toByte[UNPACK[self.data[:self.used]].ravel()].tobytes().decode('ascii')
+        for s, n in zip((4*self.starts[:self.count]).tolist(), self.lengths.tolist()):
+            yield text[s:s+n]
+
+    # only truncation is supported, e.g. del arena[n:]
+    def __delitem__(self, i):
+        if not isinstance(i, slice) or i.stop is not None or i.step is not None:
+            raise TypeError('Only trailing templates can be deleted')
+        self._own()
+        n = i.indices(self.count)[0]
+        if n < self.count:
+            self.used = int(self.starts[n])
+            self.count = n
+
+    def tolist(self):
+        return list(self)
+
+    # method to copy any buffer that cannot be written into memory
+    def _own(self):
+        for name in ('data', 'starts', 'sizes'):
+            if not getattr(self, name).flags.writeable:
+                setattr(self, name, np.array(getattr(self, name)))
+
+    # method to make sure there is room for n more bytes and k more templates
+    def _reserve(self, n, k):
+        self._own()
+        if self.used + n > len(self.data):
+            data = np.zeros(max(2*len(self.data), self.used + n), dtype=np.uint8)
+            data[:self.used] = self.data[:self.used]
+            self.data = data
+        if self.count + k > len(self.starts):
+            size = max(2*len(self.starts), self.count + k)
+            self.starts = np.resize(self.starts, size)
+            self.sizes = np.resize(self.sizes, size)
+
+    # method to convert a string to its 2 bit codes
+    # Type: template - str
+    def encode(self, template):
+        codes = self.toCode[np.frombuffer(template.encode('ascii'), dtype=np.uint8)]
+        if codes.size and codes.max() == 255:
+            raise ValueError('Template has bases outside ' + str(self.alphabet))
+        return codes
+
+    # returns the 2 bit codes of the template at index i
+    # Type: i - int
+    def codes(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError('Template index out of range')
+        s = self.starts[i]
+        n = self.sizes[i]
+        return UNPACK[self.data[s:s + (n+3)//4]].ravel()[:n]
+
+    # method to add a template given as 2 bit codes
+    # Type: codes - np.ndarray
+    def appendCodes(self, codes):
+        packed = pack(np.asarray(codes, dtype=np.uint8))
+        self._reserve(len(packed), 1)
+        self.data[self.used:self.used + len(packed)] = packed
+        self.starts[self.count] = self.used
+        self.sizes[self.count] = len(codes)
+        self.used += len(packed)
+        self.count += 1
+
+    # Type: template - str
+    def append(self, template):
+        self.appendCodes(self.encode(template))
+
+    # method to add many templates with one packing pass
+    # Type: templates - list of str
+    def extend(self, templates):
+        if not templates:
+            return
+        sizes = np.fromiter((len(t) for t in templates), dtype=np.int64,
+                            count=len(templates))
+        codes = self.encode(''.join(templates))
+        nbytes = (sizes + 3)//4
+        slots = np.zeros(4*nbytes.sum(), dtype=np.uint8)
+        starts = np.cumsum(nbytes) - nbytes
+        ends = np.cumsum(sizes)
+        dest = np.repeat(4*starts - (ends - sizes), sizes) + np.arange(codes.size)
+        slots[dest] = codes
+        packed = pack(slots)
+        self._reserve(len(packed), len(templates))
+        self.data[self.used:self.used + len(packed)] = packed
+        self.starts[self.count:self.count + len(templates)] = self.used + starts
+        self.sizes[self.count:self.count + len(templates)] = sizes
+        self.used += len(packed)
+        self.count += len(templates)
+
+    # method to make a new store holding only the templates at the indices,
+    # in the order given, packed contiguously
+    # Type: indices - np.ndarray
+    def select(self, indices):
+        indices = np.asarray(indices, dtype=np.int64)
+        new = TemplateArena(self.alphabet)
+        nbytes = (self.sizes[indices] + 3)//4
+        starts = np.cumsum(nbytes) - nbytes
+        src = np.repeat(self.starts[indices] - starts, nbytes) + np.arange(nbytes.sum())
+        new.data = self.data[src]
+        new.used = len(new.data)
+        new.starts = starts
+        new.sizes = self.sizes[indices].copy()
+        new.count = len(indices)
+        return new
+
+    # method to drop space no longer used by any template
+    def compact(self):
+        new = self.select(np.arange(self.count))
+        self.data, self.used = new.data, new.used
+        self.starts, self.sizes = new.starts, new.sizes
+
+    # method to count bases in each template, a byte at a time
+    # returns a templates x bases array, in the order of bases
+    # Type: bases - str or tuple, defaults to the whole alphabet
+    def composition(self, bases = None):
+        if bases is None:
+            bases = self.alphabet
+        nbytes = (self.lengths + 3)//4
+        some = nbytes > 0
+        counts = np.zeros((self.count, len(bases)), dtype=np.int64)
+        data = self.data[:self.used]
+        for i, b in enumerate(bases):
+            c = self.alphabet.index(b)
+            if some.any():
+                counts[some, i] = np.add.reduceat(TALLY[:, c][data], \
+                                                  self.starts[:self.count][some], dtype=np.int64)
+            # the padding of the last byte of each template reads as code 0
+            if c == 0:
+                counts[:, i] -= 4*nbytes - self.lengths
+        return counts
+
+    # method to count the distinct templates, comparing packed bytes
+    def uniqueCount(self):
+        data = self.data
+        return len(set((n, data[s:s + (n+3)//4].tobytes()) for s, n in \
+                       zip(self.starts[:self.count].tolist(), self.lengths.tolist())))
+
+# end of class TemplateArena
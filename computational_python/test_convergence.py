@@ -0,0 +1,56 @@
+"""
+Tests of Steady State Detection
+Run with pytest from this folder
+"""
+
+import random
+import numpy as np
+import pytest
+import spiegelman
+import convergence
+
+# method to feed a history to a monitor one epoch at a time
+# returns the epoch the monitor stopped at, or None
+def firstStop(monitor, history):
+    grown = {k: list() for k in history}
+    for n in range(len(history['Number'])):
+        for k in history:
+            grown[k].append(history[k][n])
+        if monitor.check(grown):
+            return n
+    return None
+
+def test_median():
+    monitor = convergence.ConvergenceMonitor({'Convergence': 'Median', 'ConvergenceTolerance': 0.05,
+                                              'ConvergenceWindow': 3})
+    history = {'Number': [10]*8, 'Average': [100, 150, 120, 121, 122, 123, 160, 161]}
+    assert firstStop(monitor, history) == 5
+    assert 'Median' in monitor.reason
+
+def test_histogram():
+    monitor = convergence.ConvergenceMonitor({'Convergence': 'Histogram', 'ConvergenceWindow': 2})
+    same = [10, 20, 20, 30]
+    history = {'Number': [4]*4, 'Lengths': [[1, 2, 3, 90], same, same, same]}
+    assert firstStop(monitor, history) == 3
+
+# an epoch whose Uniques is not known, as in the mean field cycles of a
+# hybrid run, never counts as steady
+def test_uniquesNotKnown():
+    monitor = convergence.ConvergenceMonitor({'Convergence': 'Uniques', 'ConvergenceWindow': 2})
+    nan = float('nan')
+    history = {'Number': [10]*6, 'Uniques': [nan, nan, nan, 5, 5, 5]}
+    assert firstStop(monitor, history) == 5
+
+def test_unknownKind():
+    with pytest.raises(ValueError):
+        convergence.ConvergenceMonitor({'Convergence': 'Mean'})
+    assert firstStop(convergence.ConvergenceMonitor({}), {'Number': [1]*20}) is None
+
+def test_runStopsEarly(source):
+    random.seed(0)
+    np.random.seed(0)
+    sim = spiegelman.SpSim(source(Cycles=50, Convergence='Median', ConvergenceTolerance=1.0,
+                                  ConvergenceWindow=2))
+    sim.run(0)
+    assert len(sim.history['Number']) == 3
+    assert sim.history['Converged'][0][0] == 2
@@ -0,0 +1,25 @@
+"""
+Tests of the Cull Functions
+Run with pytest from this folder
+"""
+
+import numpy as np
+import cull_function as cf
+
+# each term of a '+' decision is scored with its own component; before, every
+# term was scored with the module's global decision
+def test_combinedDecisionScoresEachComponent(monkeypatch):
+    monkeypatch.setattr(cf, 'fnType', 'Power')
+    monkeypatch.setattr(cf, 'decision', 'LEN+A')
+    template = 'AACGUA'
+    assert cf.cull_function(template, None, (1, 0, 0)) == len(template) + template.count('A')
+    assert cf.cull_function(template, 'LEN', (1, 0, 0)) == len(template)
+    assert cf.cull_function(template, 'G+fC', (1, 0, 0)) == 1 + 2
+
+def test_scorerMatchesCullFunction(monkeypatch):
+    monkeypatch.setattr(cf, 'fnType', 'Linear')
+    templates = ['AACGUA', 'GGCU', 'UUUUAC', 'CAG']
+    for decision in ('LEN', 'A', 'LEN+A', 'fC+lU%', 'GU+A$'):
+        scorer = cf.CullScorer(decision, (0.5, 2, 0), 'Linear')
+        expected = [cf.cull_function(t, decision, (0.5, 2, 0)) for t in templates]
+        assert np.allclose(scorer.scores(templates), expected)
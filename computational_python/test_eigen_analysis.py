@@ -0,0 +1,41 @@
+"""
+Tests of the Eigen Analysis
+Run with pytest from this folder
+"""
+
+import numpy as np
+import eigen_analysis
+import mutation_matrices
+
+# method to make small mutation matrices
+def smallMatrices():
+    l = np.arange(1, 202, 4, dtype=float)
+    d, b = mutation_matrices.matrices(l, (0.01, 0.01, 5e-3, 5e-3), 2, None)
+    return l, d, b
+
+def test_operatorMatchesProduct():
+    l, d, b = smallMatrices()
+    x = np.random.random(len(l))
+    dense = b.toarray() @ d.toarray() @ np.diag(l**0.5)
+    assert np.allclose(eigen_analysis.kappaOperator(b, d, l, 1.5) @ x, dense @ x)
+
+def test_spectrumMatchesDense():
+    l, d, b = smallMatrices()
+    kappas = [0.5, 1.0, 1.5]
+    values, vectors = eigen_analysis.spectrum(b, d, l, kappas, 2, 1)
+    assert values.shape == (3, 2)
+    assert vectors.shape == (3, len(l), 2)
+    for n, kappa in enumerate(kappas):
+        dense = b.toarray() @ d.toarray() @ np.diag(l**(kappa - 1))
+        w = np.linalg.eigvals(dense)
+        assert np.allclose(values[n], w[np.argsort(-abs(w))][:2])
+        assert np.allclose(dense @ vectors[n], vectors[n]*values[n])
+        assert (vectors[n].sum(axis=0) > 0).all()
+
+def test_workersAgree():
+    l, d, b = smallMatrices()
+    kappas = np.linspace(0, 2, 6)
+    values, vectors = eigen_analysis.spectrum(b, d, l, kappas, 2, 1)
+    split, splitVectors = eigen_analysis.spectrum(b, d, l, kappas, 2, 3)
+    assert np.allclose(values, split)
+    assert np.allclose(vectors, splitVectors)
@@ -0,0 +1,61 @@
+"""
+Tests of the Replication Engines
+Run with pytest from this folder
+"""
+
+import random
+import numpy as np
+import pytest
+import spiegelman
+
+# Type: source - the source fixture
+def runSim(source, seed = 1, **changes):
+    random.seed(seed)
+    np.random.seed(seed)
+    sim = spiegelman.SpSim(source(**changes))
+    start = list(sim.templates)
+    sim.run(0)
+    return sim, start
+
+def test_batchWithoutMutationCopiesExactly(source):
+    sim, start = runSim(source, Engine='Batch', PointMutations={}, BlockMutations={})
+    pairings = sim.parameters['Pairings']
+    known = set(start) | set(s.translate(pairings)[::-1] for s in start)
+    assert len(sim.templates) > 0
+    assert set(sim.templates) <= known
+
+def test_batchMatchesAcrossStores(source):
+    histories = [runSim(source, Engine='Batch', TemplateStore=store)[0].history
+                 for store in ('List', 'Packed')]
+    for key in ('Number', 'Average', 'Uniques', 'Pool', 'EarlyQuit'):
+        assert histories[0][key] == histories[1][key]
+
+# without mutations no random numbers are drawn for copies, so the batch
+# engine takes the same steps as the loop
+def test_batchMatchesLoopWithoutMutation(source):
+    histories = [runSim(source, Engine=engine, PointMutations={}, BlockMutations={})[0].history
+                 for engine in ('Loop', 'Batch')]
+    for key in ('Number', 'Average', 'Uniques', 'Pool', 'EarlyQuit'):
+        assert histories[0][key] == histories[1][key]
+    assert list(histories[0]['Lengths']) == list(histories[1]['Lengths'])
+
+def test_unknownEngine(source):
+    with pytest.raises(ValueError, match='Unknown Engine'):
+        runSim(source, Engine='Unknown')
+
+# the event engine only changes how the next finishing replicators are found,
+# so from the same seed it makes the same run as the batch engine
+def test_eventMatchesBatch(source):
+    for store in ('List', 'Packed', 'Multiset'):
+        batch = runSim(source, Engine='Batch', TemplateStore=store)[0]
+        event = runSim(source, Engine='Event', TemplateStore=store)[0]
+        for key in ('Number', 'Average', 'Uniques', 'Pool', 'EarlyQuit'):
+            assert batch.history[key] == event.history[key]
+        assert sorted(batch.templates) == sorted(event.templates)
+
+def test_eventRespectsMaxReplications(source):
+    sim = runSim(source, Engine='Event', MaxReplications=200)[0]
+    assert sim.history['EarlyQuit'] == []
+    # no copy is finished after the last tick, and each takes at least
+    # MinLength ticks
+    assert sim.history['Number'][0] <= 30 + 10*200//sim.parameters['MinLength']
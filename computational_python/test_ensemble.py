@@ -0,0 +1,91 @@
+"""
+Tests of the Streaming Ensemble Statistics
+Run with pytest from this folder
+"""
+
+import numpy as np
+import ensemble
+
+# method to make the history of one run with the given series
+def makeHistory(average, number, uniques):
+    return {'Average': list(average), 'Number': list(number), 'Uniques': list(uniques),
+            'Pool': [{'A': a, 'C': 2*a} for a in number]}
+
+# stand in for a RunHandle, holding its parameters and history
+class Handle(object):
+    def __init__(self, history, **parameters):
+        self.history = history
+        self.parameters = parameters
+        self.sim = 'loaded'
+
+    def load(self):
+        return self
+
+# end of class Handle
+
+def test_seriesMatchesNumpy():
+    np.random.seed(0)
+    runs = np.random.random((25, 6))
+    stats = ensemble.SeriesStats()
+    for run in runs:
+        stats.add(run)
+    assert np.allclose(stats.mean, runs.mean(axis=0))
+    assert np.allclose(stats.variance(), runs.var(axis=0, ddof=1))
+
+def test_seriesOfDifferentLengths():
+    stats = ensemble.SeriesStats()
+    stats.add([1, 2, 3])
+    stats.add([3, 4])
+    assert stats.count.tolist() == [2, 2, 1]
+    assert stats.mean.tolist() == [2, 3, 3]
+    variance = stats.variance()
+    assert variance[:2].tolist() == [2, 2]
+    assert np.isnan(variance[2])
+
+def test_quantilesAreClose():
+    np.random.seed(1)
+    runs = np.random.random((2000, 3))*np.array([1, 10, 100])
+    sketch = ensemble.QuantileSketch(64)
+    for run in runs:
+        sketch.add(run)
+    assert len(sketch.levels) > 1
+    for q in (0.1, 0.5, 0.9):
+        rank = (runs <= sketch.quantile(q)).mean(axis=0)
+        assert (abs(rank - q) < 0.05).all()
+
+def test_quantileSkipsEpochsNotReached():
+    sketch = ensemble.QuantileSketch()
+    sketch.add(np.array([1.0, 5.0]))
+    sketch.add(np.array([3.0]))
+    median = sketch.quantile(0.5)
+    assert median[0] in (1.0, 3.0)
+    assert median[1] == 5.0
+
+def test_groupsByLabel():
+    handles = [Handle(makeHistory([10, 8], [4, 2], [3, 2]), Cycles=2, PointMutations={'addition': 0.1}),
+               Handle(makeHistory([12, 6], [6, 4], [5, 3]), Cycles=2, PointMutations={'addition': 0.1}),
+               Handle(makeHistory([20, 16, 14], [8, 6, 2], [7, 5, 1]), Cycles=3,
+                      PointMutations={'addition': 0.2})]
+    group = ensemble.Ensemble('PointMutations.addition')
+    group.addAll(handles)
+    assert all(h.sim is None for h in handles)
+    assert group.keys() == [0.1, 0.2]
+    assert group.runs == {0.1: 2, 0.2: 1}
+    assert group.categories() == ['Average', 'Number', 'Pool.A', 'Pool.C', 'Uniques']
+    assert group.mean('Average', 0.1).tolist() == [11, 7]
+    assert group.mean('Pool.C', 0.2).tolist() == [16, 12, 4]
+    keys, epochs, values = group.table('Average')
+    assert keys == [0.1, 0.2]
+    assert [list(e) for e in epochs] == [[0, 1], [0, 1]]
+    assert values == [[11, 7], [20, 16]]
+    keys, epochs, values = group.table('Number', 'variance')
+    assert values[0] == [2, 2]
+    assert np.isnan(values[1]).all()
+
+def test_unlabelledRunsShareOneGroup():
+    group = ensemble.Ensemble()
+    group.add(makeHistory([4, 2], [2, 1], [2, 1]))
+    group.add(Handle(makeHistory([6, 4], [4, 3], [3, 2])))
+    assert group.keys() == [None]
+    assert group.runs == {None: 2}
+    assert group.mean('Number').tolist() == [3, 2]
@@ -0,0 +1,53 @@
+"""
+Tests of the Columnar History Recorder
+Run with pytest from this folder
+"""
+
+import os, random
+import numpy as np
+import spiegelman
+import history_recorder
+
+# Type: source - the source fixture
+def runSim(source, **changes):
+    random.seed(3)
+    np.random.seed(3)
+    sim = spiegelman.SpSim(source(Cycles=4, **changes))
+    sim.run(0, progress=True)
+    return sim
+
+# a columnar run records what a full run records, from the same seed
+def test_matchesFullHistory(source, tmp_path):
+    full = runSim(source).history
+    recorder = runSim(source, History='Columnar', HistoryChunks=str(tmp_path / 'chunks')).history
+    assert isinstance(recorder, history_recorder.HistoryRecorder)
+    for key in ('Number', 'Average', 'Uniques', 'Pool', 'EarlyQuit'):
+        assert recorder[key] == full[key]
+    assert list(recorder['Lengths']) == full['Lengths']
+    assert len(recorder['Progress']) == len(full['Progress'])
+    for epoch, snapshots in zip(recorder['Progress'], full['Progress']):
+        assert len(epoch) == len(snapshots)
+        assert epoch[-1] == snapshots[-1]
+
+def test_lengthRowsInChunks(tmp_path):
+    rows = history_recorder.LengthRows(width=10, folder=str(tmp_path), chunk=3)
+    data = [[5, 12, 18, 40], [], [100], [3, 3, 3], [55, 51]]
+    for lengths in data:
+        rows.add(lengths)
+    assert len(rows) == 5
+    assert os.listdir(str(tmp_path)) == ['lengths_0.npz']
+    assert rows[0] == [5, 15, 15, 45]
+    assert rows[1] == [] and rows[3] == [5, 5, 5] and rows[-1] == [55, 55]
+
+def test_progressIsCapped():
+    rows = history_recorder.LengthRows()
+    epoch = history_recorder.ProgressEpoch(rows, 4)
+    for n in range(37):
+        epoch.append([n])
+    assert len(epoch) == 37
+    kept = list(epoch)
+    assert len(kept) <= 5
+    assert kept[-1] == [36] and kept[0] == [0]
+    epoch.close()
+    assert list(epoch) == kept
+    assert epoch[20] == max((k for k in kept if k[0] <= 20), key=lambda k: k[0])
@@ -0,0 +1,38 @@
+"""
+Tests of Hybrid Runs
+Run with pytest from this folder
+"""
+
+import os, random
+import numpy as np
+import spiegelman
+
+# Type: source - the source fixture
+def runHybrid(source, **changes):
+    random.seed(0)
+    np.random.seed(0)
+    sim = spiegelman.SpSim(source(InitialTemplates=200, Cycles=4, Hybrid='Cycles', HybridSwitch=2,
+                                  HybridMaxLength=400,
+                                  InitialPool={'A':20000, 'C':20000, 'G':20000, 'U':20000},
+                                  **changes))
+    sim.run(0)
+    return sim
+
+def test_meanFieldCyclesHaveNoUniques(source, tmp_path):
+    cache = str(tmp_path / 'matrices')
+    sim = runHybrid(source, HybridCache=cache)
+    assert [model for cycle, model in sim.history['Hybrid']] == ['MeanField', 'Stochastic']
+    uniques = sim.history['Uniques']
+    assert len(uniques) == 4
+    assert np.isnan(uniques[:2]).all()
+    assert not np.isnan(uniques[2:]).any()
+    assert all(n > 0 for n in sim.history['Number'])
+    assert len(os.listdir(cache)) == 1
+
+def test_columnarHistoryNotCachedByDefault(source, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sim = runHybrid(source, History='Columnar')
+    uniques = sim.history['Uniques']
+    assert np.isnan(uniques[:2]).all()
+    assert not np.isnan(uniques[2:]).any()
+    assert os.listdir(str(tmp_path)) == []
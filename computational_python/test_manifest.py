@@ -0,0 +1,61 @@
+"""
+Tests of Sweep Folder Manifests
+Run with pytest from this folder
+"""
+
+import os
+import matplotlib
+matplotlib.use('Agg')
+import manifest
+import parameters
+import run_simulation
+import simhist
+
+# method to write a small run into a folder
+# Type: folder - pathlib.Path
+#       name - str
+#       transfer - number, TransferPercent of the run
+def writeRun(folder, name, transfer):
+    ps = dict(parameters.parameters, TransferPercent=transfer)
+    history = {'Number': [4, 2], 'Average': [3, 5], 'Lengths': [[1, 3, 3, 4], [5, 5]],
+               'Pool': [{'A': 1}, {'A': 0}], 'Uniques': [3, 1], 'EarlyQuit': [], 'Progress': []}
+    simhist.write(str(folder / name), history, ['ACGUA', 'UUGCA'], ps)
+
+def test_selectThenLoadLazily(tmp_path):
+    for n, transfer in enumerate((5, 10, 20)):
+        writeRun(tmp_path, str(n) + '.SIMHIST', transfer)
+    index = manifest.Index(str(tmp_path))
+    assert os.path.isfile(str(tmp_path / manifest.MANIFEST))
+    assert [run['Summary']['Number'] for run in index.runs] == [2, 2, 2]
+    runs = index.select({'TransferPercent': lambda t: t >= 10})
+    handles = index.load(runs)
+    assert [h.parameters['TransferPercent'] for h in handles] == [10, 20]
+    assert all(h.sim is None for h in handles)
+    assert handles[0].history['Number'] == [4, 2]
+    assert handles[0].sim is not None and handles[1].sim is None
+
+def test_reopenedManifest(tmp_path):
+    writeRun(tmp_path, '0.SIMHIST', 5)
+    manifest.Index(str(tmp_path))
+    writeRun(tmp_path, '1.SIMHIST', 10)
+    index = manifest.Index(str(tmp_path))
+    assert [run['Parameters']['TransferPercent'] for run in index.runs] == [5, 10]
+    assert not index.update()
+
+def test_loadOnWorkers(tmp_path):
+    for n, transfer in enumerate((5, 10)):
+        writeRun(tmp_path, str(n) + '.SIMHIST', transfer)
+    index = manifest.Index(str(tmp_path))
+    handles = index.load(workers=2)
+    assert all(h.sim is not None for h in handles)
+    assert [h.history['Average'] for h in handles] == [[3, 5], [3, 5]]
+
+def test_getOutputs(tmp_path):
+    for n, transfer in enumerate((5, 10, 20)):
+        writeRun(tmp_path, str(n) + '.SIMHIST', transfer)
+    ps, handles = run_simulation.getOutputs(str(tmp_path), {'TransferPercent': 20})
+    assert [h.parameters['TransferPercent'] for h in handles] == [20]
+    assert handles[0].sim is None
+    assert ps[0].parameters['TransferPercent'] == 20
+    ps, handles = run_simulation.getOutputs(str(tmp_path), workers=2)
+    assert len(handles) == 3 and all(h.sim is not None for h in handles)
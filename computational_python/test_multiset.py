@@ -0,0 +1,64 @@
+"""
+Tests of the Multiset Template Store
+Run with pytest from this folder
+"""
+
+import random
+import numpy as np
+import pytest
+import multiset
+
+def census(seed = 0):
+    rng = random.Random(seed)
+    distinct = ['A'*n + 'CG' for n in range(12)]
+    return [rng.choice(distinct[:rng.randint(1, 12)]) for n in range(300)]
+
+def test_behavesAsCensus():
+    templates = census()
+    store = multiset.TemplateMultiset(templates)
+    assert len(store) == len(templates)
+    assert store.uniqueCount() == len(set(templates))
+    assert sorted(store) == sorted(templates)
+    assert sorted(store.lengths.tolist()) == sorted(len(t) for t in templates)
+    counted = [store[i] for i in range(len(store))]
+    assert counted == store.tolist()
+    assert store[-1] == counted[-1]
+    with pytest.raises(IndexError):
+        store[len(store)]
+
+def test_appendAndTruncate():
+    store = multiset.TemplateMultiset(['AC', 'AC', 'GU'])
+    for t in ('GU', 'UUU', 'AC', 'UUU'):
+        store.append(t)
+    assert sorted(store) == sorted(['AC']*3 + ['GU']*2 + ['UUU']*2)
+    assert [store[i] for i in range(len(store))] == store.tolist()
+    del store[5:]
+    assert sorted(store) == sorted(['AC']*2 + ['GU']*2 + ['UUU'])
+    assert store.uniqueCount() == 3
+    with pytest.raises(TypeError):
+        del store[1:]
+
+def test_select():
+    store = multiset.TemplateMultiset(['AC', 'AC', 'GU', 'UUU'])
+    chosen = store.select(np.array([0, 2, 3]))
+    assert sorted(chosen) == ['AC', 'GU', 'UUU']
+
+def test_thinCounts():
+    np.random.seed(0)
+    counts = np.array([50, 0, 30, 20])
+    kept = multiset.thinCounts(counts, 40)
+    assert kept.sum() == 40 and (kept <= counts).all()
+    weighted = multiset.thinCounts(counts, 40, np.array([1.0, 1.0, 0.0, 3.0]))
+    assert weighted.sum() == 40 and weighted[2] == 0 and (weighted <= counts).all()
+    filled = multiset.thinCounts(counts, 80, np.array([1.0, 1.0, 0.0, 3.0]))
+    assert filled[0] == 50 and filled[3] == 20 and filled[2] == 10
+    with pytest.raises(ValueError):
+        multiset.thinCounts(counts, 101)
+
+# heavier sequences keep more of their copies, as weighted sampling would
+def test_thinFollowsWeights():
+    np.random.seed(1)
+    counts = np.array([1000, 1000])
+    kept = np.array([multiset.thinCounts(counts, 500, np.array([1.0, 4.0])) for n in range(50)])
+    assert (kept.sum(axis=1) == 500).all()
+    assert kept[:, 1].mean() > 2*kept[:, 0].mean()
@@ -0,0 +1,66 @@
+"""
+Tests of the Mutation Kernels
+Run with pytest from this folder
+"""
+
+import numpy as np
+import parameters
+import mutation
+
+CODES = mutation.baseCodes(parameters.parameters['Pairings'])
+
+def copies():
+    return ['ACGUACGU', '', 'UUUU', 'GCA'*20]
+
+def test_encodeDecode():
+    buf, lengths = mutation.encode(copies())
+    assert lengths.tolist() == [len(s) for s in copies()]
+    assert mutation.decode(buf, lengths) == copies()
+
+def test_pairingTable():
+    table = mutation.pairingTable(parameters.parameters['Pairings'])
+    buf, lengths = mutation.encode(['ACGU'])
+    assert mutation.decode(table[buf], lengths) == ['UGCA']
+
+def test_noRatesLeaveCopies():
+    buf, lengths = mutation.encode(copies())
+    out, sizes = mutation.pointMutation(buf.copy(), lengths, {}, CODES)
+    assert mutation.decode(out, sizes) == copies()
+    out, sizes = mutation.blockMutation(buf.copy(), lengths, {}, lengths)
+    assert mutation.decode(out, sizes) == copies()
+
+def test_pointMutationRates():
+    np.random.seed(0)
+    strings = ['A'*1000]*20
+    buf, lengths = mutation.encode(strings)
+    out, sizes = mutation.pointMutation(buf.copy(), lengths, {'substitution': 0.2}, CODES)
+    assert sizes.tolist() == lengths.tolist()
+    # positions can be drawn twice, and a quarter of substitutions draw A again
+    changed = (out != buf).mean()
+    assert abs(changed - (1 - np.exp(-0.2))*3/4) < 0.01
+    out, sizes = mutation.pointMutation(buf.copy(), lengths, {'deletion': 1}, CODES)
+    assert (sizes < lengths).all() and out.size == sizes.sum()
+    out, sizes = mutation.pointMutation(buf.copy(), lengths, {'addition': 1}, CODES)
+    assert sizes.tolist() == [2000]*20 and out.size == 40000
+    out, sizes = mutation.pointMutation(buf.copy(), lengths, {'addition': 0.1, 'deletion': 0.1}, CODES)
+    assert out.size == sizes.sum()
+    assert abs(sizes.mean() - 1000) < 30
+
+# segments of the original buffer, sliced as the string edits sliced the copy
+def test_take():
+    segments = [(0, 10), (20, 25)]
+    assert mutation._take(segments, 2, 5) == [(2, 5)]
+    assert mutation._take(segments, 8, 12) == [(8, 10), (20, 22)]
+    assert mutation._take(segments, 12, mutation.END) == [(22, 25)]
+    assert mutation._take(segments, 5, 3) == []
+
+def test_blockMutation():
+    np.random.seed(1)
+    strings = ['ACGU'*50]*200
+    buf, lengths = mutation.encode(strings)
+    for kind in ('addition', 'deletion'):
+        out, sizes = mutation.blockMutation(buf.copy(), lengths, {kind: 0.002}, lengths)
+        assert out.size == sizes.sum()
+        edited = [s != before for s, before in zip(mutation.decode(out, sizes), strings)]
+        # a copy is edited only if it has at least one event, 1 - (1 - p)^200 of them
+        assert 0.2 < np.mean(edited) < 0.45
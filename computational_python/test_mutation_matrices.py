@@ -0,0 +1,57 @@
+"""
+Tests of the Mutation Matrices
+Run with pytest from this folder
+"""
+
+import os
+import numpy as np
+import pytest
+from scipy import sparse
+import mutation_matrices
+
+rates = (0.01, 0.01, 5e-3, 5e-3)
+
+# method to make a small grid of lengths
+def grid():
+    return np.arange(1, 202, 4, dtype=float)
+
+def test_pointMatchesBindif():
+    l = grid()
+    d = mutation_matrices.calcDeltaM(l, rates, 1)
+    assert sparse.issparse(d)
+    expected = np.array([mutation_matrices.bindif(l - x, x, rates) for x in l])
+    assert np.allclose(d.toarray(), expected, rtol=0, atol=1e-10)
+    assert np.allclose(d.sum(axis=1)[:40], 1)
+
+def test_noMutation():
+    l = grid()
+    assert (mutation_matrices.calcDeltaM(l, rates, 0) != sparse.identity(len(l))).nnz == 0
+    assert (mutation_matrices.calcDeltaB(l, rates, 1) != sparse.identity(len(l))).nnz == 0
+
+def test_blockMatrixAsWritten():
+    l = grid()
+    b = mutation_matrices.calcDeltaB(l, rates, 2)
+    i = np.arange(1, len(l) + 1)
+    dense = np.where(i[None, :] <= 2*i[:, None], b.row[None, :]/(2*i[:, None]), 0)
+    dense += np.diag(b.diagonal)
+    assert np.allclose(b.toarray(), dense)
+    assert np.allclose(dense.sum(axis=0) - np.diag(dense) + b.diagonal, 1)
+    x = np.random.random((len(l), 3))
+    assert np.allclose(b @ x, dense @ x)
+    assert np.allclose(b.T @ x, dense.T @ x)
+    assert np.allclose(b.rmatvec(x[:, 0]), dense.T @ x[:, 0])
+
+def test_cacheHit(tmp_path, monkeypatch):
+    l = grid()
+    cache = str(tmp_path / 'cache')
+    d, b = mutation_matrices.matrices(l, rates, 2, cache)
+    assert os.listdir(cache) == [mutation_matrices.matrixKey(l, rates, 2, 1e-12) + '.npz']
+    def fail(*args):
+        raise AssertionError('built again')
+    monkeypatch.setattr(mutation_matrices, 'calcDeltaM', fail)
+    cached, b = mutation_matrices.matrices(l, rates, 2, cache)
+    assert (cached != d).nnz == 0
+    with pytest.raises(AssertionError, match='built again'):
+        mutation_matrices.matrices(l, (0.02,) + rates[1:], 2, cache)
+    with pytest.raises(AssertionError, match='built again'):
+        mutation_matrices.matrices(l, rates, 2, None)
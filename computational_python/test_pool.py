@@ -0,0 +1,46 @@
+"""
+Tests of the Monomer Pools
+Run with pytest from this folder
+"""
+
+import numpy as np
+import pytest
+import parameters
+import spiegelman
+
+def makePools(**changes):
+    ps = dict(parameters.parameters, InitialPool={'A':10, 'C':8, 'G':6, 'U':4}, EmptyPool=0.25)
+    ps.update(changes)
+    pools = (spiegelman.Pool(ps), spiegelman.VectorPool(ps))
+    for pool in pools:
+        pool.initialise()
+    return pools
+
+# the vector pool is a drop in replacement for Pool
+def test_vectorPoolMatchesPool():
+    for copy in ('ACGU', 'AAAAC', 'GG', 'UUU', 'CCCCCC'):
+        pool, vector = makePools()
+        for n in range(3):
+            pool.deplete(copy)
+            vector.deplete(copy)
+            assert vector.quantities == pool.quantities
+            assert vector.current == pool.current
+            assert vector.isEmpty == pool.isEmpty
+            assert vector.isLow() == pool.isLow()
+
+def test_countsOf():
+    vector = makePools()[1]
+    assert vector.countsOf('AACGUUU').tolist() == [2, 1, 1, 3]
+    with pytest.raises(KeyError):
+        vector.countsOf('ACGT')
+
+def test_depleteBatchStopsAtEmpty():
+    vector = makePools()[1]
+    counts = np.array([[1, 1, 1, 1], [0, 0, 2, 3], [5, 0, 0, 0]])
+    assert vector.depleteBatch(counts) == 1
+    assert vector.quantities == {'A':9, 'C':7, 'G':3, 'U':0}
+    assert vector.isEmpty
+    vector = makePools()[1]
+    assert vector.depleteBatch(counts[[0, 2]]) is None
+    assert vector.quantities == {'A':4, 'C':7, 'G':5, 'U':3}
+    assert vector.depleteBatch(np.zeros((0, 4), dtype=int)) is None
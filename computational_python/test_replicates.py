@@ -0,0 +1,57 @@
+"""
+Tests of the Replicate Ensembles
+Run with pytest from this folder
+"""
+
+import os, random
+import numpy as np
+import replicates
+import spiegelman
+
+# method to make the parameters of small replicates, for the event engine
+# Type: source - the source fixture
+def settings(source, **changes):
+    return source(Engine='Event', **changes).parameters
+
+def test_oneReplicateMatchesEventEngine(source):
+    random.seed(0)
+    np.random.seed(0)
+    runner = replicates.ReplicateRunner(settings(source), 1)
+    histories = runner.run(0)
+    random.seed(0)
+    np.random.seed(0)
+    sim = spiegelman.SpSim(source(Engine='Event'))
+    sim.run(0)
+    for key in ('Number', 'Lengths', 'Pool', 'Uniques', 'EarlyQuit'):
+        assert histories[0][key] == sim.history[key]
+
+def test_replicatesRunApart(source):
+    random.seed(1)
+    np.random.seed(1)
+    runner = replicates.ReplicateRunner(settings(source), 3)
+    histories = runner.run(0)
+    assert histories == runner.histories
+    assert all(len(h['Number']) == 3 for h in histories)
+    assert all(h is s.history for h, s in zip(histories, runner.sims))
+    assert histories[0]['Lengths'] != histories[1]['Lengths']
+
+def test_replicatesStopOnTheirOwn(source):
+    random.seed(2)
+    np.random.seed(2)
+    runner = replicates.ReplicateRunner(settings(source, Cycles=8, Convergence='Median',
+                                                 ConvergenceTolerance=1.0,
+                                                 ConvergenceWindow=2), 2)
+    histories = runner.run(0)
+    for h in histories:
+        stop = h['Converged'][0][0]
+        assert stop < 7
+        assert len(h['Number']) == stop + 1
+
+def test_exportTo(source, tmp_path):
+    folder = str(tmp_path / 'runs')
+    runner = replicates.ReplicateRunner(settings(source, Cycles=1), 2)
+    runner.run(0)
+    runner.export_to(folder)
+    assert sorted(os.listdir(folder)) == ['0.SIMHIST', '1.SIMHIST']
+    loaded = spiegelman.SpSim(folder + '/1.SIMHIST')
+    assert loaded.history['Number'] == runner.sims[1].history['Number']
@@ -0,0 +1,93 @@
+"""
+Tests of the Mean Field Model
+Run with pytest from this folder
+"""
+
+import numpy as np
+from scipy import sparse
+import mutation_matrices
+import replication_system
+
+# method to make a small grid of lengths, with its initial genomes
+def smallGrid():
+    return replication_system.defaultParameters(mean=101, sigma=10, number=100)
+
+# method to build both mutation matrices
+def mutationMatrices(l, ps, mode = 2):
+    return mutation_matrices.calcDeltaM(l, ps, mode), mutation_matrices.calcDeltaB(l, ps, mode)
+
+# method to get a matrix, sparse matrix or operator as an array
+def dense(m):
+    return m.toarray() if hasattr(m, 'toarray') else np.asarray(m)
+
+def test_transferKeepsGamma():
+    l = np.array([10.0, 20.0, 40.0])
+    n = np.array([4.0, 2.0, 1.0])
+    kept = replication_system.transfer(l, n, 0.5, 0)
+    assert np.allclose(kept, 0.5*n)
+    kept = replication_system.transfer(l, n, 0.5, 1)
+    assert np.isclose(kept.sum(), 0.5*n.sum())
+    assert np.allclose(kept, 3.5*np.array([40, 40, 40])/120)
+
+def test_transferByColumn():
+    l = np.array([10.0, 20.0, 40.0])
+    n = np.array([[4.0, 1.0], [2.0, 1.0], [1.0, 3.0]])
+    kept = replication_system.transfer(l, n, np.array([0.5, 0.2]), np.array([1, 2]))
+    for c, (g, kappa) in enumerate([(0.5, 1), (0.2, 2)]):
+        assert np.allclose(kept[:, c], replication_system.transfer(l, n[:, c], g, kappa))
+
+def test_growthWithoutMutation():
+    l = np.array([10.0, 20.0, 40.0])
+    d, b = mutationMatrices(l, (0, 0, 0, 0), 0)
+    a = replication_system.systemOperator(d, b, l, 1, 10, l > 0)
+    n0 = np.array([0.0, 5.0, 0.0])
+    times, hist = replication_system.solve(a, l, n0, 1, 0, (0, 4), 1, -1, 3)
+    assert times.tolist() == [0, 2, 4]
+    assert np.allclose(hist[:, 1], 5 + 10*times/20)
+    assert (hist[:, [0, 2]] == 0).all()
+
+def test_operatorMatchesDense():
+    params = smallGrid()
+    l = params['l']
+    d, b = mutationMatrices(l, (0.01, 0.01, 5e-3, 5e-3))
+    rj = l > params['reject']
+    a = replication_system.systemOperator(d, b, l, 1, 10, rj)
+    product = np.diag(rj.astype(float)) @ dense(b).T @ dense(d).T @ np.diag(10/l)
+    x = np.random.random(len(l))
+    assert np.allclose(a @ x, product @ x)
+    a = replication_system.systemOperator(d, sparse.csr_matrix(dense(b)), l, 1, 10, rj)
+    assert sparse.issparse(a)
+    assert np.allclose(a @ x, product @ x)
+
+def test_epochsCarryOn():
+    params = smallGrid()
+    l = params['l']
+    d, b = mutationMatrices(l, params['ps'])
+    a = replication_system.systemOperator(d, b, l, 1, 10, l > params['reject'])
+    times, hist = replication_system.solve(a, l, params['n0'], 0.2, 1, (0, 10), 3, 2, 5)
+    assert len(times) == len(hist) == 15
+    assert times[4] == times[5] == 10
+    assert np.isclose(hist[5].sum(), 0.2*hist[4].sum())
+    assert (hist >= -1e-6).all()
+
+def test_gridMatchesEachPair():
+    params = smallGrid()
+    l = params['l']
+    d, b = mutationMatrices(l, params['ps'])
+    a = replication_system.systemOperator(d, b, l, 1, 10, l > params['reject'])
+    kappas, gammas = [0, 2], [0.2, 0.5]
+    times, hists = replication_system.solveGrid(a, l, params['n0'], gammas, kappas, (0, 10), 3, 2, 5)
+    assert hists.shape == (2, 2, 15, len(l))
+    for i, kappa in enumerate(kappas):
+        for j, gamma in enumerate(gammas):
+            t, hist = replication_system.solve(a, l, params['n0'], gamma, kappa, (0, 10), 3, 2, 5)
+            assert np.allclose(times, t)
+            assert np.allclose(hists[i, j], hist, rtol=1e-4, atol=1e-4*hist.max())
+
+def test_rSysSolve():
+    params = dict(smallGrid(), epochs=2, kappa=[1], tlims=(0, 5))
+    d, b = mutationMatrices(params['l'], params['ps'])
+    times, hists = replication_system.rSysSolve(d, b, [0.3], params, points=4)
+    assert hists.shape == (1, 1, 8, len(params['l']))
+    average = replication_system.averageLength(hists[0, 0], params['l'])
+    assert np.all(abs(average - 101) < 20)
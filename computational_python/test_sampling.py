@@ -0,0 +1,46 @@
+"""
+Tests of Weighted Sampling
+Run with pytest from this folder
+"""
+
+import itertools
+import numpy as np
+import pytest
+import sampling
+
+def test_sampleIsDistinctAndSorted():
+    np.random.seed(0)
+    chosen = sampling.weightedSample(np.random.random(1000), 100)
+    assert len(chosen) == 100
+    assert len(set(chosen.tolist())) == 100
+    assert (np.diff(chosen) > 0).all()
+    assert len(sampling.weightedSample([1, 2], 0)) == 0
+    with pytest.raises(ValueError):
+        sampling.weightedSample([1, 2], 3)
+
+def test_zeroWeightsOnlyFill():
+    np.random.seed(1)
+    chosen = sampling.weightedSample([0, 5, 0, 0, 2, 0], 4).tolist()
+    assert 1 in chosen and 4 in chosen and len(set(chosen)) == 4
+
+# inclusion chances match drawing one at a time and renormalising
+def test_matchesSequentialDraws():
+    np.random.seed(2)
+    w = np.array([1.0, 2.0, 3.0, 4.0])
+    expected = np.zeros(4)
+    for i, j in itertools.permutations(range(4), 2):
+        chance = w[i]/w.sum()*w[j]/(w.sum() - w[i])
+        expected[[i, j]] += chance
+    counts = np.zeros(4)
+    trials = 20000
+    for n in range(trials):
+        counts[sampling.weightedSample(w, 2)] += 1
+    assert np.allclose(counts/trials, expected, atol=0.015)
+
+def test_negativeScores():
+    assert sampling.weightsOf([-1, 0, 2]).tolist() == [0, 1, 3]
+    assert sampling.weightsOf([-1, 0, 2], 'clip').tolist() == [0, 0, 2]
+    with pytest.raises(ValueError):
+        sampling.weightsOf([-1, 0, 2], 'raise')
+    with pytest.raises(ValueError):
+        sampling.weightsOf([1, float('nan')])
@@ -0,0 +1,70 @@
+"""
+Tests of the Binary History Files
+Run with pytest from this folder
+"""
+
+import random
+import numpy as np
+import parameters
+import simhist
+import spiegelman
+import template_arena
+
+def makeHistory():
+    return {'Number': [3, 2], 'Average': [4, 2], 'Lengths': [[2, 4, 5], [1, 2]],
+            'Pool': [{'A': 5, 'C': 6}, {'A': 1, 'C': 2}], 'Uniques': [3, 2],
+            'EarlyQuit': [(0, 12)], 'Progress': [[[1, 2], [1, 2, 3]], []]}
+
+def test_roundTrip(tmp_path):
+    fileName = str(tmp_path / 'run.SIMHIST')
+    history = makeHistory()
+    templates = ['ACGU', 'UUA', '', 'GGGGGCA']
+    simhist.write(fileName, history, templates, dict(parameters.parameters))
+    assert simhist.isBinary(fileName)
+    loaded, arena, ps = simhist.read(fileName)
+    assert ps['Pairings'] == parameters.parameters['Pairings']
+    assert loaded.keys() == list(history)
+    for key in ('Number', 'Average', 'Pool', 'Uniques', 'EarlyQuit'):
+        assert loaded[key] == history[key]
+    assert list(loaded['Lengths']) == history['Lengths']
+    assert [list(epoch) for epoch in loaded['Progress']] == history['Progress']
+    assert isinstance(arena, template_arena.TemplateArena)
+    assert isinstance(arena.data, np.memmap)
+    assert arena[1] == 'UUA'
+    assert list(arena) == templates
+    assert simhist.readHeader(fileName)['Parameters'] == ps
+
+def test_loadedTemplatesCanGrow(tmp_path):
+    fileName = str(tmp_path / 'run.SIMHIST')
+    simhist.write(fileName, makeHistory(), ['ACG', 'UA'], dict(parameters.parameters))
+    arena = simhist.read(fileName)[1]
+    arena.append('GGU')
+    assert list(arena) == ['ACG', 'UA', 'GGU']
+    assert list(simhist.read(fileName)[1]) == ['ACG', 'UA']
+
+def test_truncatedTemplatesCopyFirst(tmp_path):
+    fileName = str(tmp_path / 'run.SIMHIST')
+    simhist.write(fileName, makeHistory(), ['ACGUACGU', 'UA', 'GGC'], dict(parameters.parameters))
+    arena = simhist.read(fileName)[1]
+    del arena[1:]
+    assert not isinstance(arena.data, np.memmap)
+    arena.append('CC')
+    arena.extend(['U', 'AG'])
+    assert list(arena) == ['ACGUACGU', 'CC', 'U', 'AG']
+    assert list(simhist.read(fileName)[1]) == ['ACGUACGU', 'UA', 'GGC']
+
+def test_simulationRoundTrip(source, tmp_path):
+    fileName = str(tmp_path / 'run.SIMHIST')
+    random.seed(0)
+    np.random.seed(0)
+    sim = spiegelman.SpSim(source(Cycles=2))
+    sim.run(0)
+    sim.export_to(fileName)
+    loaded = spiegelman.SpSim(fileName)
+    assert isinstance(loaded.templates, template_arena.TemplateArena)
+    assert list(loaded.templates) == list(sim.templates)
+    assert loaded.history['Number'] == sim.history['Number']
+    assert list(loaded.history['Lengths']) == sim.history['Lengths']
+    assert loaded.history['Pool'] == sim.history['Pool']
+    loaded.run(0)
+    assert len(loaded.history['Number']) == 4
@@ -0,0 +1,113 @@
+"""
+Tests of the Spatial Variant
+Run with pytest from this folder
+"""
+
+import random, multiprocessing
+import numpy as np
+import pytest
+import matplotlib
+matplotlib.use('Agg')
+import spatial
+
+# method to make a small spatial simulation from the default parameters
+# Type: changes - parameters to set before the instances are made
+def makeSim(**changes):
+    sim = spatial.SptSim()
+    changes.setdefault('InitialTemplates', 20)
+    changes.setdefault('InitialPool', {'A':20000, 'C':20000, 'G':20000, 'U':20000})
+    for key in changes:
+        sim.parameters.set(key, changes[key])
+    sim.instances = dict()
+    sim.__set_size__(sim.parameters.get('Size'))
+    return sim
+
+# stand in for an SpSim, holding only what migrate reads
+class Cell(object):
+    def __init__(self, instance, templates):
+        self.parameters = {'Instance' : instance}
+        self.templates = list(templates)
+
+# end of class Cell
+
+def test_complexPrefScoresByCell():
+    quantities = {0: {'A':10, 'C':10}, 1: {'A':0, 'C':10}, 2: {'A':5, 'C':0}}
+    ranking = spatial.rank(quantities, [0, 1, 2], ['A', 'C'])
+    cell = Cell(0, ['AAA', 'CCC', 'AAAC'])
+    np.random.seed(0)
+    moves = spatial.migrate(cell, 'ComplexPref', ranking, [0, 1, 2], 100)
+    expected = {'AAA': 1, 'CCC': 2, 'AAAC': 1}
+    moved = [(target, s) for target in moves for s in moves[target]]
+    assert len(moved) == 2
+    assert all(expected[s] == target for target, s in moved)
+    assert sorted(cell.templates + [s for target, s in moved]) == sorted(expected)
+
+def test_complexPrefTable():
+    quantities = {0: {'A':10, 'C':10}, 1: {'A':0, 'C':10}, 2: {'A':5, 'C':0}}
+    ranking = spatial.rank(quantities, [0, 1, 2], ['A', 'C'])
+    table = spatial.quantityTable(quantities, [2, 0], ['A', 'C'])
+    assert table.tolist() == [[5, 10], [0, 10]]
+    templates = ['AAA', 'CCC', 'AAAC', 'CA', 'CCCA']
+    cell = Cell(0, templates)
+    np.random.seed(3)
+    given = spatial.migrate(cell, 'ComplexPref', ranking, [0, 1, 2], 100,
+                            spatial.quantityTable(quantities, [0, 1, 2], ['A', 'C']))
+    cell = Cell(0, templates)
+    np.random.seed(3)
+    assert spatial.migrate(cell, 'ComplexPref', ranking, [0, 1, 2], 100) == given
+
+def test_migrateNeverEmpties():
+    quantities = {0: {'A':10, 'C':10}, 1: {'A':0, 'C':0}}
+    ranking = spatial.rank(quantities, [0, 1], ['A', 'C'])
+    for kind in ('Preference', 'ComplexPref'):
+        cell = Cell(0, ['AC', 'CA', 'AAC'])
+        moves = spatial.migrate(cell, kind, ranking, [0, 1], 100)
+        assert len(cell.templates) == 1
+        assert sum(len(m) for m in moves.values()) == 2
+
+def test_defaultShuffleRuns():
+    random.seed(1)
+    np.random.seed(1)
+    sim = makeSim(Epochs=4)
+    assert sim.parameters.get('ShuffleType') == 'ComplexPref'
+    assert sim.parameters.get('ShufflePercent') == 100
+    sim.run(0)
+    assert all(len(sim.instances[sp].templates) > 0 for sp in sim.instances)
+    assert len(sim.history) == 4
+
+def test_exportReadBack(tmp_path):
+    random.seed(4)
+    np.random.seed(4)
+    sim = makeSim(Epochs=1)
+    sim.run(0)
+    back = spatial.SptSim(sim.export_to(str(tmp_path / 'run')))
+    assert back.history == sim.history
+    assert back.parameters.list() == sim.parameters.list()
+    assert sorted(back.instances) == sorted(sim.instances)
+
+def test_runParallel():
+    np.random.seed(2)
+    sim = makeSim(Epochs=2)
+    sim.run(0, workers=2)
+    assert sorted(sim.instances) == [0, 1, 2, 3]
+    assert all(len(sim.instances[sp].templates) > 0 for sp in sim.instances)
+    assert len(sim.history) == 2
+
+def test_runParallelWorkerFails():
+    sim = makeSim(Epochs=2)
+    sim.instances[3].parameters['Engine'] = 'Unknown'
+    with pytest.raises(ValueError, match='Unknown Engine'):
+        sim.run(0, workers=2)
+    assert multiprocessing.active_children() == []
+
+def test_neighbourhoodsMadeOncePerRun(monkeypatch):
+    made = list()
+    build = spatial.neighbourhoods
+    def counted(*args):
+        made.append(args)
+        return build(*args)
+    monkeypatch.setattr(spatial, 'neighbourhoods', counted)
+    sim = makeSim(Epochs=3, Topology='VonNeumann')
+    sim.run(0)
+    assert len(made) == 1
+    assert all(len(sim.instances[sp].templates) > 0 for sp in sim.instances)
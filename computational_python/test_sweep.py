@@ -0,0 +1,72 @@
+"""
+Tests of Parallel Sweeps
+Run with pytest from this folder
+"""
+
+import os
+import simhist
+import sweep
+
+def test_cacheMissThenHit(source, tmp_path, monkeypatch):
+    cache = str(tmp_path / 'cache')
+    inputs = [source(TransferPercent=10), source(TransferPercent=20)]
+    made = list()
+    runJob = sweep.runJob
+    def counted(job):
+        made.append(job)
+        return runJob(job)
+    monkeypatch.setattr(sweep, 'runJob', counted)
+    first = sweep.execute(inputs, str(tmp_path / 'first'), workers=1, seed=5, cache=cache)
+    assert len(made) == 2
+    assert len(list((tmp_path / 'cache').iterdir())) == 2
+    # a hit reads only the header of the cached file
+    def unexpected(fileName):
+        raise AssertionError('a cache hit decoded ' + fileName)
+    monkeypatch.setattr(simhist, 'read', unexpected)
+    second = sweep.execute(inputs, str(tmp_path / 'second'), workers=1, seed=5, cache=cache)
+    assert len(made) == 2
+    assert [h.parameters['TransferPercent'] for h in second] == [10, 20]
+    assert [h.seed for h in second] == [h.seed for h in first]
+    for a, b in zip(first, second):
+        with open(a.fileName, 'rb') as f, open(b.fileName, 'rb') as g:
+            assert f.read() == g.read()
+
+def test_cacheKeyedOnSettings(source, tmp_path):
+    cache = str(tmp_path / 'cache')
+    sweep.execute([source()], str(tmp_path / 'a'), workers=1, seed=1, cache=cache)
+    sweep.execute([source(TransferPercent=30)], str(tmp_path / 'b'), workers=1, seed=1, cache=cache)
+    sweep.execute([source()], str(tmp_path / 'c'), workers=1, seed=2, cache=cache)
+    assert len(list((tmp_path / 'cache').iterdir())) == 3
+    assert sweep.runKey(source(), None, 1) == sweep.runKey(source(), None, 1)
+    assert sweep.runKey(source(), None, 1) != sweep.runKey(source(), None, 2)
+
+def test_cacheOptIn(source, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    made = list()
+    runJob = sweep.runJob
+    def counted(job):
+        made.append(job)
+        return runJob(job)
+    monkeypatch.setattr(sweep, 'runJob', counted)
+    sweep.execute([source()], 'a', workers=1, seed=1)
+    sweep.execute([source()], 'b', workers=1, seed=1)
+    assert sorted(os.listdir('.')) == ['a', 'b']
+    # unseeded runs are fresh draws, so they are made even given a cache
+    sweep.execute([source()], 'c', workers=1, cache='cache')
+    sweep.execute([source()], 'd', workers=1, cache='cache')
+    assert len(made) == 4
+    assert os.listdir('cache') == []
+
+# each run is seeded from its settings, so the pool makes the same runs as
+# one process does, and hands them back in the order of the inputs
+def test_poolMatchesSerial(source, tmp_path):
+    inputs = [source(TransferPercent=t) for t in (10, 20, 30)]
+    serial = sweep.execute(inputs, str(tmp_path / 'serial'), workers=1, seed=7)
+    pooled = sweep.execute(inputs, str(tmp_path / 'pooled'), workers=2, seed=7)
+    assert [h.parameters['TransferPercent'] for h in pooled] == [10, 20, 30]
+    assert [h.seed for h in pooled] == [h.seed for h in serial]
+    for a, b in zip(serial, pooled):
+        assert a.history['Number'] == b.history['Number']
+        assert list(a.templates) == list(b.templates)
+    assert sorted(os.listdir(str(tmp_path / 'pooled'))) == \
+           ['0.SIMHIST', '1.SIMHIST', '2.SIMHIST', 'manifest.SIMINDEX']
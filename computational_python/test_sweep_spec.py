@@ -0,0 +1,55 @@
+"""
+Tests of Declarative Sweeps
+Run with pytest from this folder
+"""
+
+import os
+import matplotlib
+matplotlib.use('Agg')
+import sweep
+import sweep_spec
+
+def test_refineNumeric():
+    axes = {'Replicators': [5, 10, 20], 'TransferPercent': (10.0, 30.0, 3)}
+    points = sweep_spec.grid(axes)
+    results = [p['Replicators'] for p in points]
+    new = sweep_spec.refine(axes, points, results, 1)
+    assert new
+    assert all(5 <= p['Replicators'] <= 20 and isinstance(p['Replicators'], int) for p in new)
+    assert all(p not in points for p in new)
+
+def test_refineKeepsCategoricalAxesFixed():
+    axes = {'Replicators': [5, 20], 'Cull': ['Random', 'Length'],
+            'SeedLength': [(100, 10), (500, 50)]}
+    points = sweep_spec.grid(axes)
+    results = [p['Replicators'] + (100 if p['Cull'] == 'Length' else 0) for p in points]
+    new = sweep_spec.refine(axes, points, results, 1)
+    assert len(new) == 4
+    for p in new:
+        assert p['Replicators'] == 12
+        assert p['Cull'] in axes['Cull']
+        assert p['SeedLength'] in axes['SeedLength']
+
+def test_refineWithoutNumericAxes():
+    axes = {'Cull': ['Random', 'Length']}
+    points = sweep_spec.grid(axes)
+    assert sweep_spec.refine(axes, points, [1, 2]) == []
+
+def test_adaptiveRunsOnlyNewPoints(tmp_path, monkeypatch):
+    made = list()
+    runJob = sweep.runJob
+    def counted(job):
+        made.append(job[1])
+        return runJob(job)
+    monkeypatch.setattr(sweep, 'runJob', counted)
+    spec = {'Parameters': {'Cycles': 1, 'InitialTemplates': 10,
+                           'InitialPool': {'A': 2000, 'C': 2000, 'G': 2000, 'U': 2000}},
+            'Axes': {'Replicators': [4, 20]},
+            'Adaptive': {'Rounds': 2, 'Fraction': 1, 'Category': 'Number'},
+            'Seed': 3, 'Workers': 1, 'Folder': str(tmp_path / 'sweep')}
+    points, handles = sweep_spec.run(spec)
+    assert [p['Replicators'] for p in points] == [4, 20, 12, 8, 16]
+    assert len(made) == len(set(made)) == len(points)
+    assert [h.parameters['Replicators'] for h in handles] == [p['Replicators'] for p in points]
+    assert [os.path.basename(h.fileName) for h in handles] == \
+           [str(n) + '.SIMHIST' for n in range(len(points))]
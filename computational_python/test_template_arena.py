@@ -0,0 +1,60 @@
+"""
+Tests of the Packed Template Store
+Run with pytest from this folder
+"""
+
+import random
+import numpy as np
+import pytest
+import template_arena
+
+BASES = ('A', 'C', 'G', 'U')
+
+def randomTemplates(number, seed = 0):
+    rng = random.Random(seed)
+    return [''.join(rng.choice(BASES) for n in range(rng.randint(0, 40))) for m in range(number)]
+
+def test_roundTrip():
+    templates = randomTemplates(200)
+    arena = template_arena.TemplateArena(BASES, templates)
+    assert len(arena) == 200
+    assert list(arena) == templates
+    assert [arena[i] for i in range(len(arena))] == templates
+    assert arena[-1] == templates[-1]
+    assert arena.lengths.tolist() == [len(t) for t in templates]
+
+def test_appendExtendAndTruncate():
+    templates = randomTemplates(50)
+    arena = template_arena.TemplateArena(BASES)
+    for t in templates[:10]:
+        arena.append(t)
+    arena.extend(templates[10:])
+    assert list(arena) == templates
+    del arena[20:]
+    assert list(arena) == templates[:20]
+    arena.append('ACGU')
+    assert list(arena) == templates[:20] + ['ACGU']
+
+def test_selectAndCompact():
+    templates = randomTemplates(100)
+    arena = template_arena.TemplateArena(BASES, templates)
+    indices = np.array([5, 3, 3, 99, 0])
+    assert list(arena.select(indices)) == [templates[i] for i in indices]
+    del arena[60:]
+    arena.compact()
+    assert list(arena) == templates[:60]
+
+def test_compositionAndUniques():
+    templates = randomTemplates(100) + ['AAAA', 'AAAA', '']
+    arena = template_arena.TemplateArena(BASES, templates)
+    expected = [[t.count(b) for b in BASES] for t in templates]
+    assert arena.composition().tolist() == expected
+    assert arena.composition(('U', 'A')).tolist() == [[t.count('U'), t.count('A')] for t in templates]
+    assert arena.uniqueCount() == len(set(templates))
+
+def test_rejectsOtherBases():
+    arena = template_arena.TemplateArena(BASES)
+    with pytest.raises(ValueError):
+        arena.append('ACGT')
+    with pytest.raises(ValueError):
+        template_arena.TemplateArena(('A', 'C', 'G', 'U', 'T'))